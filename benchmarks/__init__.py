@@ -0,0 +1 @@
+"""Benchmarks for dryviz: `python -m benchmarks.run`."""
@@ -0,0 +1,265 @@
+"""
+Benchmarks for tracer overhead and renderer scaling.
+
+    python -m benchmarks.run                  # run and compare against baseline.json
+    python -m benchmarks.run --save-baseline  # run and store the results as the new baseline
+    python -m benchmarks.run --quick          # smallest sizes only
+
+For every workload (see workloads.py) and size it reports the untraced and
+traced run times, the capture cost per step, the peak memory of a traced
+run, and for the captured steps the cost of each renderer (building the Rich
+objects and laying them out, caches cleared) plus the memoized per-step
+render time the viewer sees. The viewer launch is stubbed out.
+
+Results are compared metric by metric with the stored baseline; anything
+more than --tolerance slower (or larger) is reported as a regression and
+makes the run exit with status 1. Baselines are machine specific: refresh
+them with --save-baseline when moving to another machine.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from .workloads import EXAMPLES, WORKLOADS, import_examples
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+RENDER_SAMPLE = 50 # Steps rendered per trace when timing the renderers
+RENDER_WIDTH = 120
+RENDER_REPEAT = 3 # Runs per render, each from cold caches
+MIN_TIME = 1.0 # Seconds of timed runs per measurement, at least
+
+
+class _CapturedTraces:
+    """Stands in for the viewer: keeps the trace of each published session."""
+
+    def __init__(self):
+        self.traces = []
+
+    def __enter__(self):
+        from dryviz.app import DryvizTraceApp
+
+        self._app_class = DryvizTraceApp
+        self._run = DryvizTraceApp.run
+        traces = self.traces
+        DryvizTraceApp.run = lambda app: traces.append(app.trace_data)
+        return self
+
+    def __exit__(self, *_exc_info):
+        self._app_class.run = self._run
+
+
+def _best_time(func, repeat, setup=None, min_time=MIN_TIME):
+    """
+    Best of at least `repeat` runs, and of as many as fit in `min_time`, so
+    a burst of noise doesn't decide it. `setup` runs untimed before each run.
+    """
+    best = None
+    runs = 0
+    deadline = time.perf_counter() + min_time
+    while runs < repeat or time.perf_counter() < deadline:
+        runs += 1
+        if setup is not None:
+            setup()
+        gc.collect() # As timeit does: no collection of earlier runs' garbage in the middle of this one
+        gc.disable()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _reset_caches():
+    """Empties dryviz's caches, so a measurement doesn't depend on what ran before it."""
+    from dryviz import graphs, rendering, snapshot, visuals
+
+    visuals.clear_render_caches()
+    rendering._RENDERER_CACHE.clear()
+    graphs._CSR_CACHE.clear()
+    for cache in (snapshot._KIND_CACHE, snapshot._SPEC_CACHE, snapshot._SLOT_CACHE, snapshot._TEXT_TYPES,
+                  snapshot._NODE_TYPES, snapshot._ELIDED):
+        cache.clear()
+    gc.collect()
+
+
+def _peak_memory(func):
+    _reset_caches() # Peak memory is that of one run from a cold start, whatever --repeat is
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _time_renderers(trace_data, totals, repeat=RENDER_REPEAT):
+    """
+    Adds the cold cost of every renderer used by sampled steps to `totals`
+    (name -> [seconds, calls]); each render is the best of `repeat`.
+    """
+    from rich.console import Console
+    from dryviz.rendering import RENDERER_REGISTRY, _render_variable_uncached, render_step
+    from dryviz.stats import renderer_name
+    from dryviz.visuals import clear_render_caches
+
+    console = Console(file=io.StringIO(), width=RENDER_WIDTH, force_terminal=True, color_system="truecolor")
+
+    def cold():
+        clear_render_caches()
+        console.file = io.StringIO()
+
+    stride = max(1, len(trace_data) // RENDER_SAMPLE)
+    indices = range(0, len(trace_data), stride)
+    for index in indices:
+        for var_name, var_value in trace_data[index].variables.items():
+            render_func = next((func for can_render, func in RENDERER_REGISTRY if can_render(var_name, var_value)),
+                               None)
+            elapsed = _best_time(lambda: console.print(_render_variable_uncached(var_name, var_value)), repeat,
+                                 setup=cold, min_time=0)
+            entry = totals.setdefault(renderer_name(render_func), [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+    # What the viewer pays per step when walking the trace in order, memoization included.
+    def walk():
+        for index in indices:
+            step = trace_data[index]
+            for renderable in render_step(step, trace_data.calls.get(step.call)):
+                console.print(renderable)
+
+    return _best_time(walk, repeat, setup=cold, min_time=0) / len(indices)
+
+
+def _measure(name, untraced, traced, repeat, renderer_totals):
+    from dryviz.core import disable, enable
+
+    disable() # Decorated examples call straight through
+    try:
+        untraced_time = _best_time(untraced, repeat)
+        untraced_peak = _peak_memory(untraced)
+    finally:
+        enable()
+
+    with _CapturedTraces() as captured:
+        traced_time = _best_time(traced, repeat, setup=captured.traces.clear) # Timed runs' traces aren't kept
+        captured.traces.clear()
+        traced_peak = _peak_memory(traced)
+    traces = captured.traces # Sessions of the last run
+    steps = sum(len(trace_data) for trace_data in traces)
+    render_times = [_time_renderers(trace_data, renderer_totals) for trace_data in traces if len(trace_data)]
+
+    return name, {
+        "steps": steps,
+        "untraced_ms": untraced_time * 1e3,
+        "traced_ms": traced_time * 1e3,
+        "overhead_x": traced_time / untraced_time if untraced_time else 0.0,
+        "capture_us_per_step": (traced_time - untraced_time) / steps * 1e6 if steps else 0.0,
+        "untraced_peak_kib": untraced_peak / 1024,
+        "traced_peak_kib": traced_peak / 1024,
+        "render_step_us": sum(render_times) / len(render_times) * 1e6 if render_times else 0.0,
+    }
+
+
+def run_benchmarks(quick=False, repeat=5):
+    """Runs every workload and example; returns the results dict stored in baselines."""
+    from dryviz.core import dryviz
+
+    # Examples are decorated at import; importing them while disabled would leave them untraced.
+    import_examples()
+    results = {}
+    renderer_totals = {}
+    for workload_name, (func, sizes) in WORKLOADS.items():
+        for size in sizes[:1] if quick else sizes:
+            traced_func = dryviz(func)
+            name, metrics = _measure(f"{workload_name}/{size}", lambda: func(size), lambda: traced_func(size),
+                                     repeat, renderer_totals)
+            results[name] = metrics
+            _print_row(name, metrics)
+    for example_name, run_example in EXAMPLES.items():
+        name, metrics = _measure(example_name, run_example, run_example, repeat, renderer_totals)
+        results[name] = metrics
+        _print_row(name, metrics)
+
+    renderers = {name: {"us_per_call": seconds / calls * 1e6, "calls": calls}
+                 for name, (seconds, calls) in sorted(renderer_totals.items())}
+    print()
+    for name, metrics in renderers.items():
+        print(f"  renderer {name:<16} {metrics['us_per_call']:>10.1f} us/call  ({metrics['calls']} calls)")
+    return {"workloads": results, "renderers": renderers}
+
+
+def _print_row(name, metrics):
+    print(f"  {name:<22} steps {metrics['steps']:>6}  untraced {metrics['untraced_ms']:>8.2f} ms  "
+          f"traced {metrics['traced_ms']:>9.2f} ms  ({metrics['overhead_x']:>6.1f}x)  "
+          f"capture {metrics['capture_us_per_step']:>7.1f} us/step  peak {metrics['traced_peak_kib']:>8.0f} KiB  "
+          f"render {metrics['render_step_us']:>8.1f} us/step")
+
+
+def compare(results, baseline, tolerance):
+    """Lists (name, metric, baseline value, new value) for every metric that got worse by more than `tolerance`."""
+    regressions = []
+    sections = (("workloads", ("traced_ms", "capture_us_per_step", "traced_peak_kib", "render_step_us")),
+                ("renderers", ("us_per_call",)))
+    for section, metric_names in sections:
+        for name, old_metrics in baseline.get(section, {}).items():
+            new_metrics = results[section].get(name)
+            if new_metrics is None:
+                continue
+            for metric in metric_names:
+                old, new = old_metrics.get(metric), new_metrics.get(metric)
+                if old and new is not None and new > old * (1 + tolerance):
+                    regressions.append((name, metric, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="only run the smallest size of each workload")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement (best is kept)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown reported as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    print(f"dryviz benchmarks on Python {platform.python_version()} ({platform.machine()})")
+    results = run_benchmarks(quick=args.quick, repeat=args.repeat)
+
+    if args.save_baseline:
+        document = {"python": platform.python_version(), "machine": platform.machine(),
+                    "platform": platform.platform(), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 0
+    print(f"\nRegressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for name, metric, old, new in regressions:
+        print(f"  {name:<22} {metric:<20} {old:>12.2f} -> {new:>12.2f}  (+{new / old - 1:.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Workloads traced by the benchmarks.
+
+Each workload is a plain (undecorated) function taking a size, so the same
+code can be timed untraced and traced. `WORKLOADS` maps a name to the
+function and the sizes benchmarked by default; `EXAMPLES` lists the
+decorated example programs shipped with dryviz.
+"""
+import random
+
+
+class TreeNode:
+    def __init__(self, value):
+        self.value = value
+        self.left = None
+        self.right = None
+
+
+def list_workload(n):
+    """Fills a list, then reverses it in place: every step mutates one list."""
+    items = []
+    for i in range(n):
+        items.append(i)
+    left, right = 0, len(items) - 1
+    while left < right:
+        items[left], items[right] = items[right], items[left]
+        left += 1
+        right -= 1
+    return items
+
+
+def tree_workload(n):
+    """Inserts n random keys into a binary search tree, iteratively."""
+    rng = random.Random(n)
+    root = TreeNode(rng.randrange(10 * n))
+    for _ in range(n - 1):
+        key = rng.randrange(10 * n)
+        node = root
+        while True:
+            if key < node.value:
+                if node.left is None:
+                    node.left = TreeNode(key)
+                    break
+                node = node.left
+            else:
+                if node.right is None:
+                    node.right = TreeNode(key)
+                    break
+                node = node.right
+    return root
+
+
+def graph_workload(n):
+    """Builds an adjacency-list graph dict of n nodes, then walks it breadth first."""
+    rng = random.Random(n)
+    graph = {}
+    for node in range(n):
+        graph[node] = []
+        if node:
+            graph[node].append(rng.randrange(node))
+    order = []
+    seen = {0}
+    queue = [0]
+    while queue:
+        current = queue.pop(0)
+        order.append(current)
+        for neighbor in graph[current]:
+            if neighbor not in seen:
+                seen.add(neighbor)
+                queue.append(neighbor)
+    return order
+
+
+def stack_workload(n):
+    """Pushes n items onto a stack, then pops them all."""
+    stack = []
+    for i in range(n):
+        stack.append(i)
+    total = 0
+    while stack:
+        total += stack.pop()
+    return total
+
+
+WORKLOADS = {
+    "list": (list_workload, (100, 400)),
+    "tree": (tree_workload, (50, 150)),
+    "graph": (graph_workload, (100, 300)),
+    "stack": (stack_workload, (100, 1000)),
+}
+
+
+def _run_stack_example():
+    from dryviz.examples.example_stack import manage_stack_operations
+    manage_stack_operations()
+
+def _run_graph_example():
+    from dryviz.examples.example_graph import manage_graph_operations
+    manage_graph_operations()
+
+def _run_tree_example():
+    from dryviz.examples.example_tree import Node
+    root = Node(50)
+    for key in (30, 20, 40, 70, 60, 80):
+        root.insert(key)
+    root.inorder_traversal(root)
+
+def _run_linked_list_example():
+    from dryviz.examples.example_linked_list import LinkedList
+    linked_list = LinkedList()
+    for value in (1, 2, 3, 4):
+        linked_list.append(value)
+    linked_list.prepend(0)
+    linked_list.delete(3)
+    linked_list.display()
+
+
+def import_examples():
+    """Imports the example modules (decorating their functions) while dryviz is enabled."""
+    from dryviz.examples import example_graph, example_linked_list, example_stack, example_tree
+
+
+EXAMPLES = {
+    "example_stack": _run_stack_example,
+    "example_graph": _run_graph_example,
+    "example_tree": _run_tree_example,
+    "example_linked_list": _run_linked_list_example,
+}
@@ -0,0 +1,363 @@
+import asyncio
+
+from rich.console import Group
+from rich.text import Text
+from textual.app import App, ComposeResult
+from textual.containers import ScrollableContainer
+from textual.message import Message
+from textual.widgets import Header, Footer, Input, Static
+from .query import Query
+from .rendering import StepRenderCache, render_profile
+from .stats import format_stats
+from .visuals import GRAPH_VIEWS, container_window, graph_view, is_windowed, set_container_window, set_graph_view
+from .tracefile import TraceStream
+
+
+class StepScrubber(Static):
+    """A one-line progress bar over the trace; click or drag it to seek."""
+
+    class Seek(Message):
+        """Posted when the user picks a position on the scrubber."""
+
+        def __init__(self, index):
+            super().__init__()
+            self.index = index
+
+    def __init__(self, total, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.total = total
+        self.index = 0
+
+    def set_position(self, index, total):
+        self.index = index
+        self.total = total
+        self.refresh()
+
+    def render(self):
+        width = max(self.size.width, 1)
+        if self.total <= 1:
+            marker = 0
+        else:
+            marker = round(self.index * (width - 1) / (self.total - 1))
+        bar = Text()
+        bar.append("━" * marker, style="bold cyan")
+        bar.append("●", style="bold yellow")
+        bar.append("─" * (width - marker - 1), style="dim")
+        return bar
+
+    def _index_at(self, x):
+        width = max(self.size.width, 1)
+        if width == 1:
+            return 0
+        fraction = min(max(x / (width - 1), 0.0), 1.0)
+        return round(fraction * (self.total - 1))
+
+    def on_mouse_down(self, event) -> None:
+        self.capture_mouse()
+        self.post_message(self.Seek(self._index_at(event.x)))
+
+    def on_mouse_move(self, event) -> None:
+        if self.app.mouse_captured is self:
+            self.post_message(self.Seek(self._index_at(event.x)))
+
+    def on_mouse_up(self, _event) -> None:
+        self.release_mouse()
+
+
+class DryvizTraceApp(App):
+    """
+    A Textual application to display dry-run traces.
+    Only the current step (or a small window of steps) is rendered, so opening
+    a trace costs the same regardless of how many steps it has.
+    """
+
+    BINDINGS = [
+        ("q", "quit", "Quit"),
+        ("n,right", "next_step", "Next"),
+        ("p,left", "previous_step", "Prev"),
+        ("home", "first_step", "First"),
+        ("end", "last_step", "Last"),
+        ("pageup", "page(-1)", "Back 10%"),
+        ("pagedown", "page(1)", "Forward 10%"),
+        ("g", "prompt('step')", "Go to step"),
+        ("l", "prompt('line')", "Go to line"),
+        ("slash", "prompt('query')", "Find"),
+        ("c", "prompt('changes')", "Changes of"),
+        ("left_square_bracket", "search(-1)", "Prev match"),
+        ("right_square_bracket", "search(1)", "Next match"),
+        ("left_curly_bracket", "page_containers(-1)", "Items ←"),
+        ("right_curly_bracket", "page_containers(1)", "Items →"),
+        ("v", "cycle_graph_view", "Graph view"),
+        ("h", "toggle_heatmap", "Heatmap"),
+        ("plus", "resize_window(1)", "Wider"),
+        ("minus", "resize_window(-1)", "Narrower"),
+        ("escape", "cancel_prompt", "Cancel"),
+    ]
+    CSS_PATH = None # No separate CSS file for now
+    CSS = """
+    StepScrubber { height: 1; margin: 0 1; }
+    #trace_view { height: 1fr; }
+    #step_view { width: auto; }
+    #jump_input { dock: bottom; display: none; }
+    #stats_bar { dock: bottom; height: 1; padding: 0 1; color: $text-muted; }
+    #heatmap_view { dock: right; width: 50%; display: none; border-left: solid $primary; }
+    """
+    MAX_WINDOW = 10 # Most steps shown at once
+    PROMPTS = { # Placeholder of the jump input for each kind of prompt
+        "step": "Step number",
+        "line": "Line number (next step on that line)",
+        "query": "Condition, e.g. len(stack) > 10 (next step where it becomes true)",
+        "changes": "Variable name (next step where it changes)",
+    }
+
+    def __init__(self, trace_data, *args, window=1, stats=None, profile=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trace_data = trace_data # A TraceStore (or anything indexable yielding TraceSteps)
+        self.stats = stats # The session's stats() dict, shown in the status bar
+        self.profile = profile # The session's LineProfile, shown as a source heatmap
+        self.rendered_steps = StepRenderCache(trace_data)
+        self.current = 0
+        self.window = window
+        self.prompt_kind = None # "step", "line", "query" or "changes" while the jump input is open
+        self.search = None # Last query (a Query) or variable name searched for changes, for [ and ]
+        self.title = "Dryviz Execution Trace"
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield StepScrubber(len(self.trace_data), id="scrubber")
+        with ScrollableContainer(id="heatmap_view"):
+            yield Static(id="heatmap")
+        with ScrollableContainer(id="trace_view"):
+            yield Static(id="step_view")
+        yield Input(id="jump_input")
+        yield Static(id="stats_bar")
+        yield Footer()
+
+    async def on_mount(self) -> None:
+        """Called when app is mounted."""
+        if self.profile is not None and not len(self.trace_data): # Profile mode: the heatmap is all there is
+            heatmap_view = self.query_one("#heatmap_view")
+            heatmap_view.styles.width = "100%"
+            heatmap_view.display = True
+            self.update_heatmap()
+        self.show_step(0)
+
+    def update_heatmap(self):
+        if self.profile is None or not self.query_one("#heatmap_view").display:
+            return
+        current_line = self.trace_data.lineno_at(self.current) if len(self.trace_data) else None
+        self.query_one("#heatmap", Static).update(render_profile(self.profile, current_line))
+
+    def action_toggle_heatmap(self) -> None:
+        """Shows or hides the per-line profile next to the steps."""
+        if self.profile is None:
+            self.notify("No profile collected; trace with @dryviz(profile=True)", severity="warning")
+            return
+        heatmap_view = self.query_one("#heatmap_view")
+        heatmap_view.display = not heatmap_view.display
+        self.update_heatmap()
+
+    def show_step(self, index):
+        """Render and display the window of steps starting at `index`."""
+        total = len(self.trace_data)
+        if total == 0:
+            return
+        self.current = min(max(index, 0), total - 1)
+        end = min(self.current + self.window, total)
+        renderables = []
+        for step_index in range(self.current, end):
+            if step_index > self.current:
+                renderables.append(Text("---")) # Separator between steps
+            renderables.extend(self.rendered_steps[step_index])
+        self.query_one("#step_view", Static).update(Group(*renderables))
+        self.query_one(StepScrubber).set_position(self.current, total)
+        self.query_one("#stats_bar", Static).update(format_stats(self.stats)) # Render timings grow as steps are shown
+        self.update_heatmap() # Moves the current line marker
+        if end - self.current > 1:
+            self.sub_title = f"Steps {self.current + 1}-{end} of {total}"
+        else:
+            self.sub_title = f"Step {self.current + 1} of {total}"
+
+    def action_next_step(self) -> None:
+        self.show_step(self.current + 1)
+
+    def action_previous_step(self) -> None:
+        self.show_step(self.current - 1)
+
+    def action_first_step(self) -> None:
+        self.show_step(0)
+
+    def action_last_step(self) -> None:
+        self.show_step(len(self.trace_data) - 1)
+
+    def action_page(self, direction: int) -> None:
+        self.show_step(self.current + direction * max(len(self.trace_data) // 10, 1))
+
+    def action_resize_window(self, delta: int) -> None:
+        self.window = min(max(self.window + delta, 1), self.MAX_WINDOW)
+        self.show_step(self.current)
+
+    def action_page_containers(self, direction: int) -> None:
+        """Pages the window shown of large lists, dicts and stacks by one window length."""
+        if not len(self.trace_data):
+            return
+        head, tail, offset = container_window()
+        variables = self.trace_data[self.current].variables
+        longest = max((len(value) for value in variables.values() if is_windowed(value)), default=0)
+        if not longest:
+            self.notify("No large containers in this step", severity="warning")
+            return
+        offset = min(max(offset + direction * head, 0), longest - head - tail)
+        set_container_window(offset=offset)
+        self.rendered_steps = StepRenderCache(self.trace_data) # Rendered with the old window
+        self.show_step(self.current)
+        self.notify(f"Large containers: items {offset + 1:,}-{offset + head:,} of up to {longest:,}")
+
+    def action_cycle_graph_view(self) -> None:
+        """Switches graph dicts to the next view: auto, edges, summary, neighborhood, matrix."""
+        view = GRAPH_VIEWS[(GRAPH_VIEWS.index(graph_view()) + 1) % len(GRAPH_VIEWS)]
+        set_graph_view(view)
+        self.rendered_steps = StepRenderCache(self.trace_data) # Rendered with the old view
+        self.show_step(self.current)
+        self.notify(f"Graph view: {view}")
+
+    def action_prompt(self, kind: str) -> None:
+        """Open the jump input for a step number, a line number, a condition or a variable."""
+        self.prompt_kind = kind
+        jump_input = self.query_one("#jump_input", Input)
+        jump_input.placeholder = self.PROMPTS[kind]
+        jump_input.value = ""
+        jump_input.display = True
+        jump_input.focus()
+
+    def action_cancel_prompt(self) -> None:
+        self.prompt_kind = None
+        self.query_one("#jump_input", Input).display = False
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        kind = self.prompt_kind
+        self.action_cancel_prompt()
+        if kind == "query":
+            try:
+                self.search = Query(event.value)
+            except SyntaxError as e:
+                self.notify(f"Invalid condition: {e.msg}", severity="warning")
+                return
+            self.jump_to_match(self.current, 1)
+            return
+        if kind == "changes":
+            self.search = event.value.strip()
+            self.jump_to_match(self.current, 1)
+            return
+        try:
+            number = int(event.value)
+        except ValueError:
+            self.notify(f"Not a number: {event.value!r}", severity="warning")
+            return
+        if kind == "step":
+            self.show_step(number - 1) # Steps are shown 1-based
+            return
+        index = self.find_line(number, self.current + 1)
+        if index is None:
+            self.notify(f"Line {number} was never executed", severity="warning")
+        else:
+            self.show_step(index)
+
+    def find_line(self, lineno, start):
+        """Finds the first step at or after `start` (wrapping around) that runs `lineno`."""
+        total = len(self.trace_data)
+        for offset in range(total):
+            index = (start + offset) % total
+            if self.trace_data.lineno_at(index) == lineno:
+                return index
+        return None
+
+    def action_search(self, direction: int) -> None:
+        """Jump to the next (or previous) match of the last condition or variable searched."""
+        if self.search is None:
+            self.notify("Nothing searched yet: press / for a condition or c for a variable", severity="warning")
+            return
+        self.jump_to_match(self.current + direction, direction)
+
+    def jump_to_match(self, start, direction):
+        """Shows the nearest match of `self.search` from step `start`, looking forward or backward."""
+        backward = direction < 0
+        if isinstance(self.search, Query):
+            index = self.trace_data.find(self.search, start, backward)
+            missing = f"{self.search.expr} does not become true"
+        else:
+            index = self.trace_data.change_index().next_change(self.search, start - direction, backward)
+            missing = f"{self.search} does not change"
+        if index is None:
+            self.notify(f"{missing} {'before' if backward else 'after'} this step", severity="warning")
+        else:
+            self.show_step(index)
+
+    def on_step_scrubber_seek(self, message: StepScrubber.Seek) -> None:
+        self.show_step(message.index)
+
+
+class LiveTraceApp(DryvizTraceApp):
+    """
+    The viewer of `python -m dryviz serve`: traced programs connect to its
+    Unix socket (@dryviz(viewer=...)) and stream their steps, which show up
+    as they arrive. Each connection is a new trace and replaces the one on
+    screen. While the last step is shown the view follows new steps, like
+    `tail -f`; moving back stops following until the end is reached again.
+    """
+
+    REFRESH_INTERVAL = 0.2 # Seconds between checks for new steps
+    READ_SIZE = 1 << 16
+
+    def __init__(self, socket_path, *args, **kwargs):
+        super().__init__(TraceStream(), *args, **kwargs)
+        self.socket_path = socket_path
+        self.connections = 0
+        self._server = None
+        self._shown_total = 0 # Steps received as of the last refresh
+        self.title = f"Dryviz Live - {socket_path}"
+
+    async def on_mount(self) -> None:
+        self._server = await asyncio.start_unix_server(self._receive, path=self.socket_path)
+        self.query_one("#step_view", Static).update(Text(f"Waiting for a traced program to connect to "
+                                                         f"{self.socket_path}", style="dim"))
+        self.set_interval(self.REFRESH_INTERVAL, self.refresh_live)
+
+    async def _receive(self, reader, writer):
+        """Reads one traced program's stream into a new TraceStream until it hangs up."""
+        self.connections += 1
+        trace_data = TraceStream()
+        self.trace_data = trace_data
+        self.rendered_steps = StepRenderCache(trace_data)
+        self.current = 0
+        self._shown_total = 0
+        self.query_one("#step_view", Static).update(Text(f"Connection {self.connections}: waiting for steps",
+                                                         style="dim"))
+        try:
+            while not trace_data.complete:
+                data = await reader.read(self.READ_SIZE)
+                if not data:
+                    break
+                trace_data.feed(data)
+        except ValueError as e: # Not a trace stream
+            self.notify(str(e), severity="error")
+        finally:
+            writer.close()
+        if trace_data is self.trace_data: # Not replaced by a newer connection meanwhile
+            self.refresh_live()
+            self.show_step(self.current) # Now marked complete
+
+    def refresh_live(self):
+        """Shows newly received steps; follows them if the last step was on screen."""
+        total = len(self.trace_data)
+        if total == self._shown_total:
+            return
+        following = self.current + self.window >= self._shown_total
+        self._shown_total = total
+        self.show_step(max(total - self.window, 0) if following else self.current)
+
+    def show_step(self, index):
+        super().show_step(index)
+        if len(self.trace_data):
+            state = "complete" if self.trace_data.complete else "receiving"
+            self.sub_title += f" · connection {self.connections}, {state}"
@@ -0,0 +1,279 @@
+import sys
+import threading
+from bisect import bisect_right
+
+# Tool ids we may claim from sys.monitoring, in order of preference.
+_MONITORING_TOOL_IDS = (4, 3, 1, 2) # Unassigned slots first, then the coverage/profiler slots
+_MONITORING_TOOL_NAME = "dryviz"
+
+# Claiming a tool id is check-then-act; sessions in several threads may start at once.
+_MONITORING_LOCK = threading.Lock()
+
+# Returned by an on_line callback to say it will never want events from that
+# line again during this call; backends that can, stop delivering them.
+SKIP_LINE = object()
+
+
+def target_code(wrapped):
+    """Finds the code object whose lines should be traced for a decorated callable."""
+    func = getattr(wrapped, "__func__", wrapped) # Unwrap bound methods
+    code = getattr(func, "__code__", None)
+    if code is None and isinstance(wrapped, type): # Decorated classes trace their __init__
+        code = getattr(getattr(wrapped, "__init__", None), "__code__", None)
+    return code
+
+
+# sys.settrace is per thread, but several sessions may be live in one thread
+# (interleaved asyncio tasks, or a thread adopted by another session). Each
+# thread gets one dispatching tracer that serves all of them.
+_thread_tracers = threading.local()
+
+def _thread_backends():
+    backends = getattr(_thread_tracers, "backends", None)
+    if backends is None:
+        backends = _thread_tracers.backends = []
+        _thread_tracers.previous = None
+    return backends
+
+def _dispatch_call(frame, _event, _arg): # Global tracer of a thread; only ever called with "call"
+    backends = [backend for backend in _thread_tracers.backends if backend.wants(frame.f_code)]
+    if not backends:
+        if not any(backend.active for backend in _thread_tracers.backends):
+            # Every session tracing this thread has ended or detached: step aside.
+            _thread_tracers.backends.clear()
+            sys.settrace(_thread_tracers.previous)
+        return None
+    if len(backends) == 1:
+        return backends[0]._local_tracer
+
+    def local_tracer(frame, event, arg):
+        tracing = False
+        for backend in backends:
+            if backend._local_tracer(frame, event, arg) is not None:
+                tracing = True
+        return local_tracer if tracing else None
+    return local_tracer
+
+
+class SetTraceBackend:
+    """
+    Tracing backend built on sys.settrace, for interpreters without sys.monitoring.
+    Only frames executing one of the target code objects get a local tracer,
+    so other calls pay for a single `call` event and nothing more.
+    """
+
+    name = "settrace"
+
+    def __init__(self, code, on_line):
+        self.codes = {code}
+        self.on_line = on_line # Called as on_line(frame, lineno)
+        self.files = frozenset() # Source files traced in adopted threads (see trace_files)
+        self._in_adopted_thread = None
+        self._detached = False
+        self._stopped = False
+
+    @property
+    def active(self):
+        return not (self._detached or self._stopped)
+
+    def start(self):
+        self._detached = False
+        self._stopped = False
+        self.attach_thread()
+
+    def attach_thread(self):
+        """Starts tracing the calling thread."""
+        backends = _thread_backends()
+        if not backends:
+            _thread_tracers.previous = sys.gettrace()
+            sys.settrace(_dispatch_call)
+        backends.append(self)
+
+    def stop(self):
+        self._stopped = True
+        backends = _thread_backends()
+        if self in backends:
+            backends.remove(self)
+            if not backends:
+                sys.settrace(_thread_tracers.previous)
+        # Adopted threads drop this backend lazily, the next time they call something.
+
+    def add_code(self, code):
+        """Also trace frames running `code` (e.g. a nested decorated function)."""
+        self.codes.add(code)
+
+    def trace_files(self, files, in_adopted_thread):
+        """In threads where `in_adopted_thread()` is true, also trace any code defined in `files`."""
+        self.files = frozenset(files)
+        self._in_adopted_thread = in_adopted_thread
+
+    def adopt_thread(self, frame, event, arg):
+        """Called from a new thread's first trace event: starts tracing that thread."""
+        self.attach_thread()
+        return _dispatch_call(frame, event, arg)
+
+    def wants(self, code):
+        if not self.active:
+            return False
+        return code in self.codes or (code.co_filename in self.files and self._in_adopted_thread())
+
+    def detach(self, frame):
+        """Stops all further events for this call; `frame` is the frame currently being traced."""
+        self._detached = True
+        frame.f_trace = None
+
+    def _local_tracer(self, frame, event, _arg):
+        if not self.active:
+            frame.f_trace = None
+            return None
+        if event == "line":
+            self.on_line(frame, frame.f_lineno) # SKIP_LINE can't be honoured per line here
+        return self._local_tracer
+
+
+class MonitoringBackend:
+    """
+    Tracing backend built on sys.monitoring (PEP 669, Python 3.12+).
+    LINE and JUMP events are enabled on the target code objects only, so code
+    called from the traced function (library calls, helpers in other files)
+    runs without any callback at all. As with sys.settrace, a backward jump
+    to the line already running (a one-line loop) counts as a new line.
+    """
+
+    name = "monitoring"
+
+    def __init__(self, code, on_line):
+        self.codes = {code}
+        self.on_line = on_line # Called as on_line(frame, lineno)
+        self.files = frozenset() # Source files traced in adopted threads (see trace_files)
+        self.thread_codes = set() # Code objects from `files` found running, with LINE events enabled
+        self.tool_id = None
+        self._line_tables = {} # code -> (instruction offsets, line numbers) from co_lines()
+        self._disabled_lines = False
+        self._detached = False
+
+    @staticmethod
+    def is_available():
+        if not hasattr(sys, "monitoring"):
+            return False
+        return any(sys.monitoring.get_tool(tool_id) is None for tool_id in _MONITORING_TOOL_IDS)
+
+    def start(self):
+        monitoring = sys.monitoring
+        with _MONITORING_LOCK:
+            for tool_id in _MONITORING_TOOL_IDS:
+                if monitoring.get_tool(tool_id) is None:
+                    monitoring.use_tool_id(tool_id, _MONITORING_TOOL_NAME)
+                    self.tool_id = tool_id
+                    break
+            else:
+                raise RuntimeError("No free sys.monitoring tool id for dryviz")
+        monitoring.register_callback(self.tool_id, monitoring.events.LINE, self._line_callback)
+        monitoring.register_callback(self.tool_id, monitoring.events.JUMP, self._jump_callback)
+        for code in self.codes:
+            monitoring.set_local_events(self.tool_id, code, _line_events())
+        if self.files:
+            self._watch_starts()
+
+    def trace_files(self, files, _in_adopted_thread):
+        """
+        Also trace code defined in `files`. Events are global here, so they are
+        enabled for every thread; the line handler drops the ones it doesn't want.
+        """
+        self.files = frozenset(files)
+        if self.tool_id is not None:
+            self._watch_starts()
+
+    def adopt_thread(self, _frame, _event, _arg):
+        """Called from a new thread's first trace event; events here don't depend on the thread."""
+        return None
+
+    def _watch_starts(self):
+        # PY_START finds the code objects of `files` as they first run.
+        monitoring = sys.monitoring
+        monitoring.register_callback(self.tool_id, monitoring.events.PY_START, self._start_callback)
+        monitoring.set_events(self.tool_id, monitoring.events.PY_START)
+
+    def _start_callback(self, code, _offset):
+        if code.co_filename in self.files and code not in self.codes and code not in self.thread_codes:
+            self.thread_codes.add(code)
+            if not self._detached:
+                sys.monitoring.set_local_events(self.tool_id, code, _line_events())
+        return sys.monitoring.DISABLE # One PY_START per code object is all we need
+
+    def add_code(self, code):
+        """Also enable line events on `code` (e.g. a nested decorated function)."""
+        if code in self.codes:
+            return
+        self.codes.add(code)
+        if self.tool_id is not None and not self._detached:
+            sys.monitoring.set_local_events(self.tool_id, code, _line_events())
+
+    def stop(self):
+        if self.tool_id is None:
+            return
+        monitoring = sys.monitoring
+        for code in self.codes | self.thread_codes:
+            monitoring.set_local_events(self.tool_id, code, monitoring.events.NO_EVENTS)
+        monitoring.set_events(self.tool_id, monitoring.events.NO_EVENTS)
+        monitoring.register_callback(self.tool_id, monitoring.events.LINE, None)
+        monitoring.register_callback(self.tool_id, monitoring.events.JUMP, None)
+        monitoring.register_callback(self.tool_id, monitoring.events.PY_START, None)
+        monitoring.free_tool_id(self.tool_id)
+        self.tool_id = None
+        self._line_tables.clear()
+        if self._disabled_lines or self.files:
+            # DISABLE is sticky per code location; re-arm it for later sessions.
+            monitoring.restart_events()
+            self._disabled_lines = False
+
+    def detach(self, _frame):
+        """Stops all further events for this call."""
+        self._detached = True
+        for code in self.codes | self.thread_codes:
+            sys.monitoring.set_local_events(self.tool_id, code, sys.monitoring.events.NO_EVENTS)
+
+    def _line_callback(self, _code, line_number):
+        # The callback runs on top of the instrumented frame.
+        if self.on_line(sys._getframe(1), line_number) is SKIP_LINE:
+            self._disabled_lines = True
+            return sys.monitoring.DISABLE
+        return None
+
+    def _jump_callback(self, code, offset, destination):
+        if destination > offset:
+            self._disabled_lines = True
+            return sys.monitoring.DISABLE # Only backward jumps restart a line
+        line_number = self._line_at(code, destination)
+        if line_number is None or line_number != self._line_at(code, offset):
+            return None # Jumping to another line: LINE reports it
+        self.on_line(sys._getframe(1), line_number) # SKIP_LINE can't be honoured per jump
+        return None
+
+    def _line_at(self, code, offset):
+        table = self._line_tables.get(code)
+        if table is None:
+            ranges = list(code.co_lines())
+            table = self._line_tables[code] = ([start for start, _end, _line in ranges],
+                                               [line for _start, _end, line in ranges])
+        starts, lines = table
+        return lines[bisect_right(starts, offset) - 1]
+
+
+def _line_events():
+    return sys.monitoring.events.LINE | sys.monitoring.events.JUMP
+
+
+def make_backend(code, on_line, backend=None):
+    """
+    Creates the tracing backend for `code`; more code objects can be added with `add_code`.
+    `backend` may force "monitoring" or "settrace"; by default sys.monitoring
+    is used when available, with sys.settrace as the fallback.
+    """
+    if backend == "settrace":
+        return SetTraceBackend(code, on_line)
+    if backend == "monitoring" or (backend is None and MonitoringBackend.is_available()):
+        return MonitoringBackend(code, on_line)
+    if backend is not None:
+        raise ValueError(f"Unknown dryviz tracing backend: {backend!r}")
+    return SetTraceBackend(code, on_line)
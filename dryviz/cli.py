@@ -0,0 +1,76 @@
+import argparse
+import os
+import socket
+
+from .streaming import DEFAULT_VIEWER_SOCKET
+
+
+def _view(args):
+    from .app import DryvizTraceApp
+    from .tracefile import TraceFile
+
+    with TraceFile(args.trace_file) as trace_data:
+        app = DryvizTraceApp(trace_data=trace_data)
+        app.title = f"Dryviz Execution Trace - {args.trace_file}"
+        app.run()
+
+
+def _export(args):
+    from .export import export_trace
+    from .tracefile import TraceFile
+
+    with TraceFile(args.trace_file) as trace_data:
+        count = export_trace(trace_data, args.output, fmt=args.format, per_step=args.per_step,
+                             workers=args.workers, width=args.width,
+                             title=f"Dryviz Execution Trace - {args.trace_file}")
+    print(f"Exported {count} steps to {args.output}")
+
+
+def _serve(args):
+    from .app import LiveTraceApp
+
+    path = args.socket
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path) # Left behind by a viewer that did not exit cleanly
+        else:
+            print(f"Another dryviz viewer is already listening on {path}")
+            return 1
+        finally:
+            probe.close()
+    try:
+        LiveTraceApp(path).run()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main(argv=None):
+    """Entry point for `python -m dryviz`."""
+    parser = argparse.ArgumentParser(prog="python -m dryviz", description="Work with saved dryviz traces.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    view = commands.add_parser("view", help="open a saved trace in the viewer")
+    view.add_argument("trace_file", help="path written by @dryviz(trace_file=...)")
+    view.set_defaults(handler=_view)
+
+    export = commands.add_parser("export", help="render a saved trace to text, ANSI, HTML or SVG")
+    export.add_argument("trace_file", help="path written by @dryviz(trace_file=...)")
+    export.add_argument("output", help="output file; the format is taken from its suffix (.txt, .ansi, .html, .svg)")
+    export.add_argument("--format", choices=["text", "ansi", "html", "svg"], help="override the output format")
+    export.add_argument("--per-step", action="store_true", help="write one file per step (always on for SVG)")
+    export.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    export.add_argument("--width", type=int, default=120, help="console width used for rendering")
+    export.set_defaults(handler=_export)
+
+    serve = commands.add_parser("serve", help="open a live viewer that traced programs stream their steps to")
+    serve.add_argument("socket", nargs="?", default=DEFAULT_VIEWER_SOCKET,
+                       help=f"Unix socket to listen on (default: {DEFAULT_VIEWER_SOCKET}); "
+                            "trace with @dryviz(viewer=<socket>)")
+    serve.set_defaults(handler=_serve)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
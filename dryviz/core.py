@@ -1,149 +1,179 @@
-import sys
-import wrapt
-from rich.console import Console, Group # Changed import for Group
-from rich.text import Text
-from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, RichLog
-from .visuals import render_linked_list, render_tree, render_graph, render_stack, render_dict
-
-console = Console()
-
-# Renderer Registry
-RENDERER_REGISTRY = []
-
-def register_renderer(condition_func, render_func):
-    """Registers a new renderer strategy."""
-    RENDERER_REGISTRY.append((condition_func, render_func))
-
-# --- Condition and Render Functions for Specific Types (Modified to return renderables) ---
-
-def _can_render_linked_list(var_name, _var_value): # Mark _var_value as unused
-    return var_name == 'head'
-
-def _render_linked_list_var(var_name, var_value):
-    # Returns a Rich Group containing the variable name and its visualization
-    return Group(Text(f"  {var_name}:"), render_linked_list(var_value))
-
-def _is_graph_like_dict(var_value):
-    if not isinstance(var_value, dict) or not var_value:
-        return False
-    for _, v_list in var_value.items(): # Mark _ as unused
-        if not isinstance(v_list, list):
-            return False
-    return any(var_value.values())
-
-def _can_render_graph_dict(_var_name, var_value): # Mark _var_name as unused
-    return _is_graph_like_dict(var_value)
-
-def _render_graph_dict_var(var_name, var_value):
-    # Returns a Rich Group
-    return Group(Text(f"  {var_name} (Graph):"), render_graph(var_value, name=var_name))
-
-def _can_render_generic_dict(_var_name, var_value): # Mark _var_name as unused
-    return isinstance(var_value, dict)
-
-def _render_generic_dict_var(var_name, var_value):
-    # Returns a Rich Group
-    return Group(Text(f"  {var_name} (Dictionary):"), render_dict(var_value, name=var_name))
-
-def _can_render_stack(var_name, var_value):
-    return isinstance(var_value, list) and var_name.lower() in ['stack', 's', 'stk']
-
-def _render_stack_var(var_name, var_value):
-    # Returns a Rich Group
-    return Group(Text(f"  {var_name} (Stack):"), render_stack(var_value, name=var_name))
-
-def _can_render_tree_node(var_name, var_value):
-    if var_name == 'head' and hasattr(var_value, 'next'):
-        return False
-    return hasattr(var_value, 'value') and \
-           (hasattr(var_value, 'children') or \
-            hasattr(var_value, 'left') or \
-            hasattr(var_value, 'right'))
-
-def _render_tree_node_var(var_name, var_value):
-    # Returns a Rich Group
-    return Group(Text(f"  {var_name} (Tree):"), render_tree(var_value, name=var_name))
-
-# Register renderers (order matters)
-register_renderer(_can_render_linked_list, _render_linked_list_var)
-register_renderer(_can_render_graph_dict, _render_graph_dict_var)
-register_renderer(_can_render_generic_dict, _render_generic_dict_var)
-register_renderer(_can_render_stack, _render_stack_var)
-register_renderer(_can_render_tree_node, _render_tree_node_var)
-
-
-def _render_variable(var_name, var_value):
-    """Helper function to get a renderable for a single variable using the registry."""
-    for can_render, render_func in RENDERER_REGISTRY:
-        if can_render(var_name, var_value):
-            return render_func(var_name, var_value) # Return the Rich object
-
-    # Default representation for other variables
-    try:
-        return Text(f"  {var_name}: {var_value}")
-    except (TypeError, ValueError, AttributeError) as e:
-        return Text(f"  {var_name}: <Object of type {type(var_value).__name__}> (Error rendering: {e})")
-
-
-class DryvizTraceApp(App):
-    """A Textual application to display dry-run traces."""
-
-    BINDINGS = [("q", "quit", "Quit")]
-    CSS_PATH = None # No separate CSS file for now
-
-    def __init__(self, trace_data, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.trace_data = trace_data
-        self.title = "Dryviz Execution Trace"
-
-    def compose(self) -> ComposeResult:
-        yield Header()
-        yield RichLog(highlight=True, markup=True, wrap=False, id="trace_log")
-        yield Footer()
-
-    async def on_mount(self) -> None:
-        """Called when app is mounted."""
-        trace_log = self.query_one(RichLog)
-        trace_log.write(Text(" ")) # Prime RichLog with a blank line text object
-        for step_items_list in self.trace_data: # step_items_list is now a list of renderables
-            for renderable_item in step_items_list:
-                trace_log.write(renderable_item)
-            trace_log.write("---") # Separator between steps
-
-
-@wrapt.decorator
-def dryviz(wrapped, _instance, args, kwargs): # Mark _instance as unused
+import functools
+import importlib
+import inspect
+import os
+from .streaming import BACKPRESSURE_POLICIES, DEFAULT_VIEWER_SOCKET
+from .backends import target_code
+from .export import export_format
+from .sampling import CaptureBudget
+from .session import TraceSession, current_session, last_session
+from .snapshot import register_node, set_snapshot_limits, unregister_node
+from .watch import WatchList
+
+MODES = ("trace", "flight_recorder", "profile")
+
+# Names that used to live here and pull in rich/textual; they are loaded on
+# first access so that importing (and disabling) dryviz stays cheap.
+_LAZY_ATTRIBUTES = {
+    "console": "rendering",
+    "RENDERER_REGISTRY": "rendering",
+    "register_renderer": "rendering",
+    "render_step": "rendering",
+    "StepRenderCache": "rendering",
+    "DryvizTraceApp": "app",
+    "StepScrubber": "app",
+}
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module_name}", __package__), name)
+
+
+# --- Global switch ---
+# DRYVIZ_DISABLED=1 turns @dryviz into a no-op: decorated functions are returned unchanged.
+_enabled = os.environ.get("DRYVIZ_DISABLED", "").strip().lower() in ("", "0", "false", "no")
+
+def enable():
+    """Turns tracing back on for decorated functions."""
+    global _enabled
+    _enabled = True
+
+def disable():
+    """
+    Turns @dryviz into a pass-through.
+    Functions decorated while disabled are returned unchanged; ones decorated
+    earlier call straight through to the original function.
+    """
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+
+def _trace_call(wrapped, args, kwargs, options):
+    """Runs one decorated call under the tracer and hands the trace to its consumer."""
+    code = target_code(wrapped)
+    if code is None or not _enabled: # Nothing we know how to trace (e.g. a C function), or switched off
+        return wrapped(*args, **kwargs)
+
+    session = current_session()
+    if session is not None:
+        # A recursive or nested decorated call joins the outermost session
+        return session.run_call(code, wrapped, args, kwargs)
+    return TraceSession(options).run(code, wrapped, args, kwargs)
+
+
+async def _trace_coroutine(wrapped, args, kwargs, options):
+    """Awaits one decorated coroutine under the tracer; its steps are captured across awaits."""
+    code = target_code(wrapped)
+    if code is None or not _enabled:
+        return await wrapped(*args, **kwargs)
+
+    session = current_session()
+    if session is not None:
+        return await session.run_call_async(code, wrapped, args, kwargs)
+    return await TraceSession(options).run_async(code, wrapped, args, kwargs)
+
+
+def dryviz(wrapped=None, *, mode="trace", trace_file=None, output=None, viewer=None, backpressure=None,
+           queue_size=1024, last=500, every=1, lines=None, max_steps=None, time_budget=None, watch=None, threads=False,
+           profile=False):
     """
     Trace function execution, collect data, and display in a Textual app.
+
+    When dryviz is disabled (DRYVIZ_DISABLED=1 or `disable()`), the function
+    is returned as is, with no wrapper and no per-call cost.
+
+    Decorated calls made while another decorated call is running (recursion,
+    helpers) join the outer call's trace as nested calls; only the outermost
+    call's options apply and a single viewer opens when it returns.
+    Calls are tracked per thread and per asyncio task: decorated coroutines
+    are traced across their awaits, and concurrent calls in other threads
+    or tasks get their own trace.
+
+    Can be used bare (`@dryviz`) or with options:
+        mode: "trace" (default) records every step; "flight_recorder" keeps
+            only the `last` steps in a ring buffer and shows or saves them
+            only when the call raises; "profile" only collects the per-line
+            profile (see `profile`), at the cost of a counter per line event.
+        trace_file: stream the trace to this path (or binary file / pipe)
+            instead of opening the viewer.
+        output: export the rendered steps to this .txt, .ansi, .html or .svg
+            file instead of opening the viewer (see export.export_trace);
+            for CI and batch jobs. Large traces are rendered by forked
+            worker processes on Linux when no other thread is running, and
+            in this process otherwise, so scripts need no `__main__` guard.
+        viewer: stream the trace to a live viewer started with
+            `python -m dryviz serve` instead of opening one here: True for
+            the default socket, or the path of its Unix socket. Rendering
+            happens in the viewer's process, and with the default
+            backpressure the traced program doesn't wait for it while it
+            runs (only the `queue_size` steps still queued are sent when the
+            call returns). With no viewer listening the call runs untraced,
+            with a RuntimeWarning.
+        backpressure: what the tracer does when the writer falls behind:
+            "block", "drop" or "sample" (see StreamingWriter). Defaults to
+            "drop" with a viewer and "block" otherwise.
+        queue_size: number of steps buffered between the tracer and the writer.
+        last: ring buffer size in flight recorder mode.
+        every: capture only every Nth line event.
+        lines: only capture at these line numbers; ints, (start, end)
+            tuples (inclusive) or ranges.
+        max_steps: stop capturing after this many steps.
+        time_budget: stop capturing after this many seconds.
+            Once a budget is used up the rest of the call runs untraced.
+        watch: only capture these locals and expressions, e.g.
+            ["stack", "graph", "len(queue)"]; everything else is skipped.
+        threads: also trace threads started during the call (e.g. by a
+            ThreadPoolExecutor); their steps from the decorated functions'
+            source files appear under a call named after the thread.
+        profile: also collect a per-line profile (hits, self and cumulative
+            time, hits per call depth), shown as a source heatmap in the
+            viewer ("h"). A path ending in .json or .csv also saves it there.
     """
-    trace_data = [] # Stores lists of Rich renderables for each step
-
-    def tracer(frame, event, _arg): # Mark _arg as unused
-        if event == "line" and frame.f_code.co_filename == wrapped.__code__.co_filename:
-            lineno = frame.f_lineno
-            local_vars = frame.f_locals.copy()
-            
-            line_header = Text.from_markup(f"[bold cyan]Line {lineno}[/]:") # Changed to Text.from_markup()
-            step_renderables = [line_header]
-
-            for var_name, var_value in local_vars.items():
-                renderable = _render_variable(var_name, var_value)
-                if renderable: # Ensure renderable is not None
-                    step_renderables.append(renderable)
-            
-            trace_data.append(step_renderables) # Changed from Group(*step_renderables)
-        return tracer
-
-    sys.settrace(tracer)
-    try:
-        result = wrapped(*args, **kwargs)
-    finally:
-        sys.settrace(None)
-
-    # After function execution, launch the Textual app
-    if trace_data:
-        app = DryvizTraceApp(trace_data=trace_data)
-        app.run() # This will block until the app is quit
-        
-    return result
\ No newline at end of file
+    if mode not in MODES:
+        raise ValueError(f"Unknown dryviz mode {mode!r}, expected one of {MODES}")
+    if backpressure is not None and backpressure not in BACKPRESSURE_POLICIES:
+        raise ValueError(f"Unknown backpressure policy {backpressure!r}, expected one of {BACKPRESSURE_POLICIES}")
+    if last < 1:
+        raise ValueError("last must be a positive number of steps")
+    if output is not None:
+        export_format(output) # Fail at decoration time on an unknown suffix
+    if viewer and (trace_file is not None or output is not None):
+        raise ValueError("viewer cannot be combined with trace_file or output")
+    if mode == "profile" and (viewer or trace_file is not None or output is not None):
+        raise ValueError("profile mode records no steps; save the profile with profile=<path> instead")
+    budget = CaptureBudget(every, lines, max_steps, time_budget) # Validates and expands `lines` once
+    watch_list = None if watch is None else WatchList(watch) # Compiles the expressions once
+    if wrapped is None:
+        return functools.partial(dryviz, mode=mode, trace_file=trace_file, output=output, viewer=viewer,
+                                 backpressure=backpressure, queue_size=queue_size, last=last, every=every, lines=lines,
+                                 max_steps=max_steps, time_budget=time_budget, watch=watch,
+                                 threads=threads, profile=profile)
+    viewer_path = None if not viewer else DEFAULT_VIEWER_SOCKET if viewer is True else viewer
+    if backpressure is None:
+        backpressure = "block" if viewer_path is None else "drop" # A live viewer must not slow the program down
+    options = {"mode": mode, "trace_file": trace_file, "output": output, "viewer": viewer_path,
+               "backpressure": backpressure, "queue_size": queue_size, "last": last, "every": every,
+               "lines": budget.lines, "max_steps": max_steps, "time_budget": time_budget, "watch": watch_list,
+               "threads": threads, "profile": profile}
+    if not _enabled:
+        return wrapped
+
+    import wrapt # Only needed once something is actually decorated for tracing
+
+    if inspect.iscoroutinefunction(wrapped):
+        @wrapt.decorator
+        async def async_wrapper(wrapped, _instance, args, kwargs):
+            return await _trace_coroutine(wrapped, args, kwargs, options)
+
+        return async_wrapper(wrapped)
+
+    @wrapt.decorator
+    def wrapper(wrapped, _instance, args, kwargs): # Mark _instance as unused
+        return _trace_call(wrapped, args, kwargs, options)
+
+    return wrapper(wrapped)
@@ -0,0 +1,187 @@
+"""
+Headless export of traces to text, ANSI, HTML or SVG.
+
+Steps are rendered with the same renderers as the viewer and recorded with
+rich's Console; large traces are split into chunks of steps rendered by a
+pool of worker processes, each reading the steps it needs straight from the
+trace file. The result is either one document with every step, or one file
+per step (always the case for SVG).
+"""
+import io
+import os
+import tempfile
+from collections import deque
+
+# Output suffix -> export format
+EXPORT_FORMATS = {".txt": "text", ".ansi": "ansi", ".html": "html", ".svg": "svg"}
+
+CHUNK_SIZE = 256 # Steps rendered per worker task
+EXPORT_WIDTH = 120
+
+_HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>
+body {{ color: {foreground}; background-color: {background}; }}
+pre {{ font-family: Menlo, 'DejaVu Sans Mono', consolas, 'Courier New', monospace; }}
+</style>
+</head>
+<body>
+"""
+_HTML_FOOTER = "</body>\n</html>\n"
+
+
+def export_format(output, fmt=None):
+    """The export format for `output`: `fmt` if given, else guessed from the file suffix."""
+    if fmt is None:
+        fmt = EXPORT_FORMATS.get(os.path.splitext(os.fspath(output))[1].lower())
+        if fmt is None:
+            raise ValueError(f"Cannot tell the export format of {output!r}; "
+                             f"use one of {sorted(EXPORT_FORMATS)} or pass a format")
+    elif fmt not in EXPORT_FORMATS.values():
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {sorted(set(EXPORT_FORMATS.values()))}")
+    return fmt
+
+
+def step_file_name(output, index):
+    """Path of step `index` when exporting one file per step, e.g. trace-000042.html."""
+    stem, suffix = os.path.splitext(os.fspath(output))
+    return f"{stem}-{index:06d}{suffix}"
+
+
+def _make_console(width):
+    from rich.console import Console
+
+    return Console(file=io.StringIO(), record=True, width=width, force_terminal=True,
+                   color_system="truecolor", legacy_windows=False)
+
+
+def _export_steps(source, fmt, start, stop, width, per_step_output=None):
+    """
+    Renders steps [start, stop) of `source` (a trace, or the path of a trace file).
+    Returns the exported text of each step, or writes one file per step next
+    to `per_step_output` and returns how many were written.
+    """
+    from .rendering import render_step
+    from .tracefile import TraceFile
+
+    trace_data = TraceFile(source) if isinstance(source, (str, os.PathLike)) else source
+    console = _make_console(width)
+    total = len(trace_data)
+    exported = []
+    try:
+        for index in range(start, stop):
+            step = trace_data[index]
+            if fmt in ("text", "ansi") and per_step_output is None:
+                console.rule(f"Step {index + 1} of {total}")
+            for renderable in render_step(step, trace_data.calls.get(step.call)):
+                console.print(renderable)
+
+            if fmt == "text":
+                text = console.export_text(clear=True)
+            elif fmt == "ansi":
+                text = console.export_text(clear=True, styles=True)
+            elif fmt == "svg":
+                text = console.export_svg(title=f"Step {index + 1} of {total}", clear=True)
+            elif per_step_output is not None:
+                text = console.export_html(clear=True)
+            else:
+                code = console.export_html(inline_styles=True, code_format="{code}", clear=True)
+                text = (f'<section id="step-{index + 1}">\n<h3>Step {index + 1} of {total}</h3>\n'
+                        f"<pre><code>{code}</code></pre>\n</section>\n")
+
+            if per_step_output is None:
+                exported.append(text)
+            else:
+                with open(step_file_name(per_step_output, index + 1), "w", encoding="utf-8") as f:
+                    f.write(text)
+    finally:
+        if trace_data is not source:
+            trace_data.close()
+    return exported if per_step_output is None else stop - start
+
+
+def export_trace(trace_data, output, fmt=None, per_step=False, workers=None, width=EXPORT_WIDTH,
+                 chunk_size=CHUNK_SIZE, title="Dryviz Execution Trace", start_method=None):
+    """
+    Renders every step of `trace_data` (a TraceStore, FlightRecorder or
+    TraceFile) to `output` without opening the viewer.
+
+    fmt: "text", "ansi", "html" or "svg"; guessed from the suffix of `output` by default.
+    per_step: write one file per step (trace-000001.html, ...) instead of a
+        single document. SVG is always exported per step.
+    workers: number of worker processes; None uses every core, 1 renders in
+        this process.
+    start_method: how workers are started ("fork", "spawn", "forkserver");
+        None uses the platform's default. Renderers registered at runtime
+        only reach forked workers, and with spawn or forkserver the main
+        script must guard its entry point with `if __name__ == "__main__":`.
+    Returns the number of steps exported.
+    """
+    fmt = export_format(output, fmt)
+    per_step = per_step or fmt == "svg"
+    total = len(trace_data)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    chunks = [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+    per_step_output = output if per_step else None
+
+    if workers <= 1 or len(chunks) <= 1:
+        results = (_export_steps(trace_data, fmt, start, stop, width, per_step_output) for start, stop in chunks)
+        return _write_export(results, output, fmt, per_step, title, total)
+
+    # Workers read the steps from a trace file; in-memory traces are saved to one first.
+    path = getattr(trace_data, "path", None)
+    temporary = None
+    if path is None:
+        fd, temporary = tempfile.mkstemp(suffix=".dryviz")
+        os.close(fd)
+        trace_data.save(temporary)
+        path = temporary
+    from concurrent.futures import ProcessPoolExecutor # Only needed once there is work to spread
+    import multiprocessing
+
+    context = None if start_method is None else multiprocessing.get_context(start_method)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            return _write_export(_ordered_results(executor, path, fmt, chunks, width, per_step_output, workers),
+                                 output, fmt, per_step, title, total)
+    finally:
+        if temporary is not None:
+            os.unlink(temporary)
+
+
+def _ordered_results(executor, path, fmt, chunks, width, per_step_output, workers):
+    """Yields chunk results in order, keeping only a few chunks in flight so memory stays bounded."""
+    pending = deque()
+    chunks = iter(chunks)
+    for start, stop in chunks:
+        pending.append(executor.submit(_export_steps, path, fmt, start, stop, width, per_step_output))
+        if len(pending) >= 2 * workers:
+            break
+    while pending:
+        yield pending.popleft().result()
+        for start, stop in chunks:
+            pending.append(executor.submit(_export_steps, path, fmt, start, stop, width, per_step_output))
+            break
+
+
+def _write_export(results, output, fmt, per_step, title, total):
+    if per_step:
+        for _written in results:
+            pass
+        return total
+
+    from html import escape
+    from rich.terminal_theme import DEFAULT_TERMINAL_THEME
+
+    with open(output, "w", encoding="utf-8") as f:
+        if fmt == "html":
+            f.write(_HTML_HEADER.format(title=escape(title), foreground=DEFAULT_TERMINAL_THEME.foreground_color.hex,
+                                        background=DEFAULT_TERMINAL_THEME.background_color.hex))
+        for texts in results:
+            f.writelines(texts)
+        if fmt == "html":
+            f.write(_HTML_FOOTER)
+    return total
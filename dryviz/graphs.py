@@ -0,0 +1,137 @@
+"""
+Compressed sparse row (CSR) form of adjacency-dict graphs.
+
+The graph views render from arrays instead of walking the dict: node i's
+out-neighbors are targets[offsets[i]:offsets[i + 1]], as indices into
+`nodes`. Conversions of snapshots are cached by snapshot identity, so a
+graph left unchanged between steps is converted once.
+"""
+from array import array
+
+from .snapshot import SnapshotCache, is_snapshot
+
+GRAPH_CACHE_EDGES = 2_000_000 # Budget of the CSR cache, in nodes + edges
+_CSR_CACHE = SnapshotCache(GRAPH_CACHE_EDGES)
+
+
+def _node_key(node):
+    """Nodes are looked up by value; unhashable neighbors (e.g. lists) by their text."""
+    try:
+        hash(node)
+    except TypeError:
+        return repr(node)
+    return node
+
+
+class GraphCSR:
+    """
+    Adjacency dict {node: neighbors} as CSR arrays. Neighbors may be a
+    list, tuple or set of nodes, or a dict of node -> weight; neighbors
+    that are not keys of the dict become nodes without outgoing edges.
+    """
+
+    def __init__(self, graph):
+        self.nodes = [_node_key(node) for node in graph]
+        self.index = {node: position for position, node in enumerate(self.nodes)}
+        self.offsets = array("I", [0])
+        self.targets = array("I")
+        self.weights = None # Edge weights, parallel to `targets`, when any row is a dict
+        self._in_offsets = None
+        self._summary = None
+        index = self.index
+        nodes = self.nodes
+        for neighbors in list(graph.values()):
+            if isinstance(neighbors, dict):
+                if self.weights is None:
+                    self.weights = [None] * len(self.targets)
+                items = neighbors.items()
+            elif isinstance(neighbors, (list, tuple, set, frozenset)):
+                items = ((neighbor, None) for neighbor in neighbors)
+            else:
+                items = () # Not a collection of neighbors
+            for neighbor, weight in items:
+                key = _node_key(neighbor)
+                target = index.get(key)
+                if target is None:
+                    target = index[key] = len(nodes)
+                    nodes.append(key)
+                self.targets.append(target)
+                if self.weights is not None:
+                    self.weights.append(weight)
+            self.offsets.append(len(self.targets))
+        # Nodes only seen as neighbors have no outgoing edges
+        self.offsets.extend([len(self.targets)] * (len(nodes) + 1 - len(self.offsets)))
+
+    @property
+    def node_count(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def out_degree(self, position):
+        return self.offsets[position + 1] - self.offsets[position]
+
+    def out_edges(self, position):
+        """(target position, weight) of the edges leaving node `position`."""
+        start, stop = self.offsets[position], self.offsets[position + 1]
+        weights = self.weights[start:stop] if self.weights is not None else [None] * (stop - start)
+        return list(zip(self.targets[start:stop], weights))
+
+    def _reverse(self):
+        """Builds the transposed CSR arrays (incoming edges), on first use."""
+        if self._in_offsets is None:
+            counts = array("I", bytes(4 * (self.node_count + 1)))
+            for target in self.targets:
+                counts[target + 1] += 1
+            for position in range(self.node_count):
+                counts[position + 1] += counts[position]
+            sources = array("I", bytes(4 * self.edge_count))
+            fill = array("I", counts)
+            for source in range(self.node_count):
+                for edge in range(self.offsets[source], self.offsets[source + 1]):
+                    target = self.targets[edge]
+                    sources[fill[target]] = source
+                    fill[target] += 1
+            self._in_offsets, self._in_sources = counts, sources
+        return self._in_offsets, self._in_sources
+
+    def in_degree(self, position):
+        in_offsets, _sources = self._reverse()
+        return in_offsets[position + 1] - in_offsets[position]
+
+    def in_neighbors(self, position):
+        in_offsets, sources = self._reverse()
+        return sources[in_offsets[position]:in_offsets[position + 1]]
+
+    def summary(self, top=5):
+        """Degree statistics: counts, min/mean/max degrees, isolated nodes, self loops and the `top` hubs."""
+        if self._summary is None:
+            out_degrees = [self.offsets[position + 1] - self.offsets[position] for position in range(self.node_count)]
+            in_offsets, _sources = self._reverse()
+            in_degrees = [in_offsets[position + 1] - in_offsets[position] for position in range(self.node_count)]
+            count = self.node_count or 1
+            self._summary = {
+                "nodes": self.node_count,
+                "edges": self.edge_count,
+                "out_degree": (min(out_degrees, default=0), self.edge_count / count, max(out_degrees, default=0)),
+                "in_degree": (min(in_degrees, default=0), self.edge_count / count, max(in_degrees, default=0)),
+                "isolated": sum(1 for out, incoming in zip(out_degrees, in_degrees) if not out and not incoming),
+                "self_loops": sum(1 for source in range(self.node_count)
+                                  for edge in range(self.offsets[source], self.offsets[source + 1])
+                                  if self.targets[edge] == source),
+                "hubs": sorted(range(self.node_count), key=out_degrees.__getitem__, reverse=True)[:top],
+            }
+        return self._summary
+
+
+def graph_csr(graph):
+    """The GraphCSR of an adjacency dict; cached for snapshots."""
+    if not is_snapshot(graph):
+        return GraphCSR(graph) # A live dict may change at any time
+    csr = _CSR_CACHE.get(graph)
+    if csr is None:
+        csr = GraphCSR(graph)
+        _CSR_CACHE.put(graph, csr, csr.node_count + csr.edge_count)
+    return csr
@@ -0,0 +1,111 @@
+"""
+Per-line profile of a traced session.
+
+Every line event bumps a counter for its (file, line) and charges the
+time since the previous traced line to that previous line ("self" time).
+The time from a line until the next line at the same or a shallower call
+depth is its "cumulative" time (nested decorated calls included). Time
+spent by dryviz itself (snapshots, encoding) is left out of both.
+"""
+import csv
+import json
+import os
+import threading
+import time
+
+
+class _ThreadClock:
+    """Where one thread is: its previous line, when tracing resumed, and the lines still open per depth."""
+
+    __slots__ = ("previous", "resumed", "open", "clock")
+
+    def __init__(self):
+        self.previous = None # Entry of the previous line event
+        self.resumed = 0.0 # perf_counter() when the traced code resumed after it
+        self.open = [] # (depth, entry, clock when it started) of lines whose cumulative time is running
+        self.clock = 0.0 # Traced time so far, dryviz's own time excluded
+
+
+class LineProfile:
+    """
+    Hit counts, self and cumulative time, and hits per call depth, for each
+    (file, line) a session ran. Entries are lists [hits, self seconds,
+    cumulative seconds, {depth: hits}].
+    """
+
+    def __init__(self):
+        self.lines = {} # (filename, lineno) -> entry
+        self._threads = {} # thread id -> _ThreadClock
+
+    def __len__(self):
+        return len(self.lines)
+
+    def hit(self, filename, lineno, depth, now):
+        """
+        Counts a line event. `now` is when the event arrived, taken before
+        any capture work; the time until this call returns is not charged.
+        """
+        state = self._threads.get(threading.get_ident())
+        if state is None:
+            state = self._threads[threading.get_ident()] = _ThreadClock()
+        if state.previous is not None:
+            elapsed = now - state.resumed
+            state.clock += elapsed
+            state.previous[1] += elapsed
+        clock = state.clock
+        opened = state.open
+        while opened and opened[-1][0] >= depth: # Lines at this depth or deeper have finished
+            _depth, entry, started = opened.pop()
+            entry[2] += clock - started
+
+        key = (filename, lineno)
+        entry = self.lines.get(key)
+        if entry is None:
+            entry = self.lines[key] = [0, 0.0, 0.0, {}]
+        entry[0] += 1
+        depths = entry[3]
+        depths[depth] = depths.get(depth, 0) + 1
+        opened.append((depth, entry, clock))
+        state.previous = entry
+        state.resumed = time.perf_counter()
+
+    def close(self, now=None):
+        """Charges the last line of every thread and closes the lines still open (the session ended)."""
+        now = time.perf_counter() if now is None else now
+        for state in self._threads.values():
+            if state.previous is not None:
+                elapsed = now - state.resumed
+                state.clock += elapsed
+                state.previous[1] += elapsed
+                state.previous = None
+            for _depth, entry, started in state.open:
+                entry[2] += state.clock - started
+            state.open.clear()
+
+    def files(self):
+        """Profiled files, most hit first."""
+        hits = {}
+        for (filename, _lineno), entry in self.lines.items():
+            hits[filename] = hits.get(filename, 0) + entry[0]
+        return sorted(hits, key=hits.get, reverse=True)
+
+    def rows(self):
+        """The profile as a list of dicts, one per line, in file and line order."""
+        return [{"file": filename, "line": lineno, "hits": hits, "self_time": self_time,
+                 "cumulative_time": cumulative_time, "depths": dict(sorted(depths.items()))}
+                for (filename, lineno), (hits, self_time, cumulative_time, depths) in sorted(self.lines.items())]
+
+    def save(self, path):
+        """Writes the profile to a .json file (list of rows) or a .csv file (depths as "depth:hits" pairs)."""
+        rows = self.rows()
+        if os.fspath(path).lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["file", "line", "hits", "self_time", "cumulative_time", "depths"])
+                writer.writeheader()
+                for row in rows:
+                    row["depths"] = " ".join(f"{depth}:{hits}" for depth, hits in row["depths"].items())
+                    writer.writerow(row)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=1)
+                f.write("\n")
@@ -0,0 +1,150 @@
+"""
+Time-travel queries over a trace.
+
+A ChangeIndex maps every variable to the steps where its binding changed
+(set to a different value, or removed). Traces build it while they are
+captured and trace files store it in their index, so "when did `stack`
+change" is a lookup. Predicates such as `len(stack) > 10` only depend on
+the variables they name, so they are evaluated once per change of those
+variables instead of at every step.
+"""
+import builtins
+from array import array
+from bisect import bisect_left, bisect_right
+from types import CodeType
+
+_MISSING = object()
+_NO_STEPS = array("I")
+
+
+class ChangeIndex:
+    """
+    Steps at which each variable changed, in order.
+    `exact` tells whether unchanged bindings are the very same objects from
+    one record to the next (in-memory traces); otherwise keyframes are
+    compared by value, which may report some unchanged objects as changed.
+    """
+
+    def __init__(self, exact=True):
+        self.exact = exact
+        self.steps = {} # name -> array of step indices
+        self.count = 0 # Steps indexed so far
+        self._state = {} # Bindings as of the last indexed step
+
+    def append(self, record):
+        """Indexes the next step's StepRecord."""
+        state = self._state
+        if record.keyframe:
+            changed = [var_name for var_name, value in record.changed.items()
+                       if not self._unchanged(state.get(var_name, _MISSING), value)]
+            removed = [var_name for var_name in state if var_name not in record.changed]
+            state.clear()
+            state.update(record.changed)
+        else:
+            changed = record.changed
+            removed = record.removed
+            state.update(changed)
+            for var_name in removed:
+                state.pop(var_name, None)
+        for var_name in (*changed, *removed):
+            steps = self.steps.get(var_name)
+            if steps is None:
+                steps = self.steps[var_name] = array("I")
+            steps.append(self.count)
+        self.count += 1
+
+    def _unchanged(self, previous, value):
+        if previous is value:
+            return True
+        if self.exact or previous is _MISSING:
+            return False
+        try:
+            return type(previous) is type(value) and bool(previous == value)
+        except Exception:
+            return False
+
+    def extend(self, trace):
+        """Indexes the steps of `trace` (a StepSequence) added since the last call."""
+        for index in range(self.count, len(trace)):
+            self.append(trace.record_at(index))
+
+    def changes(self, var_name):
+        """Steps at which `var_name` changed, in order."""
+        return self.steps.get(var_name, _NO_STEPS)
+
+    def next_change(self, var_name, index, backward=False):
+        """The first change of `var_name` after step `index` (or the last one before it), or None."""
+        steps = self.changes(var_name)
+        if backward:
+            position = bisect_left(steps, index)
+            return steps[position - 1] if position else None
+        position = bisect_right(steps, index)
+        return steps[position] if position < len(steps) else None
+
+
+def _referenced_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType): # Comprehensions and lambdas look up outer names as globals
+            names |= _referenced_names(const)
+    return names
+
+
+class Query:
+    """
+    A predicate over the variables of a step, e.g. `len(stack) > 10` or
+    `x is None`. Evaluating it raises nothing: errors (a variable not bound
+    yet, a wrong type) count as False.
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.code = compile(expr, f"<dryviz query {expr!r}>", "eval")
+        self.names = _referenced_names(self.code)
+
+    def test(self, variables):
+        namespace = dict(variables)
+        namespace["__builtins__"] = builtins
+        try:
+            return bool(eval(self.code, namespace))
+        except Exception:
+            return False
+
+
+def find(trace, query, start=0, backward=False):
+    """
+    Finds where `query` (a Query or an expression) becomes true: the first
+    step of the first run of matching steps starting at or after `start`,
+    or with `backward` the closest run starting at or before it. Returns
+    None if there is none.
+
+    The state the predicate sees only changes at the change steps of the
+    variables it names, so only those steps are evaluated.
+    """
+    if isinstance(query, str):
+        query = Query(query)
+    total = len(trace)
+    if total == 0:
+        return None
+    index = trace.change_index()
+    boundaries = {0}
+    for var_name in query.names:
+        boundaries.update(index.changes(var_name))
+    boundaries = sorted(boundaries)
+
+    results = {} # boundary position -> predicate value
+    def holds(position):
+        if position < 0:
+            return False
+        if position not in results:
+            results[position] = query.test(trace.state_at(boundaries[position]))
+        return results[position]
+
+    if backward:
+        positions = range(bisect_right(boundaries, start) - 1, -1, -1)
+    else:
+        positions = range(bisect_left(boundaries, start), len(boundaries))
+    for position in positions:
+        if holds(position) and not holds(position - 1):
+            return boundaries[position]
+    return None
@@ -0,0 +1,276 @@
+import linecache
+import time
+from collections import OrderedDict
+from rich.console import Console, Group # Changed import for Group
+from rich.text import Text
+from rich.tree import Tree
+from .snapshot import LINKED_LIST, TREE, is_snapshot, node_layout, type_name
+from .stats import RENDER_STATS, renderer_name
+from .visuals import (render_linked_list, render_tree, render_graph, render_stack, render_dict, shape_fingerprint,
+                      RENDER_MEMO, clear_render_caches, is_windowed, windowed_text, graph_focus, set_step_focus)
+
+console = Console()
+
+# Renderer Registry
+RENDERER_REGISTRY = []
+
+# Renderers to try per (variable name, type, shape fingerprint), see _renderer_plan; () means default text.
+_RENDERER_CACHE = {}
+DISPATCH_CACHE_SIZE = 4096
+_PER_VALUE_CONDITIONS = set() # Conditions checked on every value, not cached
+
+def register_renderer(condition_func, render_func, cacheable=False):
+    """
+    Registers a new renderer strategy.
+    `condition_func(name, value)` is checked on every value, unless
+    `cacheable` says it only depends on what dispatch is cached by: the
+    name, the type and the shape_fingerprint() of the value.
+    """
+    RENDERER_REGISTRY.append((condition_func, render_func))
+    if not cacheable:
+        _PER_VALUE_CONDITIONS.add(condition_func)
+    _RENDERER_CACHE.clear()
+    clear_render_caches()
+
+# --- Condition and Render Functions for Specific Types (Modified to return renderables) ---
+
+def _can_render_linked_list(var_name, var_value):
+    layout = node_layout(var_value)
+    if layout is not None: # Declared nodes render by their shape, whatever the variable is called
+        return layout.shape == LINKED_LIST
+    return var_name == 'head'
+
+def _render_linked_list_var(var_name, var_value):
+    # Returns a Rich Group containing the variable name and its visualization
+    return Group(Text(f"  {var_name}:"), render_linked_list(var_value))
+
+def _is_graph_like_dict(var_value):
+    if not isinstance(var_value, dict) or not var_value:
+        return False
+    for _, v_list in var_value.items(): # Mark _ as unused
+        if not isinstance(v_list, list):
+            return False
+    return any(var_value.values())
+
+def _can_render_graph_dict(_var_name, var_value): # Mark _var_name as unused
+    return _is_graph_like_dict(var_value)
+
+def _render_graph_dict_var(var_name, var_value):
+    # Returns a Rich Group
+    return Group(Text(f"  {var_name} (Graph):"), render_graph(var_value, name=var_name))
+
+def _can_render_generic_dict(_var_name, var_value): # Mark _var_name as unused
+    return isinstance(var_value, dict)
+
+def _render_generic_dict_var(var_name, var_value):
+    # Returns a Rich Group
+    return Group(Text(f"  {var_name} (Dictionary):"), render_dict(var_value, name=var_name))
+
+def _can_render_stack(var_name, var_value):
+    return isinstance(var_value, list) and var_name.lower() in ['stack', 's', 'stk']
+
+def _render_stack_var(var_name, var_value):
+    # Returns a Rich Group
+    return Group(Text(f"  {var_name} (Stack):"), render_stack(var_value, name=var_name))
+
+def _can_render_tree_node(var_name, var_value):
+    layout = node_layout(var_value)
+    if layout is not None:
+        return layout.shape == TREE
+    if var_name == 'head' and hasattr(var_value, 'next'):
+        return False
+    return hasattr(var_value, 'value') and \
+           (hasattr(var_value, 'children') or \
+            hasattr(var_value, 'left') or \
+            hasattr(var_value, 'right'))
+
+def _render_tree_node_var(var_name, var_value):
+    # Returns a Rich Group
+    return Group(Text(f"  {var_name} (Tree):"), render_tree(var_value, name=var_name))
+
+# Register renderers (order matters)
+register_renderer(_can_render_linked_list, _render_linked_list_var, cacheable=True)
+register_renderer(_can_render_graph_dict, _render_graph_dict_var, cacheable=True)
+register_renderer(_can_render_generic_dict, _render_generic_dict_var, cacheable=True)
+register_renderer(_can_render_stack, _render_stack_var, cacheable=True)
+register_renderer(_can_render_tree_node, _render_tree_node_var, cacheable=True)
+
+
+def _renderable_weight(renderable):
+    """Number of Rich tree nodes (or plain renderables) making up a renderable."""
+    weight = 0
+    pending = [renderable]
+    while pending:
+        item = pending.pop()
+        weight += 1
+        if isinstance(item, Group):
+            pending.extend(item.renderables)
+        elif isinstance(item, Tree):
+            pending.extend(item.children)
+    return weight
+
+
+def _render_variable(var_name, var_value):
+    """
+    Helper function to get a renderable for a single variable using the registry.
+    Renderables of snapshots are memoized: a structure left unchanged between
+    steps keeps its snapshot, so it is rendered once and then reused.
+    """
+    if not is_snapshot(var_value):
+        return _render_variable_uncached(var_name, var_value)
+    # Graphs highlight the nodes held by the step's other variables, so those are part of the key
+    focus = graph_focus(var_value)
+    tag = (var_name, focus) if focus else var_name
+    renderable = RENDER_MEMO.get(var_value, tag)
+    if renderable is not None:
+        RENDER_STATS.memo_hits += 1
+    else:
+        renderable = _render_variable_uncached(var_name, var_value)
+        RENDER_MEMO.put(var_value, renderable, _renderable_weight(renderable), tag)
+    return renderable
+
+
+def _renderer_plan(var_name, var_value):
+    """
+    The renderers to try for values dispatched like this one: those whose
+    condition is checked per value, in registry order, up to the first
+    cacheable condition that holds (stored as None: it holds for them all).
+    """
+    plan = []
+    for can_render, candidate in RENDERER_REGISTRY:
+        if can_render in _PER_VALUE_CONDITIONS:
+            plan.append((can_render, candidate))
+        elif can_render(var_name, var_value):
+            plan.append((None, candidate))
+            break
+    return tuple(plan)
+
+
+def _render_variable_uncached(var_name, var_value):
+    start = time.perf_counter()
+    cache_key = (var_name, type(var_value), shape_fingerprint(var_value))
+    try:
+        plan = _RENDERER_CACHE[cache_key]
+    except KeyError:
+        plan = _renderer_plan(var_name, var_value)
+        if len(_RENDERER_CACHE) >= DISPATCH_CACHE_SIZE:
+            _RENDERER_CACHE.clear()
+        _RENDERER_CACHE[cache_key] = plan
+    render_func = None
+    for can_render, candidate in plan:
+        if can_render is None or can_render(var_name, var_value):
+            render_func = candidate
+            break
+    dispatched = time.perf_counter()
+    RENDER_STATS.dispatch_time += dispatched - start
+
+    if render_func is not None:
+        renderable = render_func(var_name, var_value) # Return the Rich object
+    else:
+        # Default representation for other variables
+        try:
+            text = windowed_text(var_value) if is_windowed(var_value) else var_value # Large containers: window only
+            renderable = Text(f"  {var_name}: {text}")
+        except (TypeError, ValueError, AttributeError) as e:
+            renderable = Text(f"  {var_name}: <Object of type {type_name(var_value)}> (Error rendering: {e})")
+    RENDER_STATS.add(renderer_name(render_func), time.perf_counter() - dispatched)
+    return renderable
+
+
+def render_step(step, call_info=None):
+    """
+    Build the list of renderables shown for a single captured step.
+    `call_info` (a CallInfo) names the decorated call the step belongs to.
+    """
+    line_header = Text.from_markup(f"[bold cyan]Line {step.lineno}[/]")
+    if call_info is not None:
+        # Threads adopted by a session are pseudo-calls named "<thread>"
+        name = call_info.name if call_info.name.startswith("<") else f"{call_info.name}()"
+        line_header.append(f" in {name}", style="green")
+        if call_info.context and call_info.context != "MainThread":
+            line_header.append(f" [{call_info.context}]", style="magenta")
+        if step.depth:
+            line_header.append(f"  depth {step.depth}, call #{step.call}", style="dim")
+    line_header.append(":")
+    step_renderables = [line_header]
+    set_step_focus(step.variables)
+    try:
+        for var_name, var_value in step.variables.items():
+            renderable = _render_variable(var_name, var_value)
+            if renderable: # Ensure renderable is not None
+                step_renderables.append(renderable)
+    finally:
+        set_step_focus({})
+    return step_renderables
+
+
+HEATMAP_MAX_LINES = 500 # Source lines shown per profiled file
+_HEAT_STYLES = ("grey50", "yellow", "orange1", "red") # Cold to hot
+
+def render_profile(profile, current_line=None):
+    """
+    Source heatmap of a LineProfile: for each profiled file, the span of
+    lines that ran with their hits, self and cumulative time, hits per call
+    depth and a heat bar. `current_line` (the viewer's step) is marked.
+    """
+    from rich.table import Table
+
+    by_file = {}
+    for (filename, lineno), entry in profile.lines.items():
+        by_file.setdefault(filename, {})[lineno] = entry
+    tables = []
+    for filename in profile.files():
+        entries = by_file[filename]
+        most_hits = max(entry[0] for entry in entries.values())
+        first = min(entries)
+        last = min(max(entries), first + HEATMAP_MAX_LINES - 1)
+        table = Table(title=filename, title_justify="left", box=None, show_edge=False, pad_edge=False)
+        for column in ("", "line", "hits", "self ms", "cum ms", "depths", "heat"):
+            table.add_column(column, justify="right" if column in ("line", "hits", "self ms", "cum ms") else "left")
+        table.add_column("source", no_wrap=True)
+        for lineno in range(first, last + 1):
+            source = linecache.getline(filename, lineno).rstrip()
+            entry = entries.get(lineno)
+            marker = "▶" if lineno == current_line else ""
+            if entry is None:
+                table.add_row(marker, str(lineno), "", "", "", "", "", Text(source, style="dim"))
+                continue
+            hits, self_time, cumulative_time, depths = entry
+            ratio = hits / most_hits
+            style = _HEAT_STYLES[min(int(ratio * len(_HEAT_STYLES)), len(_HEAT_STYLES) - 1)]
+            depth_text = " ".join(f"{depth}:{count}" for depth, count in sorted(depths.items())[:4])
+            if len(depths) > 4:
+                depth_text += " …"
+            table.add_row(marker, str(lineno), f"{hits:,}", f"{self_time * 1e3:.2f}", f"{cumulative_time * 1e3:.2f}",
+                          depth_text, Text("█" * max(round(ratio * 8), 1), style=style),
+                          Text(source, style="bold" if lineno == current_line else ""))
+        tables.append(table)
+    if not tables:
+        return Text("No line events were profiled", style="dim")
+    return Group(*tables)
+
+
+class StepRenderCache:
+    """
+    LRU cache of rendered steps.
+    Steps are only turned into Rich objects when the viewer asks for them.
+    """
+
+    def __init__(self, trace, maxsize=256):
+        self.trace = trace
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.trace)
+
+    def __getitem__(self, index):
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+        step = self.trace[index]
+        renderables = render_step(step, self.trace.calls.get(step.call))
+        self._cache[index] = renderables
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return renderables
@@ -0,0 +1,70 @@
+import time
+
+
+def _expand_lines(lines):
+    """Turns [12, (20, 30), range(40, 45)] into a frozenset of line numbers (ranges inclusive)."""
+    if lines is None:
+        return None
+    if isinstance(lines, int):
+        lines = [lines]
+    expanded = set()
+    for entry in lines:
+        if isinstance(entry, int):
+            expanded.add(entry)
+        elif isinstance(entry, range):
+            expanded.update(entry)
+        else:
+            start, end = entry
+            expanded.update(range(start, end + 1))
+    return frozenset(expanded)
+
+
+class CaptureBudget:
+    """
+    Decides which line events of a traced call become steps.
+
+        every:       capture every Nth line event (after the `lines` filter).
+        lines:       only capture these line numbers; ints, (start, end)
+                     tuples (inclusive) or ranges.
+        max_steps:   stop capturing after this many steps.
+        time_budget: stop capturing after this many seconds of wall-clock time.
+
+    Once a budget is exhausted the tracer is switched off for the rest of the
+    call, so the remaining lines run at native speed.
+    """
+
+    def __init__(self, every=1, lines=None, max_steps=None, time_budget=None):
+        if every < 1:
+            raise ValueError("every must be a positive integer")
+        self.every = every
+        self.lines = _expand_lines(lines)
+        self.max_steps = max_steps
+        self.time_budget = time_budget
+        self.events = 0 # Line events that passed the line filter
+        self.captured = 0
+        self.exhausted = None # Why capture stopped: "max_steps" or "time_budget"
+        self._deadline = None
+
+    @property
+    def unlimited(self):
+        return self.every == 1 and self.lines is None and self.max_steps is None and self.time_budget is None
+
+    def start(self):
+        self._deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+
+    def wants_line(self, lineno):
+        return self.lines is None or lineno in self.lines
+
+    def should_capture(self):
+        """Counts a line event and says whether to capture it; sets `exhausted` when a budget runs out."""
+        self.events += 1
+        if (self.events - 1) % self.every:
+            return False
+        if self.max_steps is not None and self.captured >= self.max_steps:
+            self.exhausted = "max_steps"
+            return False
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            self.exhausted = "time_budget"
+            return False
+        self.captured += 1
+        return True
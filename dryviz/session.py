@@ -0,0 +1,404 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+import warnings
+
+from .backends import SKIP_LINE, SetTraceBackend, make_backend
+from .profile import LineProfile
+from .sampling import CaptureBudget
+from .stats import RENDER_STATS, TraceStats, retained_bytes
+from .streaming import StreamingWriter, connect_viewer
+from .trace import CallInfo, FlightRecorder, TraceStore
+from .tracefile import TraceFile
+
+# (session, call id, depth, adopted thread?) of the decorated call running
+# here. A ContextVar is per thread and copied into every asyncio task, so
+# sessions in other threads, and other tasks sharing this thread, never see
+# each other's calls.
+_current_call = contextvars.ContextVar("dryviz_current_call", default=None)
+_finished = threading.local() # .session: the last session that finished in this thread
+
+
+def current_session():
+    """The session collecting steps in this thread / task right now, or None outside of any decorated call."""
+    state = _current_call.get()
+    if state is None or state[0].finished:
+        return None
+    return state[0]
+
+
+def last_session():
+    """The session that most recently finished in this thread (e.g. to read its `stats()`), or None."""
+    return getattr(_finished, "session", None)
+
+
+def _context_name():
+    """Name of the asyncio task running this code, else of the current thread."""
+    asyncio = sys.modules.get("asyncio") # No task can be running if asyncio was never imported
+    if asyncio is not None:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError: # No running event loop in this thread
+            task = None
+        if task is not None:
+            return task.get_name()
+    return threading.current_thread().name
+
+
+def _export(trace_data, output, **options):
+    """
+    export_trace for a decorated call. Workers are only forked on Linux from
+    a single-threaded process: fork is unsafe on macOS (hence its spawn
+    default) and can deadlock with other threads running. Anywhere else the
+    steps are rendered in this process, as workers started the platform's
+    default way would re-import a main script that may have no
+    `if __name__ == "__main__":` guard.
+    """
+    from .export import export_trace
+
+    if sys.platform.startswith("linux") and threading.active_count() == 1:
+        options["start_method"] = "fork"
+    else:
+        options["workers"] = 1
+    return export_trace(trace_data, output, **options)
+
+
+def make_trace_sink(options):
+    """
+    Creates the object the tracer appends steps to, according to the decorator
+    options; None (with a RuntimeWarning) when no live viewer is listening.
+    """
+    if options["mode"] == "flight_recorder":
+        # Only the last N steps are kept, and only published if the call raises.
+        return FlightRecorder(options["last"])
+    if options["viewer"] is not None:
+        # Live mode: steps stream to a `python -m dryviz serve` process, which renders them as they come.
+        try:
+            stream = connect_viewer(options["viewer"])
+        except ConnectionError as e:
+            warnings.warn(f"{e}; running untraced", RuntimeWarning, stacklevel=5)
+            return None
+        return StreamingWriter(stream, queue_size=options["queue_size"], policy=options["backpressure"], live=True)
+    if options["trace_file"] is not None:
+        # Recording mode: steps stream to disk from a background thread, no terminal needed.
+        # View them later with `python -m dryviz view`.
+        return StreamingWriter(options["trace_file"], queue_size=options["queue_size"],
+                               policy=options["backpressure"])
+    return TraceStore() # Compact per-step snapshots; rendered lazily by the app
+
+
+class TraceSession:
+    """
+    One trace: the outermost decorated call plus every decorated call made
+    while it runs (recursion included). Nested calls join this session as
+    entries of its call tree instead of installing their own tracer, and a
+    single viewer opens when the outermost call returns. The outermost
+    call's options apply to the whole session.
+
+    Calls are tracked per thread and per asyncio task, so concurrent
+    sessions don't mix. With the `threads` option, threads started while
+    the session runs join it: each gets a call tree entry named after the
+    thread, and the code they run from the decorated functions' source
+    files is traced too.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.trace_data = make_trace_sink(options)
+        self.budget = CaptureBudget(options["every"], options["lines"], options["max_steps"], options["time_budget"])
+        self.watch = options["watch"]
+        self.threads = options["threads"]
+        self.backend = None
+        self.finished = False
+        self.counters = TraceStats()
+        # Per-line hits and timings, collected alongside the steps or, in "profile" mode, instead of them
+        self.profile = LineProfile() if options["profile"] or options["mode"] == "profile" else None
+        self._call_count = 0
+        self._lock = threading.Lock() # Call ids, and steps captured by several threads at once
+        self._previous_thread_hook = None
+        self._start_time = None
+
+    def _make_capture(self):
+        trace_data = self.trace_data
+        budget = self.budget
+        watch = self.watch
+        counters = self.counters
+        perf_counter = time.perf_counter
+
+        if self.options["mode"] == "profile":
+            def capture(_frame, _lineno, _call, _depth):
+                counters.events += 1
+        elif budget.unlimited and watch is None:
+            def capture(frame, lineno, call, depth):
+                counters.events += 1
+                start = perf_counter()
+                trace_data.append(lineno, frame.f_locals, call, depth)
+                counters.capture_time += perf_counter() - start
+                counters.captured += 1
+        elif budget.unlimited:
+            def capture(frame, lineno, call, depth):
+                counters.events += 1
+                start = perf_counter()
+                trace_data.append(lineno, watch.collect(frame), call, depth)
+                counters.capture_time += perf_counter() - start
+                counters.captured += 1
+        else:
+            def capture(frame, lineno, call, depth):
+                counters.events += 1
+                if not budget.wants_line(lineno):
+                    return SKIP_LINE
+                if budget.should_capture():
+                    start = perf_counter()
+                    trace_data.append(lineno, frame.f_locals if watch is None else watch.collect(frame), call, depth)
+                    counters.capture_time += perf_counter() - start
+                    counters.captured += 1
+                elif budget.exhausted:
+                    self.backend.detach(frame) # Run the rest of the call untraced
+                return None
+        if self.profile is None:
+            return capture
+
+        hit = self.profile.hit
+        capture_step = capture
+        def capture(frame, lineno, call, depth):
+            now = perf_counter() # Before the snapshot, whose cost is not charged to the line
+            result = capture_step(frame, lineno, call, depth)
+            hit(frame.f_code.co_filename, lineno, depth, now)
+            return None if result is SKIP_LINE else result # Lines not captured are still counted
+        return capture
+
+    def _make_line_handler(self):
+        capture = self._make_capture()
+        current_call = _current_call
+        session = self
+
+        if not self.threads:
+            def on_line(frame, lineno):
+                state = current_call.get()
+                if state is None or state[0] is not session:
+                    return None # Another session's thread or task running the same code
+                return capture(frame, lineno, state[1], state[2])
+            return on_line
+
+        lock = self._lock
+        def on_line(frame, lineno):
+            state = current_call.get()
+            if state is None or state[0] is not session:
+                return None
+            if not state[3] and frame.f_code not in session.backend.codes:
+                return None # Other code from the traced files only counts in adopted threads
+            with lock: # The delta encoder and snapshot engine are shared by every thread
+                return capture(frame, lineno, state[1], state[2])
+        return on_line
+
+    def _in_adopted_thread(self):
+        state = _current_call.get()
+        return state is not None and state[0] is self and state[3]
+
+    def _start(self, code):
+        # sys.monitoring on 3.12+, scoped to the decorated code objects; sys.settrace otherwise
+        on_line = self._make_line_handler()
+        self.backend = make_backend(code, on_line)
+        if self.threads:
+            self.backend.trace_files({code.co_filename}, self._in_adopted_thread)
+            self._previous_thread_hook = threading.gettrace()
+            threading.settrace(self._adopt_thread)
+        self._start_time = time.perf_counter()
+        self.budget.start()
+        try:
+            self.backend.start()
+        except RuntimeError: # Every sys.monitoring tool id is taken, e.g. by sessions in other threads
+            files = self.backend.files
+            self.backend = SetTraceBackend(code, on_line)
+            if self.threads:
+                self.backend.trace_files(files, self._in_adopted_thread)
+            self.backend.start()
+
+    def _finish(self, error):
+        """Stops tracing and publishes the trace; returns the viewer to run, if any."""
+        self.backend.stop()
+        if self.profile is not None:
+            self.profile.close()
+        if self.threads:
+            threading.settrace(self._previous_thread_hook)
+        self.counters.wall_time = time.perf_counter() - self._start_time
+        self.finished = True
+        _finished.session = self
+        return self.publish(error)
+
+    def _finish_raising(self, error):
+        """
+        _finish while `error` (any BaseException) propagates out of the call.
+        The error is what the caller must see: a failure to publish only
+        warns, and no viewer opens on the way out of KeyboardInterrupt or
+        SystemExit.
+        """
+        try:
+            app = self._finish(error)
+        except Exception as e:
+            warnings.warn(f"dryviz could not publish the trace: {e!r}", RuntimeWarning, stacklevel=3)
+            return None
+        return app if isinstance(error, Exception) else None
+
+    def run(self, code, wrapped, args, kwargs):
+        """Runs the outermost decorated call, then publishes the trace."""
+        if self.trace_data is None: # Nowhere to send the steps
+            return wrapped(*args, **kwargs)
+        self._start(code)
+        error = None
+        try:
+            return self.run_call(code, wrapped, args, kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            app = self._finish(error) if error is None else self._finish_raising(error)
+            if app is not None:
+                app.run() # This will block until the app is quit
+
+    async def run_async(self, code, wrapped, args, kwargs):
+        """Runs the outermost decorated coroutine, traced across its awaits, then publishes the trace."""
+        if self.trace_data is None:
+            return await wrapped(*args, **kwargs)
+        self._start(code)
+        error = None
+        try:
+            return await self.run_call_async(code, wrapped, args, kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            app = self._finish(error) if error is None else self._finish_raising(error)
+            if app is not None:
+                await app.run_async() # Already inside an event loop
+
+    def _new_call(self, parent, depth, name, context):
+        with self._lock:
+            call = self._call_count
+            self._call_count += 1
+        self.trace_data.add_call(CallInfo(call, parent, depth, name, context))
+        return call
+
+    def _enter_call(self, code, wrapped):
+        self.backend.add_code(code)
+        if self.threads and code.co_filename not in self.backend.files:
+            self.backend.trace_files(self.backend.files | {code.co_filename}, self._in_adopted_thread)
+        state = _current_call.get()
+        if state is not None and state[0] is self:
+            parent, depth, adopted = state[1], state[2] + 1, state[3]
+        else:
+            parent, depth, adopted = None, 0, False
+        name = getattr(wrapped, "__qualname__", getattr(wrapped, "__name__", repr(wrapped)))
+        call = self._new_call(parent, depth, name, _context_name())
+        return _current_call.set((self, call, depth, adopted))
+
+    def run_call(self, code, wrapped, args, kwargs):
+        """Runs a decorated call (the outermost one or a nested one) as a node of the call tree."""
+        token = self._enter_call(code, wrapped)
+        try:
+            return wrapped(*args, **kwargs)
+        finally:
+            _current_call.reset(token)
+
+    async def run_call_async(self, code, wrapped, args, kwargs):
+        """Awaits a decorated coroutine as a node of the call tree."""
+        token = self._enter_call(code, wrapped)
+        try:
+            return await wrapped(*args, **kwargs)
+        finally:
+            _current_call.reset(token)
+
+    def _adopt_thread(self, frame, event, arg):
+        """threading.settrace hook, run first thing in every thread started during the session."""
+        sys.settrace(None)
+        if self.finished:
+            return None
+        thread = threading.current_thread()
+        call = self._new_call(0, 1, "<thread>", thread.name) # A child of the outermost call
+        _current_call.set((self, call, 1, True))
+        return self.backend.adopt_thread(frame, event, arg)
+
+    def stats(self):
+        """
+        Self-profiling counters of this session, e.g. to tune watch lists,
+        budgets and custom renderers:
+            events / captured: line events seen by the tracer / turned into steps
+            capture_time: seconds spent snapshotting and encoding steps
+            wall_time: seconds the outermost call took, tracing included
+            retained_bytes: approximate memory (or file bytes) held by the trace
+            render: dispatch time, per-renderer calls and time, memo hits
+                    (process-wide, filled as steps are rendered)
+        """
+        counters = self.counters
+        return {
+            "backend": None if self.backend is None else self.backend.name,
+            "calls": self._call_count,
+            "events": counters.events,
+            "captured": counters.captured,
+            "skipped": counters.events - counters.captured,
+            "capture_time": counters.capture_time,
+            "capture_time_per_step": counters.capture_time / counters.captured if counters.captured else 0.0,
+            "wall_time": counters.wall_time,
+            "budget_exhausted": self.budget.exhausted,
+            "dropped": getattr(self.trace_data, "dropped", 0),
+            "retained_bytes": retained_bytes(self.trace_data),
+            "render": RENDER_STATS.as_dict(),
+        }
+
+    def publish(self, error):
+        """
+        Hands the finished trace to its consumer: a file, an export, or the
+        viewer. Returns the viewer app for the caller to run, or None.
+        """
+        options = self.options
+        trace_data = self.trace_data
+        output = options["output"]
+        save_profile = isinstance(options["profile"], (str, os.PathLike))
+        if save_profile:
+            self.profile.save(options["profile"])
+        if options["mode"] == "profile":
+            if save_profile:
+                return None
+            from .app import DryvizTraceApp
+
+            app = DryvizTraceApp(trace_data=trace_data, stats=self.stats(), profile=self.profile)
+            app.title = "Dryviz Line Profile"
+            return app
+        if options["mode"] == "flight_recorder":
+            if error is None:
+                return None # Successful calls discard the ring buffer
+            if options["trace_file"] is not None:
+                trace_data.save(options["trace_file"])
+            if options["viewer"] is not None:
+                with connect_viewer(options["viewer"]) as stream:
+                    trace_data.save(stream)
+                return None
+            if output is not None:
+                _export(trace_data, output, title=f"Dryviz Flight Recorder - {type(error).__name__}: {error}")
+            if options["trace_file"] is not None or output is not None:
+                return None
+            from .app import DryvizTraceApp # Textual and rich are only imported once there is something to show
+
+            app = DryvizTraceApp(trace_data=trace_data, stats=self.stats(), profile=self.profile)
+            app.title = (f"Dryviz Flight Recorder - {type(error).__name__}: {error} "
+                         f"(last {len(trace_data)} of {trace_data.total} steps)")
+            return app
+
+        if options["viewer"] is not None:
+            trace_data.close() # Ends the stream; the viewer keeps showing it
+        elif options["trace_file"] is not None:
+            trace_data.close()
+            if output is not None and isinstance(options["trace_file"], (str, os.PathLike)):
+                with TraceFile(options["trace_file"]) as saved:
+                    _export(saved, output)
+        elif output is not None:
+            # Headless: render the steps to a file instead of opening the viewer.
+            _export(trace_data, output)
+        elif error is None and trace_data:
+            from .app import DryvizTraceApp
+
+            # After function execution, launch the Textual app
+            return DryvizTraceApp(trace_data=trace_data, stats=self.stats(), profile=self.profile)
+        return None
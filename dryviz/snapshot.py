@@ -0,0 +1,647 @@
+"""
+Immutable, structurally shared snapshots of captured values.
+
+Lists, dicts, sets, tuples and node objects (linked list / tree nodes: a
+value attribute plus next/left/right/children, or a declared node class)
+are turned into frozen stand-ins that keep the same shape:
+snapshots of lists are still lists, dicts are still dicts, and object
+snapshots expose the same attributes, so the renderers work on them
+unchanged. Snapshots are keyed by the identity of the live object; a
+structure whose children are all unchanged since the previous capture
+reuses the previous snapshot, so unchanged substructures are shared
+between steps instead of copied. Other objects (services, loggers, parsers
+held by `self`, ...) are opaque: they are not walked, only their text
+(if their class defines __str__ or __repr__) is saved; objects without
+text of their own are kept by reference.
+
+Classes can declare their node layout once, with register_node() or a
+`__dryviz_snapshot__` class attribute or method, instead of having their attributes
+discovered and their shape guessed from attribute names at every step.
+"""
+import copy
+import enum
+import operator
+import types
+from collections import OrderedDict, namedtuple
+
+_MISSING = object()
+
+# How a type is captured
+ATOM = "atom"     # immutable, kept as is
+LIST = "list"
+TUPLE = "tuple"
+DICT = "dict"
+SET = "set"
+OBJECT = "object" # instance of a user class: captured as a NodeSnapshot if it is a node, else kept by reference
+COPY = "copy"     # other builtin types: deep-copied (or kept by reference if that fails)
+
+# Undeclared objects are nodes when they have one of each of these attributes
+_NODE_VALUE_FIELDS = ("value", "val", "data", "key")
+_NODE_LINK_FIELDS = ("next", "left", "right", "children")
+
+# Structures walked per captured variable; past these budgets the rest is
+# replaced by an Elided marker. Walking a node costs every step, and a
+# changed node rebuilds the snapshots of the nodes leading to it, so a long
+# linked list growing at its tail would cost its whole length per step; the
+# viewer draws at most a few hundred nodes of a list or tree anyway.
+# Change them with set_snapshot_limits().
+SNAPSHOT_MAX_CONTAINERS = 100_000 # Lists, tuples and dicts, per variable
+SNAPSHOT_MAX_NODES = 500 # Nodes per linked structure (see SnapshotEngine)
+
+def set_snapshot_limits(max_nodes=None, max_containers=None):
+    """
+    Changes how much of each variable later traces capture (see
+    SNAPSHOT_MAX_NODES and SNAPSHOT_MAX_CONTAINERS); None keeps a limit.
+    """
+    global SNAPSHOT_MAX_NODES, SNAPSHOT_MAX_CONTAINERS
+    if max_nodes is not None:
+        SNAPSHOT_MAX_NODES = max(max_nodes, 0)
+    if max_containers is not None:
+        SNAPSHOT_MAX_CONTAINERS = max(max_containers, 0)
+
+def snapshot_limits():
+    """The current (max_nodes, max_containers) limits."""
+    return SNAPSHOT_MAX_NODES, SNAPSHOT_MAX_CONTAINERS
+
+_ATOMIC_TYPES = {
+    int, float, complex, bool, str, bytes, type(None), type(Ellipsis), type(NotImplemented),
+    range, slice, type, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.ModuleType, types.CodeType,
+}
+
+
+def _frozen(*_args, **_kwargs):
+    raise TypeError("dryviz snapshots are immutable")
+
+
+class FrozenList(list):
+    """Immutable snapshot of a list (still a list, so list renderers apply)."""
+
+    __slots__ = ()
+    append = extend = insert = pop = remove = clear = sort = reverse = _frozen
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+class FrozenDict(dict):
+    """Immutable snapshot of a dict (still a dict, so dict and graph renderers apply)."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenSet(frozenset):
+    """Snapshot of a set; prints like the set it came from."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "{" + ", ".join(map(repr, self)) + "}" if self else "set()"
+
+
+class NodeSnapshot:
+    """
+    Immutable snapshot of an object: its attributes, captured recursively,
+    plus the name of its class (and its str() if the class defines one).
+    Snapshots of opaque objects have no attributes, only the text.
+    """
+
+    __slots__ = ("__dict__", "_type_name", "_text", "_layout")
+
+    def __setattr__(self, _name, _value):
+        raise TypeError("dryviz snapshots are immutable")
+
+    __delattr__ = __setattr__
+
+    def __getstate__(self):
+        return (self.__dict__, self._type_name, self._text, self._layout)
+
+    def __setstate__(self, state):
+        fields, type_name, text, *layout = state # Older traces carry no layout
+        self.__dict__.update(fields)
+        object.__setattr__(self, "_type_name", type_name)
+        object.__setattr__(self, "_text", text)
+        object.__setattr__(self, "_layout", layout[0] if layout else None)
+
+    def __str__(self):
+        return self._text if self._text is not None else repr(self)
+
+    def __repr__(self):
+        return f"<{self._type_name} object>"
+
+
+class Elided:
+    """Stands for a structure past the snapshot budget (see SNAPSHOT_MAX_NODES)."""
+
+    __slots__ = ("type_name",)
+
+    def __init__(self, type_name):
+        self.type_name = type_name
+
+    def __reduce__(self):
+        return (elided, (self.type_name,))
+
+    def __repr__(self):
+        return f"<{self.type_name} …>"
+
+_ELIDED = {} # type name -> its Elided marker, so unchanged parents keep their snapshot
+
+def elided(type_name):
+    """The Elided marker for structures of type `type_name`."""
+    marker = _ELIDED.get(type_name)
+    if marker is None:
+        marker = _ELIDED[type_name] = Elided(type_name)
+    return marker
+
+
+_SNAPSHOT_TYPES = (FrozenList, FrozenDict, FrozenSet, NodeSnapshot)
+
+
+def is_snapshot(value):
+    """Whether value is an immutable snapshot container (so its identity pins its content)."""
+    return isinstance(value, _SNAPSHOT_TYPES)
+
+def type_name(value):
+    """Name of the type a value (or the live object a snapshot was taken of) had."""
+    if isinstance(value, NodeSnapshot):
+        return value._type_name.rpartition(".")[2]
+    if isinstance(value, _SNAPSHOT_TYPES):
+        return type(value).__mro__[1].__name__ # list, dict, frozenset
+    return type(value).__name__
+
+
+# --- Declared node layouts ---
+
+# Node shapes a layout can declare
+TREE = "tree"
+LINKED_LIST = "linked_list"
+
+# How to read a node: the attribute shown as its value, its tree children
+# (a tuple of attributes holding one child each, or the name of one
+# attribute holding a sequence of children) and its linked list successor.
+NodeLayout = namedtuple("NodeLayout", ["shape", "value", "children", "next"])
+
+# Declaration of a class: its layout (or None), the attributes captured and
+# their compiled getter, or the class's own snapshot function.
+_NodeSpec = namedtuple("_NodeSpec", ["layout", "fields", "getter", "snapshot"])
+
+_REGISTERED_NODES = {} # class -> register_node() arguments
+_SPEC_CACHE = {} # type -> _NodeSpec, or None for undeclared types
+
+def register_node(cls, value="value", children=(), next=None, fields=(), snapshot=None):
+    """
+    Declares how dryviz captures and draws instances of `cls` (and its
+    subclasses), instead of probing their attributes at every step.
+
+    `value` is the attribute shown for a node. A tree node names its
+    `children`: a tuple of attributes holding one child each (e.g.
+    ("left", "right")) or one attribute holding a list of children. A
+    linked list node names its `next` attribute. Only these attributes,
+    plus any extra `fields`, are captured. `snapshot`, a function taking a
+    node and returning a dict of the fields to capture, replaces attribute
+    reading altogether; the layout then names keys of that dict.
+
+    A class can declare the same in its body instead:
+    `__dryviz_snapshot__ = {"value": "key", "children": ("left", "right")}`,
+    or define a `__dryviz_snapshot__(self)` method returning its fields,
+    with its layout (if any) in a `__dryviz_layout__` dict next to it, e.g.
+    `__dryviz_layout__ = {"value": "key", "next": "successor"}`.
+    """
+    if children and next is not None:
+        raise ValueError("a node is either a tree node (children) or a linked list node (next), not both")
+    _REGISTERED_NODES[cls] = {"value": value, "children": children, "next": next, "fields": fields,
+                              "snapshot": snapshot}
+    _SPEC_CACHE.clear()
+    _KIND_CACHE.clear()
+
+def unregister_node(cls):
+    """Drops the registration of `cls`; its instances are captured and detected generically again."""
+    _REGISTERED_NODES.pop(cls, None)
+    _SPEC_CACHE.clear()
+    _KIND_CACHE.clear()
+
+def node_spec(value_type):
+    """The declaration of `value_type` (registered or `__dryviz_snapshot__`), or None (cached per type)."""
+    try:
+        return _SPEC_CACHE[value_type]
+    except KeyError:
+        pass
+    spec = None
+    declaration = next((_REGISTERED_NODES[klass] for klass in value_type.__mro__ if klass in _REGISTERED_NODES), None)
+    if declaration is None:
+        protocol = getattr(value_type, "__dryviz_snapshot__", None)
+        if callable(protocol):
+            declaration = {**getattr(value_type, "__dryviz_layout__", {}), "snapshot": protocol}
+        elif isinstance(protocol, dict):
+            declaration = protocol
+    if declaration is not None:
+        spec = _compile_spec(declaration)
+    _SPEC_CACHE[value_type] = spec
+    return spec
+
+def _compile_spec(declaration):
+    value = declaration.get("value", "value")
+    children = declaration.get("children", ())
+    next_name = declaration.get("next")
+    layout = None
+    if children:
+        layout = NodeLayout(TREE, value, children, None)
+    elif next_name is not None:
+        layout = NodeLayout(LINKED_LIST, value, (), next_name)
+    names = [value, *([children] if isinstance(children, str) else children), next_name,
+             *declaration.get("fields", ())]
+    fields = tuple(dict.fromkeys(name for name in names if name is not None))
+    getter = operator.attrgetter(*fields) if len(fields) > 1 else None # Returns a tuple for 2+ names
+    return _NodeSpec(layout, fields, getter, declaration.get("snapshot"))
+
+def _declared_fields(spec, obj):
+    """(name, value) pairs of a declared node, read with its compiled getter."""
+    if spec.snapshot is not None:
+        return list(spec.snapshot(obj).items())
+    if spec.getter is not None:
+        try:
+            return list(zip(spec.fields, spec.getter(obj)))
+        except AttributeError: # Some attribute is not set on this instance
+            pass
+    return [(name, value) for name in spec.fields
+            for value in (getattr(obj, name, _MISSING),) if value is not _MISSING]
+
+def node_layout(node):
+    """The declared NodeLayout of a node or node snapshot, or None if its class declared none."""
+    if isinstance(node, NodeSnapshot):
+        return node._layout
+    spec = node_spec(type(node))
+    return spec.layout if spec is not None else None
+
+
+_KIND_CACHE = {} # type -> capture kind
+
+def capture_kind(value_type):
+    """How values of `value_type` are captured (cached per type)."""
+    kind = _KIND_CACHE.get(value_type)
+    if kind is None:
+        kind = _resolve_kind(value_type)
+        _KIND_CACHE[value_type] = kind
+    return kind
+
+def _resolve_kind(value_type):
+    if value_type in _ATOMIC_TYPES or issubclass(value_type, (enum.Enum, Elided, *_SNAPSHOT_TYPES)):
+        return ATOM
+    if node_spec(value_type) is not None: # Declared nodes, even ones that define __deepcopy__
+        return OBJECT
+    if issubclass(value_type, list):
+        return LIST
+    if issubclass(value_type, tuple):
+        return TUPLE
+    if issubclass(value_type, dict):
+        return DICT
+    if issubclass(value_type, (set, frozenset)):
+        return SET
+    if (value_type.__module__ != "builtins" and not hasattr(value_type, "__deepcopy__")
+            and (hasattr(value_type, "__dict__") or _slot_names(value_type))):
+        return OBJECT
+    return COPY
+
+_SLOT_CACHE = {} # type -> its slot names, base classes included
+
+def _slot_names(value_type):
+    names = _SLOT_CACHE.get(value_type)
+    if names is None:
+        names = []
+        for klass in value_type.__mro__:
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            names.extend(name for name in slots if name not in ("__dict__", "__weakref__"))
+        names = _SLOT_CACHE[value_type] = tuple(names)
+    return names
+
+_NODE_TYPES = set() # Types with an instance seen to be a node
+
+def _is_node(obj):
+    """Whether an object is captured as a node: declared, or with a value and a next/left/right/children attribute."""
+    value_type = type(obj)
+    if value_type in _NODE_TYPES:
+        return True
+    if node_spec(value_type) is not None:
+        _NODE_TYPES.add(value_type)
+        return True
+    fields = getattr(obj, "__dict__", None)
+    slots = _slot_names(value_type)
+    if fields is None:
+        fields = slots
+    elif slots:
+        fields = {*fields, *slots}
+    if any(name in fields for name in _NODE_VALUE_FIELDS) and any(name in fields for name in _NODE_LINK_FIELDS):
+        # Instances of a node class that lack a link (e.g. set later) are nodes too
+        _NODE_TYPES.add(value_type)
+        return True
+    return False
+
+def _object_fields(obj):
+    """(name, value) pairs of an object's instance attributes, from __dict__ and __slots__ (or its declaration)."""
+    value_type = type(obj)
+    spec = node_spec(value_type)
+    if spec is not None:
+        return _declared_fields(spec, obj)
+    fields = list(getattr(obj, "__dict__", {}).items())
+    slots = _slot_names(value_type)
+    if not slots:
+        return fields
+    for name in slots:
+        value = getattr(obj, name, _MISSING)
+        if value is not _MISSING:
+            fields.append((name, value))
+    return fields
+
+_TEXT_TYPES = {} # type -> whether it defines its own __str__ or __repr__
+
+def _object_text(obj):
+    value_type = type(obj)
+    has_text = _TEXT_TYPES.get(value_type)
+    if has_text is None:
+        has_text = _TEXT_TYPES[value_type] = not (value_type.__str__ is object.__str__
+                                                  and value_type.__repr__ is object.__repr__)
+    if not has_text:
+        return None
+    try:
+        return str(obj)
+    except Exception:
+        return None
+
+def _same_value(a, b):
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+
+def _unzip(pairs):
+    """The keys and the values of a list of (key, value) pairs, as two tuples."""
+    return tuple(zip(*pairs)) if pairs else ((), ())
+
+
+class _Open:
+    """A container being captured: its children are snapshotted before it is closed."""
+
+    __slots__ = ("obj", "kind", "keys", "children", "snaps", "shell", "text", "cyclic", "nodes")
+    # The shell (the empty snapshot filled once the children are known) is
+    # only made if the container changed, or if a cycle needs its identity.
+
+    def __init__(self, obj, kind):
+        self.obj = obj
+        self.kind = kind
+        self.snaps = []
+        self.cyclic = False # Referenced by one of its own descendants
+        self.text = None
+        self.shell = None
+        self.nodes = None # [nodes left] of the linked structure this is part of, if any
+        # Items are copied in one call, so another thread mutating the
+        # container can't leave the snapshot half old, half new.
+        if kind == LIST:
+            self.keys = None
+            self.children = list(obj)
+        elif kind == TUPLE:
+            self.keys = None
+            self.children = obj
+        elif kind == DICT:
+            self.keys, self.children = _unzip(list(obj.items()))
+        else: # OBJECT
+            self.keys, self.children = _unzip(_object_fields(obj))
+            self.text = _object_text(obj)
+
+    def get_shell(self):
+        """The (still empty) snapshot of this container; tuples have none until built, so their cycles see the tuple."""
+        if self.shell is None:
+            if self.kind == LIST:
+                self.shell = FrozenList()
+            elif self.kind == DICT:
+                self.shell = FrozenDict()
+            elif self.kind == OBJECT:
+                obj_type = type(self.obj)
+                spec = node_spec(obj_type)
+                self.shell = NodeSnapshot.__new__(NodeSnapshot)
+                object.__setattr__(self.shell, "_type_name", f"{obj_type.__module__}.{obj_type.__qualname__}")
+                object.__setattr__(self.shell, "_text", self.text)
+                object.__setattr__(self.shell, "_layout", spec.layout if spec is not None else None)
+            else:
+                return self.obj
+        return self.shell
+
+
+class SnapshotEngine:
+    """
+    Captures values into immutable snapshots, sharing unchanged substructures
+    with the previous capture. Traversal is iterative, so deep structures
+    don't hit the recursion limit, and cycles are preserved in the snapshot.
+
+    Each variable may walk up to `max_containers` lists, tuples and dicts,
+    and each linked structure up to `max_nodes` nodes: a node reached from a
+    variable or a plain container starts a structure, and the nodes (and
+    containers) reached from it count against its budget. Two linked lists,
+    or the nodes queued in a BFS, don't share a budget. Anything past a
+    budget is replaced by an Elided marker.
+    """
+
+    def __init__(self, max_nodes=None, max_containers=None):
+        self.max_nodes = SNAPSHOT_MAX_NODES if max_nodes is None else max_nodes
+        self.max_containers = SNAPSHOT_MAX_CONTAINERS if max_containers is None else max_containers
+        self._previous = {} # id(obj) -> (obj, snapshot) from the previous capture
+        self._containers = [0] # Containers the variable being captured may still walk
+
+    def capture(self, values):
+        """Snapshots every value of the `values` mapping; returns a new dict."""
+        memo = {}
+        snapshots = {}
+        for name, value in values.items():
+            self._containers = [self.max_containers]
+            snapshots[name] = self._snapshot(value, memo)
+        # Only structures reached in this capture are remembered, so nothing
+        # outlives the step after it stopped being visible.
+        self._previous = memo
+        return snapshots
+
+    def _lookup(self, obj, memo):
+        """Returns the snapshot of obj if it needs no traversal, else _MISSING."""
+        kind = capture_kind(type(obj))
+        if kind == ATOM:
+            return obj
+        entry = memo.get(id(obj))
+        if entry is not None:
+            if isinstance(entry, _Open): # A cycle back to a structure still being captured
+                entry.cyclic = True
+                return entry.get_shell()
+            return entry[1]
+        if kind in (SET, COPY):
+            previous = self._previous.get(id(obj))
+            if previous is not None and previous[0] is obj and _same_value(previous[1], obj):
+                snapshot = previous[1]
+            elif kind == SET:
+                snapshot = FrozenSet(obj)
+            else:
+                try:
+                    snapshot = copy.deepcopy(obj)
+                except Exception: # Locks, generators, ...: keep a reference
+                    snapshot = obj
+            memo[id(obj)] = (obj, snapshot)
+            return snapshot
+        if kind == OBJECT and not _is_node(obj):
+            return self._opaque(obj, memo)
+        return _MISSING
+
+    def _opaque(self, obj, memo):
+        """The text of an object that isn't walked, so later changes don't rewrite earlier steps."""
+        text = _object_text(obj)
+        if text is None:
+            return obj # Its default repr never changes
+        previous = self._previous.get(id(obj))
+        if previous is not None and previous[0] is obj and previous[1]._text == text:
+            snapshot = previous[1]
+        else:
+            obj_type = type(obj)
+            snapshot = NodeSnapshot.__new__(NodeSnapshot)
+            object.__setattr__(snapshot, "_type_name", f"{obj_type.__module__}.{obj_type.__qualname__}")
+            object.__setattr__(snapshot, "_text", text)
+            object.__setattr__(snapshot, "_layout", None)
+        memo[id(obj)] = (obj, snapshot)
+        return snapshot
+
+    def _snapshot(self, root, memo):
+        snapshot = self._lookup(root, memo)
+        if snapshot is _MISSING:
+            snapshot = self._open(root, memo, None)
+        if type(snapshot) is not _Open:
+            return snapshot
+
+        lookup, open_frame, close_frame = self._lookup, self._open, self._close
+        atomic_types = _ATOMIC_TYPES
+        stack = [snapshot]
+        while True:
+            frame = stack[-1]
+            children = frame.children
+            snaps = frame.snaps
+            # Takes every child needing no traversal, up to the first that does
+            for position in range(len(snaps), len(children)):
+                child = children[position]
+                snapshot = child if type(child) in atomic_types else lookup(child, memo)
+                if snapshot is _MISSING:
+                    snapshot = open_frame(child, memo, frame)
+                    if type(snapshot) is _Open:
+                        stack.append(snapshot)
+                        break
+                snaps.append(snapshot)
+            else:
+                stack.pop()
+                snapshot = close_frame(frame, memo)
+                if not stack:
+                    return snapshot
+                stack[-1].snaps.append(snapshot)
+
+    def _open(self, obj, memo, parent):
+        """Starts capturing obj (child of the `parent` frame) or, past its budget, returns its Elided marker."""
+        kind = capture_kind(type(obj))
+        nodes = None if parent is None else parent.nodes
+        if kind == OBJECT:
+            if nodes is None: # A new linked structure
+                nodes = [self.max_nodes]
+            budget = nodes
+        else:
+            budget = self._containers
+        if budget[0] <= 0:
+            return elided(type(obj).__name__)
+        budget[0] -= 1
+        frame = _Open(obj, kind)
+        frame.nodes = nodes
+        memo[id(obj)] = frame
+        return frame
+
+    def _close(self, frame, memo):
+        obj = frame.obj
+        previous = self._previous.get(id(obj))
+        if previous is not None and previous[0] is obj and not frame.cyclic and _unchanged(previous[1], frame):
+            snapshot = previous[1]
+        else:
+            snapshot = _build(frame)
+        memo[id(obj)] = (obj, snapshot)
+        return snapshot
+
+
+def _unchanged(previous, frame):
+    """Checks whether `previous` has exactly the children just captured for frame."""
+    snaps = frame.snaps
+    if frame.kind in (LIST, TUPLE):
+        return len(previous) == len(snaps) and all(map(operator.is_, previous, snaps))
+    if frame.kind == DICT:
+        fields = previous
+    else:
+        if previous._text != frame.text:
+            return False
+        fields = previous.__dict__
+    return (len(fields) == len(snaps) and tuple(fields) == frame.keys
+            and all(map(operator.is_, fields.values(), snaps)))
+
+def _build(frame):
+    snaps = frame.snaps
+    if frame.kind == TUPLE:
+        obj = frame.obj
+        if all(a is b for a, b in zip(obj, snaps)):
+            return obj # Only immutable items: the tuple is its own snapshot
+        if hasattr(type(obj), "_make"): # namedtuple
+            return type(obj)._make(snaps)
+        return tuple(snaps)
+    shell = frame.get_shell()
+    if frame.kind == LIST:
+        list.extend(shell, snaps)
+    elif frame.kind == DICT:
+        dict.update(shell, zip(frame.keys, snaps))
+    else:
+        shell.__dict__.update(zip(frame.keys, snaps))
+    return shell
+
+
+class SnapshotCache:
+    """
+    LRU cache of values derived from snapshots, keyed by snapshot identity.
+    Snapshots are immutable and unchanged structures keep the same snapshot
+    from step to step, so a hit means exactly the same state. Entries keep
+    their snapshot alive (its id can't be reused while cached) and are
+    evicted, least recently used first, once their total weight passes
+    `max_weight`.
+    """
+
+    def __init__(self, max_weight):
+        self.max_weight = max_weight
+        self.weight = 0
+        self._entries = OrderedDict() # (id(snapshot), tag) -> (snapshot, value, weight)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, snapshot, tag=None):
+        key = (id(snapshot), tag)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, snapshot, value, weight=1, tag=None):
+        key = (id(snapshot), tag)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.weight -= previous[2]
+        self._entries[key] = (snapshot, value, weight)
+        self.weight += weight
+        while self.weight > self.max_weight and len(self._entries) > 1:
+            _key, (_snapshot, _value, evicted_weight) = self._entries.popitem(last=False)
+            self.weight -= evicted_weight
+
+    def clear(self):
+        self._entries.clear()
+        self.weight = 0
@@ -0,0 +1,122 @@
+"""
+Self-profiling counters.
+
+TraceStats is filled by a session's line handler (events seen, steps
+captured, time spent capturing); RENDER_STATS by the renderers (dispatch
+time, time and calls per renderer, memoized hits). Both are plain counters,
+cheap enough to stay on all the time.
+"""
+import sys
+
+from .snapshot import NodeSnapshot
+
+
+class TraceStats:
+    """Tracer-side counters of one session."""
+
+    def __init__(self):
+        self.events = 0 # Line events delivered to the handler
+        self.captured = 0 # Events that became steps
+        self.capture_time = 0.0 # Seconds spent snapshotting and encoding steps
+        self.wall_time = 0.0 # Seconds the outermost call took, tracing included
+
+
+class RenderStats:
+    """Renderer-side counters, shared by everything rendered in this process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.dispatch_time = 0.0 # Seconds spent choosing renderers (RENDERER_REGISTRY conditions)
+        self.memo_hits = 0 # Variables served from the render memo
+        self.renderers = {} # renderer name -> [calls, seconds building renderables]
+
+    def add(self, name, seconds):
+        entry = self.renderers.get(name)
+        if entry is None:
+            self.renderers[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def as_dict(self):
+        return {
+            "dispatch_time": self.dispatch_time,
+            "memo_hits": self.memo_hits,
+            "renderers": {name: {"calls": calls, "time": seconds}
+                          for name, (calls, seconds) in sorted(self.renderers.items())},
+        }
+
+
+RENDER_STATS = RenderStats()
+
+
+def renderer_name(render_func):
+    """Short name of a render function for the stats ("stack" for _render_stack_var)."""
+    if render_func is None:
+        return "text"
+    return render_func.__name__.removeprefix("_render_").removesuffix("_var")
+
+
+def retained_bytes(trace_data):
+    """
+    Approximate memory held by a trace: the bytes written for file-backed
+    traces, else the size of every record and of the snapshots they reference
+    (shared snapshots counted once).
+    """
+    written = getattr(trace_data, "bytes_written", None)
+    if written is not None:
+        return written
+    seen = set()
+    total = 0
+    for index in range(len(trace_data)):
+        record = trace_data.record_at(index)
+        total += sys.getsizeof(record) + sys.getsizeof(record.changed)
+        total += _deep_size(record.changed.values(), seen)
+    return total
+
+def _deep_size(values, seen):
+    total = 0
+    pending = list(values)
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+        if isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            pending.extend(value)
+        elif isinstance(value, NodeSnapshot):
+            total += sys.getsizeof(value.__dict__)
+            pending.extend(value.__dict__.values())
+    return total
+
+
+def _format_bytes(count):
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GiB"
+
+def format_stats(stats=None, render_stats=RENDER_STATS, top=3):
+    """One status line: tracer stats (a session's stats() dict, if any) and the slowest renderers."""
+    parts = []
+    if stats is not None:
+        parts.append(f"events {stats['events']:,}")
+        parts.append(f"captured {stats['captured']:,}")
+        per_step = stats["capture_time"] / stats["captured"] * 1e6 if stats["captured"] else 0.0
+        parts.append(f"capture {stats['capture_time'] * 1e3:.1f} ms ({per_step:.1f} µs/step)")
+        if stats.get("retained_bytes") is not None:
+            parts.append(f"retained {_format_bytes(stats['retained_bytes'])}")
+    slowest = sorted(render_stats.renderers.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    total = render_stats.dispatch_time + sum(seconds for _calls, seconds in render_stats.renderers.values())
+    rendering = f"render {total * 1e3:.1f} ms"
+    if slowest:
+        rendering += ": " + ", ".join(f"{name} {seconds * 1e3:.1f} ms ×{calls}" for name, (calls, seconds) in slowest)
+    parts.append(rendering)
+    return " · ".join(parts)
@@ -0,0 +1,135 @@
+import os
+import queue
+import socket
+import tempfile
+import threading
+import warnings
+
+from .trace import CallInfo, DeltaEncoder
+from .tracefile import TraceWriter
+
+BACKPRESSURE_POLICIES = ("block", "drop", "sample")
+
+_STOP = object() # Queue sentinel telling the writer thread to finish
+
+# Where `python -m dryviz serve` listens and @dryviz(viewer=True) connects by default
+DEFAULT_VIEWER_SOCKET = os.path.join(tempfile.gettempdir(), "dryviz.sock")
+
+
+def connect_viewer(path=None):
+    """
+    Connects to a live viewer started with `python -m dryviz serve` and
+    returns a binary file to stream the trace to; closing it hangs up.
+    """
+    path = DEFAULT_VIEWER_SOCKET if path is None else os.fspath(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError as e:
+        sock.close()
+        raise ConnectionError(f"No dryviz viewer is listening on {path}; "
+                              f"start one with `python -m dryviz serve {path}`") from e
+    stream = sock.makefile("wb")
+    sock.close() # The connection stays open until `stream` is closed
+    return stream
+
+
+class StreamingWriter:
+    """
+    Streams captured steps to a trace file from a background thread.
+
+    The traced thread only snapshots and delta-encodes the changed bindings
+    and puts the compact StepRecord on a bounded queue; pickling and I/O
+    happen on the writer thread, and nothing accumulates in memory.
+
+    When the queue is full the backpressure policy decides what happens:
+        "block"  - wait for the writer; no steps are lost.
+        "drop"   - discard the step.
+        "sample" - keep only every `sample_every`-th step until the queue drains.
+    After any dropped step the next queued record is a keyframe, so the
+    file stays decodable.
+
+    With `live`, the target is a viewer connection (see connect_viewer): the
+    writer flushes whenever it has caught up with the tracer, so the viewer
+    shows steps as they happen, and closes the connection at the end.
+    """
+
+    def __init__(self, target, queue_size=1024, policy="block", sample_every=10, keyframe_interval=64, live=False):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {BACKPRESSURE_POLICIES}")
+        self.policy = policy
+        self.sample_every = sample_every
+        self.dropped = 0 # Steps lost to backpressure
+        self.error = None # Exception raised by the writer thread, if any
+        self._encoder = DeltaEncoder(keyframe_interval)
+        self.live = live
+        self._writer = TraceWriter(target, keyframe_interval=keyframe_interval, close_target=live)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._resync = False # Next record must be a keyframe because a step was dropped
+        self._skipped = 0
+        self._thread = threading.Thread(target=self._run, name="dryviz-writer", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._writer)
+
+    @property
+    def bytes_written(self):
+        """Bytes written to the trace file so far (queued steps not included)."""
+        return self._writer.bytes_written
+
+    def add_call(self, call_info):
+        """Queue a call tree entry; these are never dropped."""
+        self._queue.put(call_info)
+
+    def append(self, lineno, local_vars, call=0, depth=0):
+        """Capture the state of the traced frame before `lineno` runs."""
+        if self.policy == "block":
+            self._queue.put(self._encoder.encode(lineno, local_vars, call=call, depth=depth))
+            return
+
+        if self._queue.full():
+            self._skipped += 1
+            if self.policy == "drop" or self._skipped % self.sample_every:
+                # Skip even the encoding; the encoder catches up with a keyframe later.
+                self.dropped += 1
+                self._resync = True
+                return
+            self._queue.put(self._encoder.encode(lineno, local_vars, self._resync, call, depth))
+        else:
+            self._queue.put_nowait(self._encoder.encode(lineno, local_vars, self._resync, call, depth))
+        self._resync = False
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            if self.error is not None:
+                continue # Keep draining so the traced thread never blocks forever
+            try:
+                if isinstance(record, CallInfo):
+                    self._writer.add_call(record)
+                else:
+                    self._writer.write_record(record)
+                if self.live and self._queue.empty():
+                    self._writer.flush()
+            except Exception as e: # e.g. a closed pipe or a full disk
+                self.error = e
+
+    def close(self):
+        """Flush the queue, write the index and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        if self.error is None:
+            try:
+                self._writer.close()
+            except Exception as e:
+                self.error = e
+        if self.error is not None:
+            warnings.warn(f"dryviz could not write the trace: {self.error}", RuntimeWarning, stacklevel=2)
+        if self.dropped:
+            warnings.warn(f"dryviz dropped {self.dropped} steps under backpressure", RuntimeWarning, stacklevel=2)
@@ -0,0 +1,218 @@
+from collections import deque, namedtuple
+
+from .query import ChangeIndex, find
+from .snapshot import FrozenDict, FrozenList, FrozenSet, NodeSnapshot, SnapshotEngine
+
+# A single captured step: its position in the trace, the line that was about
+# to run, the snapshot of the variables visible at that point, and which
+# decorated call (and at what nesting depth) it belongs to.
+TraceStep = namedtuple("TraceStep", ["index", "lineno", "variables", "call", "depth"], defaults=(0, 0))
+
+# How a step is stored: keyframes carry the full variable state in `changed`,
+# other records only the bindings that changed or disappeared since the previous step.
+StepRecord = namedtuple("StepRecord", ["lineno", "changed", "removed", "keyframe", "call", "depth"],
+                        defaults=(0, 0))
+
+# One decorated call in a session's call tree. `parent` is None for the outermost call.
+# `context` names the thread or asyncio task the call ran in, so steps are tagged by it.
+CallInfo = namedtuple("CallInfo", ["call", "parent", "depth", "name", "context"], defaults=("",))
+
+_MISSING = object()
+
+
+def _same_value(previous, snapshot):
+    """Checks whether a new snapshot matches the one taken at the previous step."""
+    if previous is snapshot:
+        return True
+    if type(previous) is not type(snapshot):
+        return False
+    if isinstance(snapshot, (FrozenList, FrozenDict, FrozenSet, NodeSnapshot)):
+        # Unchanged structures reuse their previous snapshot, so identity is enough.
+        return False
+    try:
+        return bool(previous == snapshot)
+    except Exception: # e.g. array-likes whose == is elementwise
+        return False
+
+
+class DeltaEncoder:
+    """
+    Turns successive frame locals into StepRecords.
+    Locals are captured as structurally shared snapshots, so structures
+    mutated in place still show their historical state, and only bindings
+    whose snapshot differs from the previous step are recorded; a full
+    keyframe is emitted every `keyframe_interval` steps.
+    """
+
+    def __init__(self, keyframe_interval=64):
+        self.keyframe_interval = keyframe_interval
+        self.state = {} # Snapshot state as of the last encoded step
+        self.snapshots = SnapshotEngine()
+        self._since_keyframe = None # None forces the first record to be a keyframe
+
+    def encode(self, lineno, local_vars, keyframe=False, call=0, depth=0):
+        state = self.state
+        changed = {}
+        for var_name, snapshot in self.snapshots.capture(local_vars).items():
+            previous = state.get(var_name, _MISSING)
+            if previous is _MISSING or not _same_value(previous, snapshot):
+                changed[var_name] = snapshot
+        removed = tuple(var_name for var_name in state if var_name not in local_vars)
+
+        state.update(changed)
+        for var_name in removed:
+            del state[var_name]
+
+        if keyframe or self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            self._since_keyframe = 0
+            # Unchanged values are shared with earlier records, so a keyframe is only a dict of references.
+            return StepRecord(lineno, dict(state), (), True, call, depth)
+        self._since_keyframe += 1
+        return StepRecord(lineno, changed, removed, False, call, depth)
+
+
+class StepSequence:
+    """
+    Random access to steps stored as keyframes plus deltas.
+    Subclasses provide `__len__`, `record_at` and a `calls` mapping of call
+    id to CallInfo; everything else is shared between the in-memory store and
+    trace files.
+    """
+
+    _last_state = None # (index, variables) of the most recently rebuilt step
+    _changes = None # ChangeIndex, built while capturing or on first use
+    exact_changes = True # Unchanged bindings are the same objects in every record (see ChangeIndex)
+    calls = {}
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def record_at(self, index):
+        """The StepRecord stored for step `index`."""
+        raise NotImplementedError
+
+    def is_keyframe(self, index):
+        return self.record_at(index).keyframe
+
+    def lineno_at(self, index):
+        """Line number of step `index`, without rebuilding its state."""
+        return self.record_at(index).lineno
+
+    def state_at(self, index):
+        """Rebuild the full variable state of step `index` from its keyframe and deltas."""
+        start = index
+        while not self.is_keyframe(start):
+            start -= 1
+
+        if self._last_state is not None and start <= self._last_state[0] <= index:
+            # Sequential access: continue from the last rebuilt step instead of the keyframe.
+            start, variables = self._last_state
+            variables = dict(variables)
+        else:
+            variables = dict(self.record_at(start).changed)
+
+        for record_index in range(start + 1, index + 1):
+            record = self.record_at(record_index)
+            variables.update(record.changed)
+            for var_name in record.removed:
+                variables.pop(var_name, None)
+
+        self._last_state = (index, variables)
+        return variables
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trace step index out of range")
+        record = self.record_at(index)
+        return TraceStep(index, record.lineno, self.state_at(index), record.call, record.depth)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def change_index(self):
+        """The ChangeIndex of this trace, brought up to date with the steps added since it was last used."""
+        if self._changes is None:
+            self._changes = ChangeIndex(self.exact_changes)
+        self._changes.extend(self)
+        return self._changes
+
+    def changes(self, var_name):
+        """Steps at which `var_name` changed (was bound to a new value or removed), in order."""
+        return self.change_index().changes(var_name)
+
+    def find(self, query, start=0, backward=False):
+        """First step of the next run of steps where `query` holds, e.g. `trace.find("len(stack) > 10")`."""
+        return find(self, query, start, backward)
+
+    def save(self, target):
+        """Write the steps to `target` (a path or binary file) in the dryviz trace file format."""
+        from .tracefile import TraceWriter # Imported here: tracefile depends on this module
+
+        with TraceWriter(target) as writer:
+            for call_info in self.calls.values():
+                writer.add_call(call_info)
+            for index in range(len(self)):
+                writer.write_record(self.record_at(index))
+
+
+class TraceStore(StepSequence):
+    """
+    Compact, render-free record of a traced call.
+    Steps are delta-encoded against the previous step with periodic keyframes,
+    so memory grows with how much the state changes rather than with
+    steps x locals. Any step's full state is rebuilt on demand.
+    """
+
+    def __init__(self, keyframe_interval=64):
+        self.keyframe_interval = keyframe_interval
+        self._encoder = DeltaEncoder(keyframe_interval)
+        self._records = []
+        self._changes = ChangeIndex() # Kept up to date while capturing
+        self.calls = {}
+
+    def add_call(self, call_info):
+        self.calls[call_info.call] = call_info
+
+    def append(self, lineno, local_vars, call=0, depth=0):
+        """Record the state of the traced frame before `lineno` runs."""
+        record = self._encoder.encode(lineno, local_vars, call=call, depth=depth)
+        self._records.append(record)
+        self._changes.append(record)
+
+    def __len__(self):
+        return len(self._records)
+
+    def record_at(self, index):
+        return self._records[index]
+
+
+class FlightRecorder(StepSequence):
+    """
+    Ring buffer of the last `last` steps of a call.
+    Every entry is a keyframe (unchanged values are shared between entries),
+    so the oldest steps can be dropped without breaking the ones after them.
+    """
+
+    def __init__(self, last=500):
+        self._encoder = DeltaEncoder()
+        self._records = deque(maxlen=last)
+        self.total = 0 # Steps seen, including the ones that fell out of the buffer
+        self.calls = {}
+
+    def add_call(self, call_info):
+        self.calls[call_info.call] = call_info
+
+    def append(self, lineno, local_vars, call=0, depth=0):
+        """Record the state of the traced frame before `lineno` runs."""
+        self._records.append(self._encoder.encode(lineno, local_vars, keyframe=True, call=call, depth=depth))
+        self.total += 1
+        self._changes = None # Step indices shift once the buffer wraps; rebuilt when queried
+
+    def __len__(self):
+        return len(self._records)
+
+    def record_at(self, index):
+        return self._records[index]
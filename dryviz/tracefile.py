@@ -0,0 +1,770 @@
+"""
+Binary, append-only trace file format.
+
+Layout (all integers little-endian):
+
+    header   MAGIC (8 bytes, last byte is the format version)
+    records  kind (1 byte) | payload length (uint32) | payload
+               b"S"  string table entry: UTF-8 name, ids are assigned in order
+               b"C"  call tree entry: call id (uint32) | parent call id (uint32,
+                     NO_PARENT for the outermost call) | depth (uint32) |
+                     function name id (uint32) | thread/task name id (uint32)
+                     (version 2 files have no thread/task name)
+               b"O"  object: a snapshot (list, dict or node) shared by the steps
+                     after it: object id (uint32) | body kind (1 byte) |
+                     dependency count (uint32) | the object ids it refers to
+                     (uint32 each) | pickled body (see below)
+               b"K"  keyframe step: the full variable state
+               b"D"  delta step: only the bindings that changed or were removed
+             step payload: lineno (uint32) | call id (uint32) | depth (uint32)
+                           changed count (uint32), then per binding:
+                               name id (uint32) | value length (uint32) | pickled value
+                           removed count (uint32), then one name id (uint32) per binding
+    index    b"I" record: step count (uint64), step offsets (uint64 each),
+                          string count (uint64), string offsets (uint64 each),
+                          call count (uint64), call offsets (uint64 each),
+                          object count (uint64), object offsets by id (uint64 each; version 4+),
+                          then optionally the change index: variable count (uint64),
+                          per variable: name id (uint32) | step count (uint32) |
+                          the steps where it changed (uint32 each)
+    footer   index record offset (uint64) | INDEX_MAGIC (8 bytes)
+
+Snapshots inside pickled values are stored as persistent ids naming object
+records, so a structure is written once and later steps that still hold it
+only refer to it. A list or dict that changed can be written as a delta
+against the one previously written for the same variable (or the same place
+inside it): the items kept at both ends plus the new middle, or the keys
+changed and removed. At most DELTA_CHAIN deltas follow each other before an
+object is written in full again, which bounds what a reader decodes. Both
+writing and reading walk the object graph iteratively, so long linked lists
+and degenerate trees don't hit the recursion limit.
+
+Readers memory-map the file and only decode the records they need. A file
+without a footer (e.g. the writer was killed) is still readable: the index
+is rebuilt by scanning the records. The same bytes sent over a socket or
+pipe can be read as they arrive with TraceStream.
+
+Values are stored with pickle, so only open trace files you trust.
+"""
+import io
+import itertools
+import mmap
+import operator
+import os
+import pickle
+import struct
+import warnings
+from array import array
+from collections import OrderedDict
+
+from .query import ChangeIndex
+from .snapshot import FrozenDict, FrozenList, NodeSnapshot
+from .trace import CallInfo, DeltaEncoder, StepRecord, StepSequence
+
+MAGIC = b"DRYVIZ\x00\x04"
+_READABLE_VERSIONS = (2, 3, 4)
+INDEX_MAGIC = b"DRYVIDX\x00"
+
+STRING = b"S"
+CALL = b"C"
+KEYFRAME = b"K"
+DELTA = b"D"
+OBJECT = b"O"
+INDEX = b"I"
+
+# Object record bodies (pickled tuples; lists in them hold the entries, which may refer to other objects)
+_LIST_BODY = b"L"       # ([items],)
+_LIST_DELTA_BODY = b"l" # (base id, items kept from the start, items kept from the end, [new middle items])
+_DICT_BODY = b"D"       # ([keys], [values])
+_DICT_DELTA_BODY = b"d" # (base id, [removed keys], [changed keys], [changed values])
+_NODE_BODY = b"N"       # (type name, text, layout, [field names], [field values])
+
+WRITTEN_OBJECTS = 100_000 # Snapshots a writer remembers having written (least recently used are forgotten)
+DECODED_OBJECTS = 100_000 # Decoded objects a reader keeps
+DELTA_CHAIN = 32 # Consecutive list/dict deltas before an object is written in full again
+DELTA_MIN_ITEMS = 16 # Smaller lists and dicts are always written in full
+
+_RECORD_HEADER = struct.Struct("<cI")
+_UINT32 = struct.Struct("<I")
+_UINT64 = struct.Struct("<Q")
+_BINDING_HEADER = struct.Struct("<II")
+_FOOTER = struct.Struct("<Q8s")
+_STEP_HEADER = struct.Struct("<IIII") # lineno, call, depth, changed count
+_CALL = struct.Struct("<IIIII")
+_CALL_V2 = struct.Struct("<IIII")
+_OBJECT_HEADER = struct.Struct("<IcI") # object id, body kind, dependency count
+NO_PARENT = 0xFFFFFFFF
+
+_SHARED_TYPES = (FrozenList, FrozenDict, NodeSnapshot) # Written as object records
+_MISSING = object()
+
+
+class UnpicklableValue:
+    """Stand-in stored for a captured value that could not be pickled."""
+
+    def __init__(self, type_name, text):
+        self.type_name = type_name
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return self.text
+
+
+def _stand_in(value):
+    """The UnpicklableValue stored in place of `value`."""
+    try:
+        text = repr(value)[:200]
+    except Exception:
+        text = f"<{type(value).__name__} object>"
+    return UnpicklableValue(type(value).__name__, text)
+
+
+def _warn_too_deep(value):
+    # Only values kept by reference (not snapshots) can be nested this deeply
+    warnings.warn(f"dryviz: a {type(value).__name__} value is nested too deeply to be saved in the trace; "
+                  "it is stored as text", RuntimeWarning, stacklevel=4)
+
+
+class _ObjectPickler(pickle.Pickler):
+    """Pickles values with the snapshots in `objects` (id -> [snapshot, object id, ...]) replaced by their object ids."""
+
+    def __init__(self, file, objects):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.objects = objects
+
+    def persistent_id(self, obj):
+        if type(obj) in _SHARED_TYPES:
+            return self.objects[id(obj)][1]
+        return None
+
+
+def _shared_in(values):
+    """The snapshots among `values`, looking into tuples (which are pickled inline)."""
+    pending = list(values)
+    while pending:
+        value = pending.pop()
+        if type(value) in _SHARED_TYPES:
+            yield value
+        elif isinstance(value, tuple):
+            pending.extend(value)
+
+def _children_with_bases(obj, base):
+    """
+    (child, base) for the snapshots directly below `obj`; a child's base is
+    the snapshot at the same place in `base` (the previous version of obj),
+    which it may be written as a delta against.
+    """
+    if type(obj) is FrozenList:
+        hints = base if type(base) is FrozenList else ()
+        pairs = zip(obj, itertools.chain(hints[:len(obj)], itertools.repeat(None)))
+    elif type(obj) is FrozenDict:
+        hints = base if type(base) is FrozenDict else {}
+        pairs = ((value, hints.get(key)) for key, value in obj.items())
+    else:
+        hints = base.__dict__ if type(base) is NodeSnapshot else {}
+        pairs = ((value, hints.get(name)) for name, value in obj.__dict__.items())
+    for value, hint in pairs:
+        if type(value) in _SHARED_TYPES:
+            yield value, hint if type(hint) is type(value) else None
+        elif isinstance(value, tuple):
+            for child in _shared_in(value):
+                yield child, None
+
+def _list_delta(base, items):
+    """(kept from the start, kept from the end) if `items` is worth writing as a delta of `base`, else None."""
+    limit = min(len(base), len(items))
+    prefix = len(list(itertools.takewhile(bool, map(operator.is_, base, items))))
+    suffix = len(list(itertools.takewhile(bool, itertools.islice(
+        map(operator.is_, reversed(base), reversed(items)), limit - prefix))))
+    if prefix + suffix < len(items) // 2:
+        return None
+    return prefix, suffix
+
+def _dict_delta(base, items):
+    """([removed keys], [changed keys]) if `items` is worth writing as a delta of `base`, else None."""
+    removed = list(itertools.filterfalse(items.__contains__, base))
+    changed = list(itertools.compress(items, map(operator.is_not, map(base.get, items, itertools.repeat(_MISSING)),
+                                                  items.values())))
+    if len(removed) + len(changed) >= len(items) // 2:
+        return None
+    rebuilt = dict(base)
+    for key in removed:
+        del rebuilt[key]
+    rebuilt.update(zip(changed, map(items.get, changed)))
+    if list(rebuilt) != list(items): # Reordered: a delta would not keep the order
+        return None
+    return removed, changed
+
+
+# Classes that could not be imported when reading a trace (e.g. defined in the
+# traced script's __main__) are replaced by empty stand-ins carrying the same
+# attributes, which is all the renderers need.
+_STUB_CLASSES = {}
+
+def _stub_class(module, name):
+    key = (module, name)
+    if key not in _STUB_CLASSES:
+        _STUB_CLASSES[key] = type(name, (), {"__module__": module})
+    return _STUB_CLASSES[key]
+
+
+class _TraceUnpickler(pickle.Unpickler):
+    def __init__(self, file, resolve=None):
+        super().__init__(file)
+        self.resolve = resolve # object id -> decoded object
+
+    def find_class(self, module, name):
+        try:
+            return super().find_class(module, name)
+        except (ImportError, AttributeError):
+            return _stub_class(module, name)
+
+    def persistent_load(self, pid):
+        if self.resolve is None:
+            raise pickle.UnpicklingError(f"reference to object {pid} outside of a trace")
+        return self.resolve(pid)
+
+
+def _load_value(data):
+    return _TraceUnpickler(io.BytesIO(data)).load()
+
+
+class _SharedObjects:
+    """
+    Decoding of object records for trace readers. Subclasses provide
+    `_object_payload(object_id)`; objects are rebuilt children first with an
+    explicit stack, and cached.
+    """
+
+    def _init_objects(self):
+        self._decoded = OrderedDict() # object id -> decoded object, least recently used first
+
+    def _load_value(self, data):
+        return _TraceUnpickler(io.BytesIO(data), self._object).load()
+
+    def _object_header(self, object_id):
+        payload = self._object_payload(object_id)
+        _object_id, kind, count = _OBJECT_HEADER.unpack_from(payload)
+        dependencies = struct.unpack_from(f"<{count}I", payload, _OBJECT_HEADER.size)
+        return payload, kind, dependencies
+
+    def _object(self, object_id):
+        decoded = self._decoded
+        if object_id in decoded:
+            decoded.move_to_end(object_id)
+            return decoded[object_id]
+        shells = {} # object id -> empty object made early for a reference back to it (a cycle)
+        def lookup(pid):
+            return decoded[pid] if pid in decoded else shells[pid]
+
+        on_path = {object_id}
+        root = self._object_header(object_id)
+        stack = [(object_id, root, iter(root[2]))]
+        while stack:
+            current, header, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency in decoded or dependency in shells:
+                    continue
+                dependency_header = self._object_header(dependency)
+                if dependency in on_path:
+                    shells[dependency] = _empty_object(dependency_header[1])
+                    continue
+                on_path.add(dependency)
+                stack.append((dependency, dependency_header, iter(dependency_header[2])))
+                break
+            else:
+                stack.pop()
+                on_path.discard(current)
+                payload, kind, dependency_ids = header
+                body_start = _OBJECT_HEADER.size + 4 * len(dependency_ids)
+                body = _TraceUnpickler(io.BytesIO(payload[body_start:]), lookup).load()
+                decoded[current] = _fill_object(kind, body, shells.pop(current, None), lookup)
+        result = decoded[object_id]
+        while len(decoded) > DECODED_OBJECTS:
+            decoded.popitem(last=False)
+        return result
+
+
+def _empty_object(kind):
+    if kind in (_LIST_BODY, _LIST_DELTA_BODY):
+        return FrozenList()
+    if kind in (_DICT_BODY, _DICT_DELTA_BODY):
+        return FrozenDict()
+    return NodeSnapshot.__new__(NodeSnapshot)
+
+def _fill_object(kind, body, obj, lookup):
+    """Builds the object of an object record body into `obj` (an empty object of its kind, or None)."""
+    if obj is None:
+        obj = _empty_object(kind)
+    if kind == _LIST_BODY:
+        list.extend(obj, body[0])
+    elif kind == _LIST_DELTA_BODY:
+        base_id, prefix, suffix, middle = body
+        base = lookup(base_id)
+        list.extend(obj, base[:prefix])
+        list.extend(obj, middle)
+        list.extend(obj, base[len(base) - suffix:])
+    elif kind == _DICT_BODY:
+        dict.update(obj, zip(*body))
+    elif kind == _DICT_DELTA_BODY:
+        base_id, removed, changed_keys, changed_values = body
+        dict.update(obj, lookup(base_id))
+        for key in removed:
+            dict.__delitem__(obj, key)
+        dict.update(obj, zip(changed_keys, changed_values))
+    else:
+        type_name, text, layout, names, values = body
+        object.__setattr__(obj, "_type_name", type_name)
+        object.__setattr__(obj, "_text", text)
+        object.__setattr__(obj, "_layout", layout)
+        obj.__dict__.update(zip(names, values))
+    return obj
+
+
+def _decode_call(payload, names, version):
+    if version == 2:
+        call, parent, depth, name_id = _CALL_V2.unpack_from(payload)
+        context = ""
+    else:
+        call, parent, depth, name_id, context_id = _CALL.unpack_from(payload)
+        context = names[context_id]
+    return CallInfo(call, None if parent == NO_PARENT else parent, depth, names[name_id], context)
+
+
+def _decode_step(payload, names, keyframe, load_value=_load_value):
+    lineno, call, depth, changed_count = _STEP_HEADER.unpack_from(payload, 0)
+    position = _STEP_HEADER.size
+    changed = {}
+    for _ in range(changed_count):
+        name_id, value_length = _BINDING_HEADER.unpack_from(payload, position)
+        position += _BINDING_HEADER.size
+        changed[names[name_id]] = load_value(payload[position:position + value_length])
+        position += value_length
+    removed_count, = _UINT32.unpack_from(payload, position)
+    position += _UINT32.size
+    removed = tuple(names[name_id] for name_id in struct.unpack_from(f"<{removed_count}I", payload, position))
+    return StepRecord(lineno, changed, removed, keyframe, call, depth)
+
+
+class TraceWriter:
+    """
+    Streams steps into a trace file.
+    `target` is a path or a binary file object (which may be a pipe or a
+    socket: the writer never seeks). Call `close()` (or use it as a context
+    manager) to write the index and footer. File objects passed in are left
+    open unless `close_target` is true.
+    """
+
+    def __init__(self, target, keyframe_interval=64, close_target=False):
+        if isinstance(target, (str, os.PathLike)):
+            self._file = open(target, "wb")
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = close_target
+        self._encoder = DeltaEncoder(keyframe_interval)
+        self._offset = 0
+        self._strings = {} # name -> id
+        self._string_offsets = []
+        self._call_offsets = []
+        self._step_offsets = []
+        self._changes = ChangeIndex() # Stored in the index, so readers can query without decoding every step
+        self._objects = OrderedDict() # id(snapshot) -> [snapshot, object id, delta chain length (None until written)]
+        self._object_offsets = array("Q") # By object id
+        self._bases = {} # Variable name -> snapshot last written for it, which its next value may be a delta of
+        self._write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._step_offsets)
+
+    @property
+    def bytes_written(self):
+        return self._offset
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+    def _write_record(self, kind, payload):
+        offset = self._offset
+        self._write(_RECORD_HEADER.pack(kind, len(payload)))
+        self._write(payload)
+        return offset
+
+    def _string_id(self, name):
+        string_id = self._strings.get(name)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings[name] = string_id
+            self._string_offsets.append(self._write_record(STRING, name.encode("utf-8")))
+        return string_id
+
+    def add_call(self, call_info):
+        """Write a call tree entry (a CallInfo)."""
+        parent = NO_PARENT if call_info.parent is None else call_info.parent
+        payload = _CALL.pack(call_info.call, parent, call_info.depth, self._string_id(call_info.name),
+                             self._string_id(call_info.context))
+        self._call_offsets.append(self._write_record(CALL, payload))
+
+    def append(self, lineno, local_vars, call=0, depth=0):
+        """Delta-encode and write the state of the traced frame before `lineno` runs."""
+        self.write_record(self._encoder.encode(lineno, local_vars, call=call, depth=depth))
+
+    def write_record(self, record):
+        """Write an already encoded StepRecord."""
+        parts = [_STEP_HEADER.pack(record.lineno, record.call, record.depth, len(record.changed))]
+        for var_name, var_value in record.changed.items():
+            value_data = self._dump_value(var_value, self._bases.get(var_name))
+            parts.append(_BINDING_HEADER.pack(self._string_id(var_name), len(value_data)))
+            parts.append(value_data)
+            if type(var_value) in _SHARED_TYPES:
+                self._bases[var_name] = var_value
+            else:
+                self._bases.pop(var_name, None)
+        parts.append(_UINT32.pack(len(record.removed)))
+        for var_name in record.removed:
+            parts.append(_UINT32.pack(self._string_id(var_name)))
+            self._bases.pop(var_name, None)
+        kind = KEYFRAME if record.keyframe else DELTA
+        self._step_offsets.append(self._write_record(kind, b"".join(parts)))
+        self._changes.append(record)
+
+    def _dump_value(self, value, base=None):
+        """Pickles a binding's value, first writing object records for the snapshots in it not written yet."""
+        if type(value) in _SHARED_TYPES:
+            self._write_objects(value, base)
+        else:
+            for snapshot in _shared_in((value,)):
+                self._write_objects(snapshot, None)
+        return self._pickle(value)
+
+    def _pickle(self, value):
+        buffer = io.BytesIO()
+        try:
+            _ObjectPickler(buffer, self._objects).dump(value)
+            return buffer.getvalue()
+        except RecursionError:
+            _warn_too_deep(value)
+        except Exception: # Lambdas, open files, locks, objects with broken __reduce__, ...
+            pass
+        buffer = io.BytesIO()
+        _ObjectPickler(buffer, self._objects).dump(_stand_in(value))
+        return buffer.getvalue()
+
+    def _write_objects(self, root, base):
+        """Writes object records for `root` and the snapshots below it that weren't written yet, children first."""
+        objects = self._objects
+        if id(root) in objects:
+            objects.move_to_end(id(root))
+            return
+        self._new_object(root)
+        stack = [(root, base, _children_with_bases(root, base))]
+        while stack:
+            obj, obj_base, children = stack[-1]
+            for child, child_base in children:
+                if id(child) in objects: # Written before, or a cycle back to an object on the stack
+                    objects.move_to_end(id(child))
+                    continue
+                self._new_object(child)
+                stack.append((child, child_base, _children_with_bases(child, child_base)))
+                break
+            else:
+                stack.pop()
+                self._write_object(obj, obj_base)
+        while len(objects) > WRITTEN_OBJECTS:
+            objects.popitem(last=False)
+
+    def _new_object(self, snapshot):
+        self._objects[id(snapshot)] = [snapshot, len(self._object_offsets), None]
+        self._object_offsets.append(0)
+
+    def _write_object(self, obj, base):
+        entry = self._objects[id(obj)]
+        base_entry = self._objects.get(id(base)) if base is not None else None
+        if base_entry is None or base_entry[0] is not base or base_entry[2] is None or base_entry[2] >= DELTA_CHAIN:
+            base_entry = None # No usable base: it must be written, and not at the end of a delta chain
+        if type(obj) is FrozenList:
+            delta = _list_delta(base, obj) if base_entry is not None and len(obj) >= DELTA_MIN_ITEMS else None
+            if delta is not None:
+                prefix, suffix = delta
+                kind, body = _LIST_DELTA_BODY, (base_entry[1], prefix, suffix, list(obj[prefix:len(obj) - suffix]))
+            else:
+                kind, body = _LIST_BODY, (list(obj),)
+        elif type(obj) is FrozenDict:
+            delta = _dict_delta(base, obj) if base_entry is not None and len(obj) >= DELTA_MIN_ITEMS else None
+            if delta is not None:
+                removed, changed = delta
+                kind, body = _DICT_DELTA_BODY, (base_entry[1], removed, changed, [obj[key] for key in changed])
+            else:
+                kind, body = _DICT_BODY, (list(obj), list(obj.values()))
+        else:
+            kind, body = _NODE_BODY, (obj._type_name, obj._text, obj._layout, list(obj.__dict__),
+                                      list(obj.__dict__.values()))
+        is_delta = kind in (_LIST_DELTA_BODY, _DICT_DELTA_BODY)
+        entry[2] = base_entry[2] + 1 if is_delta else 0
+
+        entries = [part for part in body if isinstance(part, list)]
+        dependencies = [self._objects[id(snapshot)][1] for snapshot in _shared_in(itertools.chain(*entries))]
+        if is_delta:
+            dependencies.append(body[0]) # The base
+        buffer = io.BytesIO()
+        try:
+            _ObjectPickler(buffer, self._objects).dump(body)
+        except Exception: # Some item can't be pickled (or is nested too deeply): store those as text
+            body = tuple([self._safe_item(item) for item in part] if isinstance(part, list) else part
+                         for part in body)
+            buffer = io.BytesIO()
+            _ObjectPickler(buffer, self._objects).dump(body)
+        payload = [_OBJECT_HEADER.pack(entry[1], kind, len(dependencies)), array("I", dependencies).tobytes(),
+                   buffer.getvalue()]
+        self._object_offsets[entry[1]] = self._write_record(OBJECT, b"".join(payload))
+
+    def _safe_item(self, item):
+        """`item` if it can be pickled, else its stand-in."""
+        if type(item) in _SHARED_TYPES:
+            return item
+        try:
+            _ObjectPickler(io.BytesIO(), self._objects).dump(item)
+            return item
+        except RecursionError:
+            _warn_too_deep(item)
+        except Exception:
+            pass
+        return _stand_in(item)
+
+    def flush(self):
+        """Push buffered records to the target, e.g. so a live viewer sees them now."""
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        index = [_UINT64.pack(len(self._step_offsets)), array("Q", self._step_offsets).tobytes(),
+                 _UINT64.pack(len(self._string_offsets)), array("Q", self._string_offsets).tobytes(),
+                 _UINT64.pack(len(self._call_offsets)), array("Q", self._call_offsets).tobytes(),
+                 _UINT64.pack(len(self._object_offsets)), self._object_offsets.tobytes(),
+                 _UINT64.pack(len(self._changes.steps))]
+        for var_name, steps in self._changes.steps.items():
+            index.append(_BINDING_HEADER.pack(self._string_id(var_name), len(steps)))
+            index.append(steps.tobytes())
+        index_offset = self._write_record(INDEX, b"".join(index))
+        self._write(_FOOTER.pack(index_offset, INDEX_MAGIC))
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+        self._file = None
+        self._objects.clear()
+        self._bases.clear()
+
+
+class TraceFile(_SharedObjects, StepSequence):
+    """
+    Read-only, memory-mapped view of a trace file.
+    Steps are decoded on demand, so opening a trace and jumping to any step
+    does not load the whole file.
+    """
+
+    exact_changes = False # Every record is unpickled separately
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._mmap)
+        header = bytes(self._data[:len(MAGIC)])
+        if header[:-1] != MAGIC[:-1] or header[-1] not in _READABLE_VERSIONS:
+            self.close()
+            raise ValueError(f"{path} is not a dryviz trace file (or was written by another version)")
+        self.version = header[-1]
+        self._init_objects()
+        self._object_offsets = array("Q")
+        self._change_steps = None # name id -> steps, when the index has them
+        if not self._read_index():
+            self._scan_records()
+        self._names = [bytes(self._payload(offset)).decode("utf-8") for offset in self._string_offsets]
+        if self._change_steps is not None:
+            self._changes = ChangeIndex(exact=False)
+            self._changes.steps = {self._names[name_id]: steps for name_id, steps in self._change_steps.items()}
+            self._changes.count = len(self._step_offsets)
+        self.calls = {}
+        for offset in self._call_offsets:
+            call_info = _decode_call(self._payload(offset), self._names, self.version)
+            self.calls[call_info.call] = call_info
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._data.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def _read_index(self):
+        """Loads the trailing index; returns False if the file has no valid footer."""
+        if len(self._data) < len(MAGIC) + _FOOTER.size:
+            return False
+        index_offset, magic = _FOOTER.unpack_from(self._data, len(self._data) - _FOOTER.size)
+        if magic != INDEX_MAGIC:
+            return False
+        payload = self._payload(index_offset)
+        position = 0
+        offset_tables = []
+        for _table in range(4 if self.version >= 4 else 3): # steps, strings, calls (, objects)
+            count, = _UINT64.unpack_from(payload, position)
+            position += _UINT64.size
+            offsets = array("Q")
+            offsets.frombytes(payload[position:position + 8 * count])
+            position += 8 * count
+            offset_tables.append(offsets)
+        self._step_offsets, self._string_offsets, self._call_offsets = offset_tables[:3]
+        if len(offset_tables) > 3:
+            self._object_offsets = offset_tables[3]
+        if position < len(payload): # Files written before the change index was added end here
+            count, = _UINT64.unpack_from(payload, position)
+            position += _UINT64.size
+            self._change_steps = {}
+            for _variable in range(count):
+                name_id, step_count = _BINDING_HEADER.unpack_from(payload, position)
+                position += _BINDING_HEADER.size
+                steps = array("I")
+                steps.frombytes(payload[position:position + 4 * step_count])
+                position += 4 * step_count
+                self._change_steps[name_id] = steps
+        return True
+
+    def _scan_records(self):
+        """Rebuilds the index by walking the records (used for unterminated files)."""
+        self._step_offsets = array("Q")
+        self._string_offsets = array("Q")
+        self._call_offsets = array("Q")
+        offset = len(MAGIC)
+        end = len(self._data)
+        while offset + _RECORD_HEADER.size <= end:
+            kind, length = _RECORD_HEADER.unpack_from(self._data, offset)
+            if offset + _RECORD_HEADER.size + length > end:
+                break # Truncated final record
+            if kind == STRING:
+                self._string_offsets.append(offset)
+            elif kind == CALL:
+                self._call_offsets.append(offset)
+            elif kind in (KEYFRAME, DELTA):
+                self._step_offsets.append(offset)
+            elif kind == OBJECT:
+                object_id, = _UINT32.unpack_from(self._data, offset + _RECORD_HEADER.size)
+                if object_id >= len(self._object_offsets):
+                    self._object_offsets.extend([0] * (object_id + 1 - len(self._object_offsets)))
+                self._object_offsets[object_id] = offset
+            offset += _RECORD_HEADER.size + length
+
+    def _payload(self, offset):
+        _kind, length = _RECORD_HEADER.unpack_from(self._data, offset)
+        start = offset + _RECORD_HEADER.size
+        return self._data[start:start + length]
+
+    def _object_payload(self, object_id):
+        return self._payload(self._object_offsets[object_id])
+
+    def __len__(self):
+        return len(self._step_offsets)
+
+    def is_keyframe(self, index):
+        return bytes(self._data[self._step_offsets[index]:self._step_offsets[index] + 1]) == KEYFRAME
+
+    def lineno_at(self, index):
+        return _UINT32.unpack_from(self._data, self._step_offsets[index] + _RECORD_HEADER.size)[0]
+
+    def record_at(self, index):
+        return _decode_step(self._payload(self._step_offsets[index]), self._names, self.is_keyframe(index),
+                            self._load_value)
+
+
+class TraceStream(_SharedObjects, StepSequence):
+    """
+    A trace being received, e.g. by the live viewer from a socket.
+    `feed()` takes the bytes of a trace file as they arrive, in chunks of
+    any size; every complete record is appended at once, so the steps
+    received so far can be viewed while more are coming. Steps are stored
+    encoded and decoded on demand, like in TraceFile.
+    """
+
+    exact_changes = False
+
+    def __init__(self):
+        self.version = None
+        self.calls = {}
+        self.complete = False # The writer closed the trace (its index record arrived)
+        self._buffer = bytearray()
+        self._names = []
+        self._steps = [] # (keyframe, payload) per step
+        self._objects = {} # object id -> payload of its object record
+        self._init_objects()
+
+    def feed(self, data):
+        """Appends the records completed by `data`; returns how many steps were added."""
+        if self.complete:
+            return 0 # Only the footer follows the index
+        buffer = self._buffer
+        buffer += data
+        position = 0
+        if self.version is None:
+            if len(buffer) < len(MAGIC):
+                return 0
+            header = bytes(buffer[:len(MAGIC)])
+            if header[:-1] != MAGIC[:-1] or header[-1] not in _READABLE_VERSIONS:
+                raise ValueError("not a dryviz trace stream (or written by another version)")
+            self.version = header[-1]
+            position = len(MAGIC)
+
+        added = 0
+        while position + _RECORD_HEADER.size <= len(buffer):
+            kind, length = _RECORD_HEADER.unpack_from(buffer, position)
+            start = position + _RECORD_HEADER.size
+            if start + length > len(buffer):
+                break # Wait for the rest of the record
+            position = start + length
+            if kind in (KEYFRAME, DELTA):
+                self._steps.append((kind == KEYFRAME, bytes(buffer[start:position])))
+                added += 1
+            elif kind == OBJECT:
+                payload = bytes(buffer[start:position])
+                self._objects[_UINT32.unpack_from(payload)[0]] = payload
+            elif kind == STRING:
+                self._names.append(buffer[start:position].decode("utf-8"))
+            elif kind == CALL:
+                call_info = _decode_call(buffer[start:position], self._names, self.version)
+                self.calls[call_info.call] = call_info
+            elif kind == INDEX:
+                self.complete = True
+                position = len(buffer)
+                break
+        del buffer[:position]
+        return added
+
+    def __len__(self):
+        return len(self._steps)
+
+    def is_keyframe(self, index):
+        return self._steps[index][0]
+
+    def lineno_at(self, index):
+        return _UINT32.unpack_from(self._steps[index][1])[0]
+
+    def _object_payload(self, object_id):
+        return self._objects[object_id]
+
+    def record_at(self, index):
+        keyframe, payload = self._steps[index]
+        return _decode_step(payload, self._names, keyframe, self._load_value)
@@ -1,14 +1,73 @@
+from collections import Counter, namedtuple
+from itertools import islice
+from rich.text import Text
 from rich.tree import Tree
 
+from .graphs import graph_csr
+from .snapshot import LINKED_LIST, TREE, Elided, SnapshotCache, is_snapshot, node_layout, type_name
+
 # --- Visualizer Registry ---
 VISUALIZER_REGISTRY = []
 
-def register_visualizer(condition_func, visualizer_func, priority=0):
+# Visualizers to try per (type, shape fingerprint), as in rendering._renderer_plan; () means "use the fallback".
+_VISUALIZER_CACHE = {}
+DISPATCH_CACHE_SIZE = 4096
+_FINGERPRINTS = SnapshotCache(DISPATCH_CACHE_SIZE) # Fingerprints of dict snapshots
+
+# Memoized renderables of snapshots (see snapshot.SnapshotCache): whole
+# variables, and fully rendered subtrees of tree nodes. Budgets are in Rich
+# tree nodes kept alive by the cache.
+RENDER_CACHE_NODES = 200_000
+RENDER_MEMO = SnapshotCache(RENDER_CACHE_NODES)
+_SUBTREE_CACHE = SnapshotCache(RENDER_CACHE_NODES)
+
+def clear_render_caches():
+    """Drops every memoized renderable (called whenever dispatch may change)."""
+    _VISUALIZER_CACHE.clear()
+    _FINGERPRINTS.clear()
+    RENDER_MEMO.clear()
+    _SUBTREE_CACHE.clear()
+
+def register_visualizer(condition_func, visualizer_func, priority=0, cacheable=False):
     """
     Registers a new visualizer strategy.
-    Visualizers with higher priority are checked first.
+    Visualizers with higher priority are checked first. `condition_func`
+    is checked on every value, unless `cacheable` says it only depends on
+    the type and shape_fingerprint() of the value.
+    """
+    VISUALIZER_REGISTRY.append({'condition': condition_func, 'visualizer': visualizer_func, 'priority': priority,
+                                'cacheable': cacheable})
+    # Keep the registry sorted (stable, so equal priorities stay in registration order)
+    VISUALIZER_REGISTRY.sort(key=lambda x: x['priority'], reverse=True)
+    clear_render_caches()
+
+def shape_fingerprint(data):
+    """
+    Cheap summary of the parts of a value that the registered conditions look at.
+    Dicts are summarised from all their values (their types and, when all are
+    collections, whether any is non-empty), plain objects by their attribute
+    names. Values with the same type and fingerprint dispatch alike.
+    Fingerprints of dict snapshots are memoized, as they never change.
     """
-    VISUALIZER_REGISTRY.append({'condition': condition_func, 'visualizer': visualizer_func, 'priority': priority})
+    if isinstance(data, dict):
+        if not is_snapshot(data):
+            return _dict_fingerprint(data)
+        fingerprint = _FINGERPRINTS.get(data)
+        if fingerprint is None:
+            fingerprint = _dict_fingerprint(data)
+            _FINGERPRINTS.put(data, fingerprint)
+        return fingerprint
+    attributes = getattr(data, '__dict__', None)
+    if isinstance(attributes, dict):
+        return (node_layout(data), tuple(attributes))
+    return None
+
+def _dict_fingerprint(data):
+    values = data.values()
+    types = frozenset(map(type, values))
+    # Only collections' truthiness matters (and other values may not have one)
+    collections = all(issubclass(t, (dict, list, set, tuple)) for t in types)
+    return (len(data) > 0, types, collections and any(values))
 
 # --- Condition Functions ---
 
@@ -16,6 +75,9 @@ def _is_linked_list_node(data):
     """Checks if data could be the head of a linked list."""
     if isinstance(data, (dict, list, tuple, set, str, int, float, bool)) or data is None:
         return False
+    layout = node_layout(data)
+    if layout is not None: # Declared, no guessing
+        return layout.shape == LINKED_LIST
     has_val_attr = hasattr(data, 'value') or hasattr(data, 'val') or hasattr(data, 'data')
     if not (has_val_attr and hasattr(data, 'next')):
         return False
@@ -28,6 +90,9 @@ def _is_tree_node(data):
     """Checks if data could be a tree node (and not better handled as a linked list)."""
     if isinstance(data, (dict, list, tuple, set, str, int, float, bool)) or data is None:
         return False
+    layout = node_layout(data)
+    if layout is not None:
+        return layout.shape == TREE
     has_val_attr = hasattr(data, 'value') or hasattr(data, 'val') or hasattr(data, 'key')
     has_children_attrs = hasattr(data, 'children') or hasattr(data, 'left') or hasattr(data, 'right')
     if not (has_val_attr and has_children_attrs):
@@ -58,60 +123,316 @@ def _is_dictionary(data):
 
 # --- Internal Visualizer Implementations ---
 
-def _build_rich_tree_for_linked_list_node(node, tree_widget):
-    if node is None:
-        tree_widget.add("None")
-        return
-    
-    display_val = "Unknown"
+# Traversal budgets for node-based structures. Anything beyond them is collapsed
+# into an "… N more" summary so rendering time stays bounded.
+MAX_NODES = 200
+MAX_DEPTH = 50
+_MAX_REMAINDER_COUNT = 10_000 # Stop counting hidden nodes past this point
+
+# Containers longer than WINDOW_HEAD + WINDOW_TAIL items only show a window:
+# WINDOW_HEAD items starting at the page offset and the last WINDOW_TAIL,
+# with the rest elided and a summary (length, value types) in the label.
+# Type histograms of containers over SUMMARY_SAMPLE items are sampled.
+WINDOW_HEAD = 20
+WINDOW_TAIL = 5
+SUMMARY_SAMPLE = 1000
+_window_offset = 0 # First item of the head window (0 = the start); moved by the viewer to page
+
+def set_container_window(head=None, tail=None, offset=None):
+    """Changes the window shown of large containers (see WINDOW_HEAD) and drops renderables built with the old one."""
+    global WINDOW_HEAD, WINDOW_TAIL, _window_offset
+    if head is not None:
+        WINDOW_HEAD = max(head, 1)
+    if tail is not None:
+        WINDOW_TAIL = max(tail, 0)
+    if offset is not None:
+        _window_offset = max(offset, 0)
+    clear_render_caches()
+
+def container_window():
+    """The current (head, tail, offset) window of large containers."""
+    return WINDOW_HEAD, WINDOW_TAIL, _window_offset
+
+def is_windowed(data):
+    """Checks whether `data` is a container long enough to be shown as a window."""
+    return isinstance(data, (list, tuple, dict, set, frozenset)) and len(data) > WINDOW_HEAD + WINDOW_TAIL
+
+def _window_bounds(count):
+    """Positions shown of a container of `count` items: the head window [start, stop) and the tail from `tail_start`."""
+    if count <= WINDOW_HEAD + WINDOW_TAIL:
+        return 0, count, count
+    start = min(_window_offset, count - WINDOW_HEAD - WINDOW_TAIL)
+    return start, start + WINDOW_HEAD, count - WINDOW_TAIL
+
+def _window_items(items, count, reverse=False):
+    """
+    Yields (position, item) for the shown items of a sized iterable or
+    sequence, in display order (reversed for stacks), and (None, hidden)
+    where items are elided. Only the shown items are visited, except that
+    skipping into an unindexable container (sets, dict views) walks past
+    the items before the window.
+    """
+    start, stop, tail_start = _window_bounds(count)
+    if isinstance(items, (list, tuple)):
+        def item_at(position):
+            return items[count - 1 - position] if reverse else items[position]
+        head = ((position, item_at(position)) for position in range(start, stop))
+        tail = ((position, item_at(position)) for position in range(tail_start, count))
+    else:
+        head = enumerate(islice(items, start, stop), start)
+        if tail_start == count:
+            tail = ()
+        elif hasattr(items, "__reversed__"):
+            tail = enumerate(reversed(list(islice(reversed(items), count - tail_start))), tail_start)
+        else:
+            tail = enumerate(islice(items, tail_start, count), tail_start)
+    if start:
+        yield None, start
+    yield from head
+    if tail_start > stop:
+        yield None, tail_start - stop
+    yield from tail
+
+def container_summary(data):
+    """Length and value types of a container, e.g. "100,000 items · int ×99,990, str ×10"."""
+    count = len(data)
+    values = data.values() if isinstance(data, dict) else data
+    if count > SUMMARY_SAMPLE:
+        stride = count // SUMMARY_SAMPLE | 1 # Odd, so alternating patterns don't alias
+        sample = values[::stride] if isinstance(values, (list, tuple)) else islice(values, 0, None, stride)
+        histogram = Counter(map(type_name, sample))
+        sampled = sum(histogram.values())
+        types = [f"{name} {n / sampled:.0%}" if n * 100 >= sampled else f"{name} <1%"
+                 for name, n in histogram.most_common(3)]
+    else:
+        histogram = Counter(map(type_name, values))
+        types = [f"{name} ×{n:,}" for name, n in histogram.most_common(3)]
+    if len(histogram) > 3:
+        types.append("…")
+    return f"{count:,} items · " + ", ".join(types)
+
+def windowed_text(data, limit=100):
+    """One-line text of a value; large containers only show their window, e.g. [0, 1, … 99,970 more …, 99999]."""
+    if not is_windowed(data):
+        return str(data)[:limit]
+    is_dict = isinstance(data, dict)
+    parts = []
+    for position, item in _window_items(data.items() if is_dict else data, len(data)):
+        if position is None:
+            parts.append(f"… {item:,} more …")
+        elif is_dict:
+            parts.append(f"{item[0]!s}: {str(item[1])[:limit]}")
+        else:
+            parts.append(str(item)[:limit])
+    if is_dict or isinstance(data, (set, frozenset)):
+        opening, closing = "{", "}"
+    elif isinstance(data, tuple):
+        opening, closing = "(", ")"
+    else:
+        opening, closing = "[", "]"
+    return f"{opening}{', '.join(parts)}{closing} ({container_summary(data)})"
+
+def _linked_list_display_value(node):
+    layout = node_layout(node)
+    if layout is not None:
+        return getattr(node, layout.value, "Unknown")
     if hasattr(node, 'data'):
-        display_val = node.data
-    elif hasattr(node, 'value'):
-        display_val = node.value
-    elif hasattr(node, 'val'):
-        display_val = node.val
-        
-    subtree = tree_widget.add(f"[{display_val}]")
-    if hasattr(node, 'next'):
-        _build_rich_tree_for_linked_list_node(node.next, subtree)
+        return node.data
+    if hasattr(node, 'value'):
+        return node.value
+    if hasattr(node, 'val'):
+        return node.val
+    return "Unknown"
+
+def _next_attribute(node):
+    """Name of the attribute holding a linked list node's successor."""
+    layout = node_layout(node)
+    return layout.next if layout is not None and layout.next else 'next'
+
+def _count_remaining_linked_list_nodes(node, visited):
+    """Counts the nodes left in a list without rendering them (bounded, cycle-safe)."""
+    count = 0
+    seen = set()
+    while node is not None and id(node) not in visited and id(node) not in seen:
+        if count >= _MAX_REMAINDER_COUNT:
+            return f"{count}+"
+        if isinstance(node, Elided):
+            return f"{count}+"
+        seen.add(id(node))
+        count += 1
+        node = getattr(node, _next_attribute(node), None)
+    return str(count)
+
+def _build_rich_tree_for_linked_list_node(node, tree_widget, max_nodes=None, max_depth=None):
+    """Adds a linked list to tree_widget iteratively, one nested level per node."""
+    limit = min(MAX_NODES if max_nodes is None else max_nodes,
+                MAX_DEPTH if max_depth is None else max_depth)
+    visited = {} # id(node) -> (position, display value)
+    position = 0
+    while True:
+        if node is None:
+            tree_widget.add("None")
+            return
+        if isinstance(node, Elided): # Past the snapshot budget
+            tree_widget.add("… (not captured)")
+            return
+        if id(node) in visited:
+            target_position, target_value = visited[id(node)]
+            tree_widget.add(f"↺ cycle to node #{target_position} [{target_value}]")
+            return
+        if position >= limit:
+            remaining = _count_remaining_linked_list_nodes(node, visited)
+            tree_widget.add(f"… {remaining} more")
+            return
+
+        display_val = _linked_list_display_value(node)
+        visited[id(node)] = (position, display_val)
+        tree_widget = tree_widget.add(f"[{display_val}]")
+        position += 1
+        next_attribute = _next_attribute(node)
+        if not hasattr(node, next_attribute):
+            return
+        node = getattr(node, next_attribute)
 
 def _visualize_linked_list_internal(head, name):
     root_widget = Tree(name)
     _build_rich_tree_for_linked_list_node(head, root_widget)
     return root_widget
 
-def _build_rich_tree_for_generic_node(node_data, tree_widget):
-    if node_data is None:
-        tree_widget.add("None")
-        return
-
-    display_value = "Unknown"
+def _tree_node_display_value(node_data):
+    layout = node_layout(node_data)
+    if layout is not None:
+        return getattr(node_data, layout.value, None)
     if hasattr(node_data, 'value'):
-        display_value = node_data.value
-    elif hasattr(node_data, 'val'):
-        display_value = node_data.val
-    elif hasattr(node_data, 'key'):
-        display_value = node_data.key
-    elif isinstance(node_data, (int, str, float, bool)):
-        display_value = node_data
-    else:
-        display_value = str(node_data)[:30]
-
-    subtree = tree_widget.add(f"[{display_value}]")
-
+        return node_data.value
+    if hasattr(node_data, 'val'):
+        return node_data.val
+    if hasattr(node_data, 'key'):
+        return node_data.key
+    if isinstance(node_data, (int, str, float, bool)):
+        return node_data
+    return str(node_data)[:30]
+
+def _tree_node_children(node_data):
+    """
+    Returns the child entries of a tree node as (child, placeholder_label) pairs.
+    Binary nodes missing a left/right attribute get a placeholder label instead of a child.
+    """
+    layout = node_layout(node_data)
+    if layout is not None and layout.shape == TREE:
+        if isinstance(layout.children, str): # One attribute holding the list of children
+            return [(child, None) for child in getattr(node_data, layout.children, None) or ()]
+        return [(getattr(node_data, name), None) if hasattr(node_data, name) else (None, f"{name}: None")
+                for name in layout.children]
     if hasattr(node_data, 'children') and node_data.children:
-        for child in node_data.children:
-            _build_rich_tree_for_generic_node(child, subtree)
-    elif hasattr(node_data, 'left') or hasattr(node_data, 'right'): # Binary tree nodes
-        if hasattr(node_data, 'left'):
-            _build_rich_tree_for_generic_node(node_data.left, subtree)
-        else: # Add a placeholder if only right child exists for structure
-            subtree.add("left: None")
-            
-        if hasattr(node_data, 'right'):
-            _build_rich_tree_for_generic_node(node_data.right, subtree)
-        else: # Add a placeholder if only left child exists
-            subtree.add("right: None")
+        return [(child, None) for child in node_data.children]
+    if hasattr(node_data, 'left') or hasattr(node_data, 'right'): # Binary tree nodes
+        return [
+            (node_data.left, None) if hasattr(node_data, 'left') else (None, "left: None"),
+            (node_data.right, None) if hasattr(node_data, 'right') else (None, "right: None"),
+        ]
+    return []
+
+# Stack entry label marking the end of a node's subtree in the depth-first walk.
+_SubtreeEnd = namedtuple("_SubtreeEnd", ["start", "markers"])
+
+# A fully rendered subtree: its widget, the (id, display value) pairs of its
+# nodes (order[start:end]), and how many levels below it have children.
+_CachedSubtree = namedtuple("_CachedSubtree", ["widget", "order", "start", "end", "height"])
+
+def _build_rich_tree_for_generic_node(node_data, tree_widget, max_nodes=None, max_depth=None):
+    """
+    Adds a tree to tree_widget with an iterative depth-first walk.
+    Nodes reached a second time (cycles, shared subtrees) become a back-reference
+    marker, and the node/depth budgets collapse whatever is left into "… N more".
+    Subtrees of snapshot nodes that rendered completely (no marker inside) are
+    memoized, so a partially changed tree only rebuilds its changed parts.
+    """
+    max_nodes = MAX_NODES if max_nodes is None else max_nodes
+    max_depth = MAX_DEPTH if max_depth is None else max_depth
+    visited = {} # id(node) -> display value
+    order = [] # (id(node), display value) in render order; subtrees are slices of it
+    heights = {} # id(node) -> levels with children below it, for finished subtrees
+    markers = 0 # Cycle and "… N more" markers added so far
+    shown = 0
+    # Entries are (node, parent widget, depth, placeholder label)
+    stack = [(node_data, tree_widget, 0, None)]
+
+    while stack:
+        node, parent, depth, label = stack.pop()
+        if isinstance(label, _SubtreeEnd):
+            # parent is the node's own widget here
+            height = 0
+            children = _tree_node_children(node)
+            if children:
+                height = 1 + max(heights.get(id(child), 0) for child, _label in children)
+            heights[id(node)] = height
+            if markers == label.markers and is_snapshot(node) and len(order) - label.start > 1:
+                _SUBTREE_CACHE.put(node, _CachedSubtree(parent, order, label.start, len(order), height),
+                                   weight=len(order) - label.start)
+            continue
+        if label is not None:
+            parent.add(label)
+            continue
+        if node is None:
+            parent.add("None")
+            continue
+        if isinstance(node, Elided):
+            parent.add("… (not captured)")
+            markers += 1
+            continue
+        if id(node) in visited:
+            parent.add(f"↺ cycle to node [{visited[id(node)]}]")
+            markers += 1
+            continue
+        if shown >= max_nodes:
+            stack.append((node, parent, depth, None))
+            _collapse_pending_nodes(stack)
+            return
+
+        cached = _SUBTREE_CACHE.get(node) if is_snapshot(node) else None
+        if cached is not None:
+            span = cached.order[cached.start:cached.end]
+            if (shown + len(span) <= max_nodes and depth + cached.height < max_depth
+                    and not any(node_id in visited for node_id, _value in span)):
+                # Renders exactly as before: reuse the widget instead of rebuilding it.
+                parent.children.append(cached.widget)
+                visited.update(span)
+                order.extend(span)
+                heights[id(node)] = cached.height
+                shown += len(span)
+                continue
+
+        display_value = _tree_node_display_value(node)
+        visited[id(node)] = display_value
+        order.append((id(node), display_value))
+        shown += 1
+        subtree = parent.add(f"[{display_value}]")
+
+        children = _tree_node_children(node)
+        if not children:
+            continue
+        if depth + 1 >= max_depth:
+            hidden = sum(1 for child, _label in children if child is not None)
+            if hidden:
+                subtree.add(f"… {hidden} more")
+                markers += 1
+            continue
+        stack.append((node, subtree, depth, _SubtreeEnd(len(order) - 1, markers)))
+        # Push in reverse so the first child is rendered first
+        for child, child_label in reversed(children):
+            stack.append((child, subtree, depth + 1, child_label))
+
+def _collapse_pending_nodes(stack):
+    """Replaces every pending (not yet rendered) node with a per-parent "… N more" summary."""
+    pending = {} # id(parent widget) -> [parent widget, hidden node count]
+    for node, parent, _depth, label in reversed(stack): # Subtree ends and placeholders have a label
+        if label is not None or node is None:
+            continue
+        pending.setdefault(id(parent), [parent, 0])[1] += 1
+    for parent, hidden in pending.values():
+        parent.add(f"… {hidden} more")
+    stack.clear()
 
 
 def _visualize_tree_internal(root_node_data, name):
@@ -119,59 +440,221 @@ def _visualize_tree_internal(root_node_data, name):
     _build_rich_tree_for_generic_node(root_node_data, root_widget)
     return root_widget
 
-def _visualize_graph_internal(graph_data, name):
-    tree = Tree(name)
-    if not graph_data:
-        tree.add("(Empty Graph)")
-        return tree
-    for node, neighbors in graph_data.items():
-        node_subtree = tree.add(f"Node({node})")
-        if isinstance(neighbors, dict): 
+# Graph views. "auto" lists every edge of graphs with up to GRAPH_EDGE_LIST_MAX
+# edges, and summarizes larger ones (plus the neighborhood of the nodes held
+# by the step's variables). Large graphs are rendered from their cached CSR
+# form (see graphs.py), so the cost follows what is shown, not the edge count.
+GRAPH_VIEWS = ("auto", "edges", "summary", "neighborhood", "matrix")
+GRAPH_EDGE_LIST_MAX = 150
+MATRIX_MAX_NODES = 40
+NEIGHBOR_LIMIT = 20 # Edges listed per node in the neighborhood view
+FOCUS_LIMIT = 5 # Nodes shown in the neighborhood view
+_MATRIX_PALETTE = ("#2c4f7c", "#2f7fb0", "#3fa7d6", "#7fd1ae", "#f9e07f") # Low to high weight
+_graph_view = "auto"
+_step_focus = () # Scalar values of the step being rendered: candidate "current" nodes
+
+def set_graph_view(view):
+    """Picks how graph dicts are shown (one of GRAPH_VIEWS) and drops renderables built with the old view."""
+    global _graph_view
+    if view not in GRAPH_VIEWS:
+        raise ValueError(f"Unknown graph view {view!r}, expected one of {GRAPH_VIEWS}")
+    _graph_view = view
+    clear_render_caches()
+
+def graph_view():
+    return _graph_view
+
+def set_step_focus(variables):
+    """Remembers the scalar variables of the step being rendered (node ids such as `current` or `neighbor`)."""
+    global _step_focus
+    focus = []
+    for value in variables.values():
+        if type(value) in (str, int, float) and value not in focus:
+            focus.append(value)
+    _step_focus = tuple(focus)
+
+def graph_focus(data):
+    """The nodes of graph dict `data` held by the step's variables; part of the render memo key of graphs."""
+    if not _step_focus or not isinstance(data, dict):
+        return ()
+    return tuple(node for node in _step_focus if node in data)
+
+def _graph_edges_view(graph_data, tree, focus):
+    for position, entry in _window_items(graph_data.items(), len(graph_data)):
+        if position is None:
+            tree.add(f"[dim]… {entry:,} more nodes[/]")
+            continue
+        node, neighbors = entry
+        node_subtree = tree.add(f"Node({node}) [bold yellow]◀[/]" if node in focus else f"Node({node})")
+        if isinstance(neighbors, dict):
             if neighbors:
-                for neighbor, weight in neighbors.items():
-                    node_subtree.add(f"-> {neighbor} (weight: {weight})")
+                for shown, edge in _window_items(neighbors.items(), len(neighbors)):
+                    if shown is None:
+                        node_subtree.add(f"[dim]… {edge:,} more[/]")
+                    else:
+                        node_subtree.add(f"-> {edge[0]} (weight: {edge[1]})")
             else:
                 node_subtree.add(" (No outgoing edges)")
         elif isinstance(neighbors, (list, set, tuple)):
             if neighbors:
-                for neighbor in neighbors:
-                    node_subtree.add(f"-> {neighbor}")
+                for shown, neighbor in _window_items(neighbors, len(neighbors)):
+                    if shown is None:
+                        node_subtree.add(f"[dim]… {neighbor:,} more[/]")
+                    else:
+                        node_subtree.add(f"-> {neighbor}")
             else:
                 node_subtree.add(" (No outgoing edges)")
         else:
             node_subtree.add(f"(Neighbors: {str(neighbors)[:50]})")
     return tree
 
+def _graph_summary_view(csr, tree):
+    summary = csr.summary()
+    tree.add(f"isolated nodes {summary['isolated']:,} · self loops {summary['self_loops']:,}")
+    for label in ("out_degree", "in_degree"):
+        low, mean, high = summary[label]
+        tree.add(f"{label.replace('_', '-')} min {low:,} · mean {mean:.2f} · max {high:,}")
+    hubs = ", ".join(f"{csr.nodes[position]} ({csr.out_degree(position):,})" for position in summary["hubs"])
+    tree.add(f"most out-edges: {hubs}")
+    return tree
+
+def _add_edges(parent, edges, arrow, total):
+    for target, weight in edges:
+        parent.add(f"{arrow} {target}" if weight is None else f"{arrow} {target} (weight: {weight})")
+    if total > len(edges):
+        parent.add(f"[dim]… {total - len(edges):,} more[/]")
+
+def _graph_neighborhood_view(csr, tree, focus):
+    if not focus:
+        tree.add("[dim](No node of this graph is held by a variable at this step)[/]")
+        return tree
+    for node in focus[:FOCUS_LIMIT]:
+        position = csr.index[node]
+        out_degree, in_degree = csr.out_degree(position), csr.in_degree(position)
+        node_subtree = tree.add(f"Node({node}) [bold yellow]◀[/] [dim]out {out_degree:,} · in {in_degree:,}[/]")
+        out_edges = csr.out_edges(position)[:NEIGHBOR_LIMIT]
+        _add_edges(node_subtree, [(csr.nodes[target], weight) for target, weight in out_edges], "->", out_degree)
+        in_edges = csr.in_neighbors(position)[:NEIGHBOR_LIMIT]
+        _add_edges(node_subtree, [(csr.nodes[source], None) for source in in_edges], "<-", in_degree)
+    if len(focus) > FOCUS_LIMIT:
+        tree.add(f"[dim]… {len(focus) - FOCUS_LIMIT} more nodes held by variables[/]")
+    return tree
+
+def _graph_matrix_view(csr, tree, focus):
+    if csr.node_count > MATRIX_MAX_NODES:
+        tree.add(f"[dim](Matrix view is limited to {MATRIX_MAX_NODES} nodes)[/]")
+        return _graph_summary_view(csr, tree)
+    numeric = [weight for weight in csr.weights or () if isinstance(weight, (int, float))
+               and not isinstance(weight, bool)]
+    low, high = (min(numeric), max(numeric)) if numeric else (0, 0)
+    labels = [str(node)[:8] for node in csr.nodes]
+    width = max(map(len, labels))
+    matrix = Text()
+    header = " ".join(f"{column % 10}" for column in range(csr.node_count))
+    matrix.append(f"{'':>{width}} {header}\n", style="dim")
+    for row, label in enumerate(labels):
+        cells = {}
+        for target, weight in csr.out_edges(row):
+            if isinstance(weight, (int, float)) and not isinstance(weight, bool) and high > low:
+                shade = round((weight - low) / (high - low) * (len(_MATRIX_PALETTE) - 1))
+            else:
+                shade = len(_MATRIX_PALETTE) - 1
+            cells[target] = max(cells.get(target, 0), shade)
+        matrix.append(f"{label:>{width}} ", style="bold yellow" if csr.nodes[row] in focus else "")
+        for column in range(csr.node_count):
+            if column in cells:
+                matrix.append("■", style=_MATRIX_PALETTE[cells[column]])
+            else:
+                matrix.append("·", style="dim")
+            matrix.append(" ")
+        matrix.append("\n")
+    if numeric:
+        matrix.append(f"weights {low} ", style="dim")
+        for color in _MATRIX_PALETTE:
+            matrix.append("■", style=color)
+        matrix.append(f" {high}   ", style="dim")
+    matrix.append("columns follow the row order, numbered mod 10", style="dim")
+    tree.add(matrix)
+    return tree
+
+def _visualize_graph_internal(graph_data, name):
+    tree = Tree(name)
+    if not graph_data:
+        tree.add("(Empty Graph)")
+        return tree
+    focus = graph_focus(graph_data)
+    csr = graph_csr(graph_data)
+    view = _graph_view
+    if view == "auto":
+        if csr.edge_count <= GRAPH_EDGE_LIST_MAX:
+            return _graph_edges_view(graph_data, tree, focus)
+        view = "summary"
+    if view == "edges":
+        return _graph_edges_view(graph_data, tree, focus)
+
+    tree.label = f"{name} [dim]{csr.node_count:,} nodes · {csr.edge_count:,} edges · {view} view[/]"
+    if view == "matrix":
+        return _graph_matrix_view(csr, tree, focus)
+    if view == "neighborhood":
+        return _graph_neighborhood_view(csr, tree, focus)
+    _graph_summary_view(csr, tree)
+    if _graph_view == "auto" and focus:
+        _graph_neighborhood_view(csr, tree, focus)
+    return tree
+
 def _visualize_stack_internal(stack_data, name):
-    tree = Tree(f"{name} (Top -> Bottom)")
     if not stack_data:
+        tree = Tree(f"{name} (Top -> Bottom)")
         tree.add(" (Empty)")
-    else:
+        return tree
+    if not is_windowed(stack_data):
+        tree = Tree(f"{name} (Top -> Bottom)")
         for item in reversed(stack_data): # Display top of stack first
-            tree.add(str(item))
+            tree.add(windowed_text(item, limit=None))
+        return tree
+    # Large stack: only the window is turned into tree nodes
+    tree = Tree(f"{name} (Top -> Bottom) [dim]{container_summary(stack_data)}[/]")
+    for position, item in _window_items(stack_data, len(stack_data), reverse=True):
+        if position is None:
+            tree.add(f"[dim]… {item:,} more[/]")
+        else:
+            tree.add(windowed_text(item, limit=None))
     return tree
 
+def _add_dictionary_entry(tree, key, value):
+    key_str = f"[bold magenta]{str(key)}[/]"
+    if isinstance(value, dict):
+        # Create a new node for the key, then add the visualization of the nested dictionary.
+        # The name for the nested visualization can be simple like "dict" or more descriptive.
+        nested_vis_name = "dict"
+        dict_subtree_node = tree.add(f"{key_str}:")
+        nested_dict_vis = generate_visualization(value, name=nested_vis_name)
+        dict_subtree_node.add(nested_dict_vis)
+    elif isinstance(value, list):
+        nested_vis_name = "list"
+        list_node = tree.add(f"{key_str}:")
+        nested_list_vis = generate_visualization(value, name=nested_vis_name)
+        list_node.add(nested_list_vis)
+    else:
+        tree.add(f"{key_str}: {windowed_text(value)}") # Truncate long values
+
 def _visualize_dictionary_internal(dict_data, name):
-    tree = Tree(name)
     if not dict_data:
+        tree = Tree(name)
         tree.add(" (Empty)")
-    else:
+        return tree
+    if not is_windowed(dict_data):
+        tree = Tree(name)
         for key, value in dict_data.items():
-            key_str = f"[bold magenta]{str(key)}[/]"
-            if isinstance(value, dict):
-                # Create a new node for the key, then add the visualization of the nested dictionary.
-                # The name for the nested visualization can be simple like "dict" or more descriptive.
-                nested_vis_name = "dict" 
-                dict_subtree_node = tree.add(f"{key_str}:")
-                nested_dict_vis = generate_visualization(value, name=nested_vis_name)
-                dict_subtree_node.add(nested_dict_vis)
-            elif isinstance(value, list):
-                nested_vis_name = "list"
-                list_node = tree.add(f"{key_str}:")
-                nested_list_vis = generate_visualization(value, name=nested_vis_name)
-                list_node.add(nested_list_vis)
-            else:
-                tree.add(f"{key_str}: {str(value)[:100]}") # Truncate long values
+            _add_dictionary_entry(tree, key, value)
+        return tree
+    # Large dict: nested values are only visualized for the entries in the window
+    tree = Tree(f"{name} [dim]{container_summary(dict_data)}[/]")
+    for position, entry in _window_items(dict_data.items(), len(dict_data)):
+        if position is None:
+            tree.add(f"[dim]… {entry:,} more[/]")
+        else:
+            _add_dictionary_entry(tree, *entry)
     return tree
 
 # --- Main Visualization Dispatcher ---
@@ -179,18 +662,32 @@ def generate_visualization(data, name="Data"):
     """
     Generates a Rich Tree visualization for the given data using registered visualizers.
     """
-    # Sort by priority (descending) for stable dispatch order
-    # This sort should ideally happen once after all registrations.
-    # For now, sorting here ensures it's always correctly ordered before dispatch.
-    # A more performant approach would be to sort once at module load time.
-    sorted_registry = sorted(VISUALIZER_REGISTRY, key=lambda x: x['priority'], reverse=True)
-
-    for item in sorted_registry:
-        if item['condition'](data):
-            return item['visualizer'](data, name)
+    cache_key = (type(data), shape_fingerprint(data))
+    try:
+        plan = _VISUALIZER_CACHE[cache_key]
+    except KeyError:
+        plan = []
+        for item in VISUALIZER_REGISTRY: # Already sorted by priority
+            if not item['cacheable']:
+                plan.append((item['condition'], item['visualizer']))
+            elif item['condition'](data):
+                plan.append((None, item['visualizer']))
+                break
+        plan = tuple(plan)
+        if len(_VISUALIZER_CACHE) >= DISPATCH_CACHE_SIZE:
+            _VISUALIZER_CACHE.clear()
+        _VISUALIZER_CACHE[cache_key] = plan
+    visualizer = None
+    for condition, candidate in plan:
+        if condition is None or condition(data):
+            visualizer = candidate
+            break
+
+    if visualizer is not None:
+        return visualizer(data, name)
 
     # Fallback for unsupported types or if no visualizer matched
-    fallback_tree = Tree(f"{name} (Type: {type(data).__name__})")
+    fallback_tree = Tree(f"{name} (Type: {type_name(data)})")
     try:
         fallback_tree.add(str(data)[:200]) # Basic string representation, truncated
     except (TypeError, ValueError, AttributeError, OverflowError, RecursionError) as e: # More specific exceptions
@@ -199,14 +696,11 @@ def generate_visualization(data, name="Data"):
 
 # --- Register Visualizers (Order by priority) ---
 # Higher priority means checked earlier.
-register_visualizer(_is_linked_list_node, _visualize_linked_list_internal, priority=30)
-register_visualizer(_is_tree_node, _visualize_tree_internal, priority=20)
-register_visualizer(_is_graph_dict, _visualize_graph_internal, priority=15)
-register_visualizer(_is_dictionary, _visualize_dictionary_internal, priority=10) 
-register_visualizer(_is_stack_list, _visualize_stack_internal, priority=5) 
-
-# Sort registry once after all registrations
-VISUALIZER_REGISTRY.sort(key=lambda x: x['priority'], reverse=True)
+register_visualizer(_is_linked_list_node, _visualize_linked_list_internal, priority=30, cacheable=True)
+register_visualizer(_is_tree_node, _visualize_tree_internal, priority=20, cacheable=True)
+register_visualizer(_is_graph_dict, _visualize_graph_internal, priority=15, cacheable=True)
+register_visualizer(_is_dictionary, _visualize_dictionary_internal, priority=10, cacheable=True) 
+register_visualizer(_is_stack_list, _visualize_stack_internal, priority=5, cacheable=True) 
 
 
 # --- Public API Functions (as used by core.py or examples) ---
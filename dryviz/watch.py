@@ -0,0 +1,49 @@
+class WatchError:
+    """Captured in place of a watch expression that raised."""
+
+    def __init__(self, error):
+        self.text = f"<{type(error).__name__}: {error}>"
+
+    def __eq__(self, other):
+        return isinstance(other, WatchError) and other.text == self.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def __str__(self):
+        return self.text
+
+    __repr__ = __str__
+
+
+class WatchList:
+    """
+    Selects what is captured from a frame instead of all of its locals.
+    Plain names are looked up directly; anything else is compiled once as an
+    expression and evaluated in the frame. Names that are not bound yet are
+    left out of the step.
+    """
+
+    def __init__(self, watch):
+        if isinstance(watch, str):
+            watch = [watch]
+        self.names = []
+        self.expressions = [] # (label, code object)
+        for entry in watch:
+            if entry.isidentifier():
+                self.names.append(entry)
+            else:
+                self.expressions.append((entry, compile(entry, f"<dryviz watch {entry!r}>", "eval")))
+
+    def collect(self, frame):
+        local_vars = frame.f_locals
+        variables = {}
+        for var_name in self.names:
+            if var_name in local_vars:
+                variables[var_name] = local_vars[var_name]
+        for label, code in self.expressions:
+            try:
+                variables[label] = eval(code, frame.f_globals, local_vars)
+            except Exception as e:
+                variables[label] = WatchError(e)
+        return variables
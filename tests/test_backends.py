@@ -0,0 +1,42 @@
+import pytest
+
+from dryviz.backends import MonitoringBackend, make_backend
+
+
+def one_line_loop():
+    x = 0
+    for i in range(5): x += i
+    return x
+
+
+def nested_loops():
+    total = 0
+    for i in range(3):
+        for j in range(2): total += j
+        while total < 4 * (i + 1): total += 1
+        if i == 1:
+            continue
+    return [k for k in range(3)], total
+
+
+def _recorded_lines(func, backend_name):
+    lines = []
+    backend = make_backend(func.__code__, lambda _frame, lineno: lines.append(lineno), backend_name)
+    backend.start()
+    try:
+        func()
+    finally:
+        backend.stop()
+    return lines
+
+
+@pytest.mark.skipif(not MonitoringBackend.is_available(), reason="needs sys.monitoring (Python 3.12+)")
+@pytest.mark.parametrize("func", [one_line_loop, nested_loops])
+def test_backends_record_the_same_steps(func):
+    assert _recorded_lines(func, "monitoring") == _recorded_lines(func, "settrace")
+
+
+def test_one_line_loop_steps_every_iteration():
+    first = one_line_loop.__code__.co_firstlineno
+    lines = [lineno - first for lineno in _recorded_lines(one_line_loop, None)]
+    assert lines == [1] + [2] * 6 + [3]
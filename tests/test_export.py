@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+from dryviz.core import dryviz
+
+
+def test_disabled_import_does_not_load_process_pools():
+    code = "import sys, dryviz.core; print('concurrent.futures' in sys.modules, 'multiprocessing' in sys.modules)"
+    env = dict(os.environ, DRYVIZ_DISABLED="1")
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_decorator_exports_a_long_trace(tmp_path):
+    output = tmp_path / "steps.txt"
+
+    @dryviz(output=output)
+    def count(n):
+        total = 0
+        for i in range(n):
+            total += i
+        return total
+
+    assert count(300) == sum(range(300))
+    text = output.read_text(encoding="utf-8")
+    assert "Step 1 of" in text and "total" in text
+
+
+def test_decorator_export_forks_only_single_threaded_on_linux(monkeypatch):
+    from dryviz import export, session
+
+    calls = []
+    monkeypatch.setattr(export, "export_trace", lambda trace_data, output, **options: calls.append(options))
+    monkeypatch.setattr(session.sys, "platform", "linux")
+    session._export([], "out.txt")
+    monkeypatch.setattr(session.threading, "active_count", lambda: 2)
+    session._export([], "out.txt")
+    monkeypatch.setattr(session.sys, "platform", "darwin")
+    monkeypatch.setattr(session.threading, "active_count", lambda: 1)
+    session._export([], "out.txt")
+    assert calls == [{"start_method": "fork"}, {"workers": 1}, {"workers": 1}]
@@ -0,0 +1,42 @@
+from dryviz.graphs import GraphCSR, graph_csr
+from dryviz.snapshot import SnapshotEngine
+
+
+def _positions(csr, names):
+    return [csr.index[name] for name in names]
+
+
+def test_degrees_and_edges_of_an_adjacency_list():
+    graph = {"a": ["b", "c"], "b": ["c"], "c": ["a", "c"], "d": []}
+    csr = GraphCSR(graph)
+    assert csr.nodes == ["a", "b", "c", "d"]
+    assert (csr.node_count, csr.edge_count) == (4, 5)
+    assert [csr.out_degree(position) for position in range(4)] == [2, 1, 2, 0]
+    assert [csr.in_degree(position) for position in range(4)] == [1, 1, 3, 0]
+    assert sorted(csr.in_neighbors(csr.index["c"])) == _positions(csr, ["a", "b", "c"])
+    assert list(csr.in_neighbors(csr.index["d"])) == []
+    assert csr.out_edges(csr.index["a"]) == [(1, None), (2, None)]
+    summary = csr.summary()
+    assert summary["isolated"] == 1 and summary["self_loops"] == 1
+    assert summary["out_degree"] == (0, 5 / 4, 2) and summary["in_degree"] == (0, 5 / 4, 3)
+
+
+def test_weights_and_neighbors_that_are_not_keys():
+    csr = GraphCSR({1: {2: 0.5, 3: 1.5}, 2: [3, 4]})
+    assert csr.nodes == [1, 2, 3, 4]
+    assert csr.out_edges(0) == [(1, 0.5), (2, 1.5)]
+    assert csr.out_edges(1) == [(2, None), (3, None)]
+    assert [csr.out_degree(position) for position in range(4)] == [2, 2, 0, 0]
+    assert [csr.in_degree(position) for position in range(4)] == [0, 1, 2, 1]
+
+
+def test_snapshots_are_converted_once():
+    graph = {0: [1], 1: [0]}
+    engine = SnapshotEngine()
+    first = engine.capture({"graph": graph})["graph"]
+    assert graph_csr(first) is graph_csr(engine.capture({"graph": graph})["graph"])
+    graph[1].append(1)
+    changed = engine.capture({"graph": graph})["graph"]
+    assert graph_csr(changed) is not graph_csr(first)
+    assert graph_csr(changed).edge_count == 3
+    assert graph_csr(graph) is not graph_csr(graph)  # Live dicts are never cached
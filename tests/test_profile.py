@@ -0,0 +1,39 @@
+import json
+
+from dryviz import profile as profile_module
+from dryviz.core import dryviz
+from dryviz.profile import LineProfile
+
+
+def test_recursive_hits_are_counted_per_line_and_depth(tmp_path):
+    path = tmp_path / "profile.json"
+
+    @dryviz(mode="profile", profile=path)
+    def fact(n):
+        if n <= 1:
+            return 1
+        return n * fact(n - 1)
+
+    assert fact(4) == 24
+    first = fact.__code__.co_firstlineno # The decorator's line
+    rows = {row["line"] - first: row for row in json.loads(path.read_text())}
+    assert {offset: row["hits"] for offset, row in rows.items()} == {2: 4, 3: 1, 4: 3}
+    assert rows[2]["depths"] == {"0": 1, "1": 1, "2": 1, "3": 1}
+    assert rows[3]["depths"] == {"3": 1}
+    assert rows[4]["depths"] == {"0": 1, "1": 1, "2": 1}
+    for row in rows.values():
+        assert row["cumulative_time"] >= row["self_time"] >= 0
+
+
+def test_self_and_cumulative_time_accounting(monkeypatch):
+    profile = LineProfile()
+    clock = iter([0.0, 1.0, 3.0])
+    monkeypatch.setattr(profile_module.time, "perf_counter", lambda: next(clock))
+    profile.hit("f.py", 1, 0, now=0.0)
+    profile.hit("f.py", 2, 1, now=1.0)  # Line 1 ran for 1s, then called into depth 1
+    profile.hit("f.py", 3, 0, now=3.0)  # Back at depth 0: line 2 took 2s, line 1's call 3s
+    profile.close(now=3.0)
+    assert profile.lines[("f.py", 1)][:3] == [1, 1.0, 3.0]
+    assert profile.lines[("f.py", 2)][:3] == [1, 2.0, 2.0]
+    assert profile.lines[("f.py", 3)][:3] == [1, 0.0, 0.0]
+    assert profile.files() == ["f.py"]
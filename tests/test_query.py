@@ -0,0 +1,41 @@
+from dryviz.trace import TraceStore
+from dryviz.tracefile import TraceFile
+
+
+def _stack_trace():
+    """Pushes 15 items, pops 10, pushes 10 more; `i` changes at every step."""
+    store = TraceStore()
+    stack = []
+    step = 0
+    for action in ["push"] * 15 + ["pop"] * 10 + ["push"] * 10:
+        if action == "push":
+            stack.append(step)
+        else:
+            stack.pop()
+        store.append(1, {"stack": stack, "i": step})
+        step += 1
+    return store
+
+
+def test_find_returns_the_first_step_of_each_run(tmp_path):
+    store = _stack_trace()
+    path = tmp_path / "stack.dryviz"
+    store.save(path)
+    with TraceFile(path) as saved:
+        for trace in (store, saved):
+            assert trace.find("len(stack) > 10") == 10  # 11 items after the 11th push
+            assert trace.find("len(stack) > 10", start=10) == 10
+            assert trace.find("len(stack) > 10", start=11) == 30  # Falls to 5, back above 10 at step 30
+            assert trace.find("len(stack) > 10", start=29, backward=True) == 10
+            assert trace.find("len(stack) > 10", start=34, backward=True) == 30
+            assert trace.find("len(stack) > 100") is None
+            assert trace.find("undefined_name > 0") is None
+
+
+def test_changes_lists_the_steps_that_rebound_a_variable():
+    store = TraceStore()
+    for value in [1, 1, 2, 2, 2, 3]:
+        store.append(1, {"x": value})
+    store.append(1, {})
+    assert list(store.changes("x")) == [0, 2, 5, 6]
+    assert list(store.changes("missing")) == []
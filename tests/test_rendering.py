@@ -0,0 +1,59 @@
+import pytest
+from rich.console import Console
+from rich.text import Text
+from rich.tree import Tree
+
+from dryviz import rendering, visuals
+from dryviz.rendering import _render_variable, register_renderer
+from dryviz.snapshot import SnapshotEngine
+from dryviz.visuals import generate_visualization, register_visualizer
+
+
+def _label(name, value):
+    console = Console(width=100)
+    with console.capture() as captured:
+        console.print(_render_variable(name, value))
+    return captured.get().splitlines()[0].strip()
+
+
+def test_dispatch_does_not_depend_on_earlier_values():
+    engine = SnapshotEngine()
+    empty = {key: [] for key in range(20)}
+    last_filled = dict(empty)
+    last_filled[19] = [1]
+    assert _label("d", empty) == "d (Dictionary):"
+    assert _label("d", last_filled) == "d (Graph):"
+    assert _label("d", engine.capture({"d": last_filled})["d"]) == "d (Graph):"
+
+    graph = {key: [key + 1] for key in range(20)}
+    not_graph = dict(graph)
+    not_graph[19] = 5
+    assert _label("g", graph) == "g (Graph):"
+    assert _label("g", not_graph) == "g (Dictionary):"
+    assert _label("g", engine.capture({"g": not_graph})["g"]) == "g (Dictionary):"
+
+
+@pytest.fixture
+def restore_registries():
+    renderers = list(rendering.RENDERER_REGISTRY)
+    visualizers = list(visuals.VISUALIZER_REGISTRY)
+    yield
+    rendering.RENDERER_REGISTRY[:] = renderers
+    visuals.VISUALIZER_REGISTRY[:] = visualizers
+    rendering._RENDERER_CACHE.clear()
+    visuals.clear_render_caches()
+
+
+def test_user_conditions_are_checked_on_every_value(restore_registries):
+    register_renderer(lambda name, value: isinstance(value, int) and value > 100,
+                      lambda name, value: Text(f"  {name}: BIG {value}"))
+    assert _label("x", 5) == "x: 5"
+    assert _label("x", 500) == "x: BIG 500"
+    assert _label("y", 500) == "y: BIG 500"
+    assert _label("y", 5) == "y: 5"
+
+    register_visualizer(lambda data: isinstance(data, list) and len(data) > 3,
+                        lambda data, name: Tree(f"{name} (Long)"), priority=50)
+    assert generate_visualization([1, 2, 3], "s").label != "s (Long)"
+    assert generate_visualization([1, 2, 3, 4], "s").label == "s (Long)"
+    assert generate_visualization([1], "s").label != "s (Long)"
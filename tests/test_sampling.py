@@ -0,0 +1,51 @@
+import math
+
+import pytest
+
+from dryviz.app import DryvizTraceApp
+from dryviz.core import dryviz
+from dryviz.session import last_session
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    published = []
+    monkeypatch.setattr(DryvizTraceApp, "run", lambda app: published.append(app.trace_data))
+    return published
+
+
+def count(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+BODY_LINE = count.__code__.co_firstlineno + 3
+
+
+def _steps(traces, **options):
+    assert dryviz(count, **options)(10) == 45
+    return traces[-1]
+
+
+def test_every_keeps_one_line_event_in_n(traces):
+    events = len(_steps(traces))
+    assert len(_steps(traces, every=5)) == math.ceil(events / 5)
+    assert last_session().stats()["events"] == events
+
+
+def test_max_steps_stops_capturing(traces):
+    trace = _steps(traces, max_steps=7)
+    assert len(trace) == 7
+    assert last_session().stats()["budget_exhausted"] == "max_steps"
+
+
+def test_lines_filter_then_every(traces):
+    assert [step.lineno for step in _steps(traces, lines=[BODY_LINE])] == [BODY_LINE] * 10
+    assert len(_steps(traces, lines=[BODY_LINE], every=3)) == 4
+
+
+def test_invalid_every_is_rejected():
+    with pytest.raises(ValueError):
+        dryviz(count, every=0)
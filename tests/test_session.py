@@ -0,0 +1,55 @@
+import pytest
+
+from dryviz.core import dryviz
+from dryviz.app import DryvizTraceApp
+from dryviz.tracefile import TraceFile
+
+
+@pytest.fixture
+def opened_viewers(monkeypatch):
+    opened = []
+    monkeypatch.setattr(DryvizTraceApp, "run", lambda app: opened.append(app))
+    return opened
+
+
+def test_keyboard_interrupt_is_recorded_without_opening_the_viewer(tmp_path, opened_viewers):
+    path = tmp_path / "crash.dryviz"
+
+    @dryviz(mode="flight_recorder", trace_file=path)
+    def interrupted():
+        x = 1
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        interrupted()
+    with TraceFile(path) as trace:
+        assert len(trace) > 0
+    assert opened_viewers == []
+
+    @dryviz(mode="flight_recorder")
+    def exits():
+        raise SystemExit(3)
+
+    with pytest.raises(SystemExit):
+        exits()
+    assert opened_viewers == []
+
+
+def test_publish_failure_does_not_hide_the_error(tmp_path, opened_viewers):
+    @dryviz(mode="flight_recorder", trace_file=tmp_path / "missing" / "crash.dryviz")
+    def fails():
+        x = 1
+        raise ValueError("the real error")
+
+    with pytest.warns(RuntimeWarning, match="could not publish"):
+        with pytest.raises(ValueError, match="the real error"):
+            fails()
+
+
+def test_missing_live_viewer_runs_untraced(tmp_path):
+    @dryviz(viewer=tmp_path / "nobody.sock")
+    def double(n):
+        return n * 2
+
+    with pytest.warns(RuntimeWarning, match="running untraced"):
+        assert double(21) == 42
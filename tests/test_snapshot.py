@@ -0,0 +1,104 @@
+from rich.console import Console
+
+from dryviz.snapshot import (LINKED_LIST, TREE, NodeSnapshot, SnapshotEngine, node_layout, register_node,
+                             set_snapshot_limits, snapshot_limits, unregister_node)
+from dryviz.visuals import generate_visualization
+
+
+class Link:
+    __dryviz_layout__ = {"value": "key", "next": "successor"}
+
+    def __init__(self, key, successor=None):
+        self.key = key
+        self.successor = successor
+        self.scratch = list(range(100))
+
+    def __dryviz_snapshot__(self):
+        return {"key": self.key, "successor": self.successor}
+
+
+class Branch:
+    def __init__(self, label, *kids):
+        self.label = label
+        self.kids = list(kids)
+
+
+def test_snapshot_method_declares_its_layout():
+    chain = Link(1, Link(2, Link(3)))
+    captured = SnapshotEngine().capture({"chain": chain})["chain"]
+    assert isinstance(captured, NodeSnapshot)
+    assert node_layout(chain) == node_layout(captured)
+    assert node_layout(captured).shape == LINKED_LIST
+    assert not hasattr(captured, "scratch")
+    console = Console(width=80)
+    with console.capture() as rendered:
+        console.print(generate_visualization(captured, "chain"))
+    assert [line.strip(" └─") for line in rendered.get().splitlines()] == ["chain", "[1]", "[2]", "[3]", "None"]
+
+
+def test_registered_snapshot_function_with_layout():
+    register_node(Branch, value="label", children="kids",
+                  snapshot=lambda node: {"label": node.label.upper(), "kids": node.kids})
+    try:
+        captured = SnapshotEngine().capture({"tree": Branch("a", Branch("b"))})["tree"]
+        assert node_layout(captured).shape == TREE
+        assert captured.label == "A" and captured.kids[0].label == "B"
+    finally:
+        unregister_node(Branch)
+
+
+class Holder:
+    def __init__(self):
+        self.items = []
+
+    def __repr__(self):
+        return f"Holder({self.items})"
+
+
+def test_opaque_objects_keep_the_text_they_had_at_each_step():
+    engine = SnapshotEngine()
+    holder = Holder()
+    steps = []
+    for item in (1, 2):
+        steps.append(engine.capture({"holder": holder})["holder"])
+        holder.items.append(item)
+    steps.append(engine.capture({"holder": holder})["holder"])
+    unchanged = engine.capture({"holder": holder})["holder"]
+    assert [str(step) for step in steps] == ["Holder([])", "Holder([1])", "Holder([1, 2])"]
+    assert unchanged is steps[-1]
+
+
+def _chain(length):
+    head = None
+    for value in reversed(range(length)):
+        node = Link(value, head)
+        head = node
+    return head
+
+
+def _chain_length(node):
+    length = 0
+    while isinstance(node, NodeSnapshot):
+        length += 1
+        node = node.successor
+    return length
+
+
+def test_each_variable_gets_its_own_node_budget():
+    engine = SnapshotEngine(max_nodes=500)
+    captured = engine.capture({"a": _chain(300), "b": _chain(300), "long": _chain(800)})
+    assert _chain_length(captured["a"]) == 300
+    assert _chain_length(captured["b"]) == 300
+    assert _chain_length(captured["long"]) == 500
+
+    queue = [Link(value) for value in range(800)]
+    assert all(isinstance(node, NodeSnapshot) for node in engine.capture({"queue": queue})["queue"])
+
+
+def test_snapshot_limits_are_configurable():
+    saved = snapshot_limits()
+    set_snapshot_limits(max_nodes=10)
+    try:
+        assert _chain_length(SnapshotEngine().capture({"a": _chain(50)})["a"]) == 10
+    finally:
+        set_snapshot_limits(*saved)
@@ -0,0 +1,106 @@
+import warnings
+
+import pytest
+
+from dryviz import snapshot
+from dryviz.trace import TraceStore
+from dryviz.tracefile import TraceFile, TraceStream
+
+
+class Node:
+    def __init__(self, value):
+        self.value = value
+        self.next = None
+
+
+def _linked_list(length):
+    head = Node(0)
+    tail = head
+    for value in range(1, length):
+        tail.next = Node(value)
+        tail = tail.next
+    return head
+
+
+def _saved(store, tmp_path):
+    path = tmp_path / "run.dryviz"
+    store.save(path)
+    return path
+
+
+def test_deep_linked_list_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_MAX_NODES", 5000)
+    store = TraceStore()
+    store.append(1, {"head": _linked_list(3000)})
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        path = _saved(store, tmp_path)
+    with TraceFile(path) as trace:
+        node = trace[0].variables["head"]
+        values = []
+        while node is not None:
+            values.append(node.value)
+            node = node.next
+    assert values == list(range(3000))
+
+
+def test_growing_list_is_not_rewritten_every_step(tmp_path):
+    store = TraceStore()
+    stack = []
+    for value in range(2000):
+        stack.append(value)
+        store.append(1, {"stack": stack})
+    path = _saved(store, tmp_path)
+    # Each step adds one item; a full copy per step would be tens of megabytes
+    assert path.stat().st_size < 1_000_000
+    with TraceFile(path) as trace:
+        for index in (0, 1, 31, 32, 33, 1000, 1999):
+            assert list(trace[index].variables["stack"]) == list(range(index + 1))
+
+
+def test_shared_and_cyclic_structures_round_trip(tmp_path):
+    store = TraceStore()
+    graph = {}
+    for step in range(40):
+        graph[step] = []
+        if step:
+            graph[step - 1].append(step)
+        if step % 7 == 0 and step:
+            del graph[step - 3]
+        ring = Node(step)
+        ring.next = Node(step + 1)
+        ring.next.next = ring
+        store.append(step, {"graph": graph, "ring": ring, "pair": (step, [step])})
+    path = _saved(store, tmp_path)
+    data = path.read_bytes()
+    stream = TraceStream()
+    for start in range(0, len(data), 500):
+        stream.feed(data[start:start + 500])
+    with TraceFile(path) as trace:
+        for index in range(len(store)):
+            expected = store[index].variables
+            for source in (trace, stream):
+                variables = source[index].variables
+                assert variables["graph"] == expected["graph"]
+                assert list(variables["graph"]) == list(expected["graph"])
+                assert variables["pair"] == expected["pair"]
+                ring = variables["ring"]
+                assert ring.next.next is ring
+                assert ring.value == expected["ring"].value
+
+
+def test_unpicklable_value_is_stored_as_text(tmp_path):
+    store = TraceStore()
+    store.append(1, {"lock": __import__("threading").Lock(), "n": 1})
+    path = _saved(store, tmp_path)
+    with TraceFile(path) as trace:
+        variables = trace[0].variables
+    assert variables["n"] == 1
+    assert "lock" in str(variables["lock"]).lower()
+
+
+def test_not_a_trace_file(tmp_path):
+    path = tmp_path / "bogus.dryviz"
+    path.write_bytes(b"not a trace at all")
+    with pytest.raises(ValueError):
+        TraceFile(path)
@@ -0,0 +1,57 @@
+import pytest
+
+from dryviz.visuals import _window_items, container_window, is_windowed, set_container_window, windowed_text
+
+
+@pytest.fixture(autouse=True)
+def default_window():
+    saved = container_window()
+    set_container_window(head=20, tail=5, offset=0)
+    yield
+    set_container_window(*saved)
+
+
+def _shown(items, count=None, reverse=False):
+    return list(_window_items(items, len(items) if count is None else count, reverse))
+
+
+def test_small_containers_are_shown_whole():
+    items = list(range(25))
+    assert not is_windowed(items)
+    assert _shown(items) == list(enumerate(items))
+
+
+def test_window_shows_head_and_tail_with_the_gap_between():
+    items = list(range(100))
+    shown = _shown(items)
+    assert shown[:20] == [(position, position) for position in range(20)]
+    assert shown[20] == (None, 75)
+    assert shown[21:] == [(position, position) for position in range(95, 100)]
+
+
+def test_window_offset_is_clamped_to_the_end():
+    items = list(range(100))
+    set_container_window(offset=40)
+    shown = _shown(items)
+    assert shown[0] == (None, 40)
+    assert shown[1] == (40, 40) and shown[20] == (59, 59)
+    assert shown[21] == (None, 35)
+    set_container_window(offset=1000)  # Past the end: the head ends where the tail starts
+    shown = _shown(items)
+    assert shown[0] == (None, 75)
+    assert [position for position, _item in shown[1:]] == list(range(75, 100))
+
+
+def test_unindexable_and_reversed_containers():
+    items = list(range(100))
+    assert _shown(dict.fromkeys(items).keys()) == _shown(items)
+    assert _shown(set(range(30))) == list(enumerate(set(range(30))))[:20] + [(None, 5)] + \
+        list(enumerate(set(range(30))))[25:]
+    reversed_shown = _shown(items, reverse=True)
+    assert reversed_shown[0] == (0, 99) and reversed_shown[-1] == (99, 0)
+
+
+def test_windowed_text_elides_the_middle():
+    text = windowed_text(list(range(100_000)))
+    assert text.startswith("[0, 1, ") and ", 19, … 99,975 more …, 99995, " in text
+    assert text.endswith(", 99999] (100,000 items · int 100%)")